@@ -0,0 +1,285 @@
+import os
+import queue
+import signal
+import threading
+import time
+from datetime import datetime
+import cv2
+from metrics import span, start_metrics_server, FRAMES
+from motion_gate import MotionGate, parse_thresholds
+from supabase_init1 import upload_bytes_to_supabase
+
+FRAME_INTERVAL = float(os.getenv("CAPTURE_FRAME_INTERVAL", "10"))
+QUEUE_SIZE = int(os.getenv("CAPTURE_QUEUE_SIZE", "8"))
+UPLOAD_WORKERS = int(os.getenv("CAPTURE_UPLOAD_WORKERS", "4"))
+JPEG_QUALITY = int(os.getenv("CAPTURE_JPEG_QUALITY", "85"))
+MOTION_GATING = os.getenv("MOTION_GATING", "true").lower() == "true"
+SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "spool")
+MAX_PENDING_UPLOADS = int(os.getenv("INGEST_MAX_PENDING_UPLOADS", "1000"))
+RECONNECT_DELAY = 2.0
+
+
+def parse_source(source):
+    """Device indices are given as digits; anything else is a URL or file path"""
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+
+def is_live_source(source):
+    return isinstance(source, int) or "://" in source
+
+
+def encode_jpeg(frame, quality=JPEG_QUALITY):
+    """JPEG-encode a frame in memory; no temp file is ever written"""
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        return None
+    return encoded.data  # memoryview over the encoder's output, no extra copy
+
+
+class FramePool:
+    """Recycles frame arrays so steady-state capture does not allocate per frame"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            return self._free.pop() if self._free else None
+
+    def release(self, frame):
+        if frame is None:
+            return
+        with self._lock:
+            if len(self._free) < self.limit:
+                self._free.append(frame)
+
+
+class CameraWorker(threading.Thread):
+    """Reads one source on its own thread and keeps the newest frames in a bounded queue"""
+
+    def __init__(self, camera_id, source, stop_event, frames_ready, frame_interval=FRAME_INTERVAL, queue_size=QUEUE_SIZE, gate=None):
+        super().__init__(name=f"camera-{camera_id}", daemon=True)
+        self.gate = gate
+        self.camera_id = camera_id
+        self.source = parse_source(source)
+        self.live = is_live_source(self.source)
+        self.stop_event = stop_event
+        self.frames_ready = frames_ready
+        self.frame_interval = frame_interval
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.pool = FramePool(queue_size + UPLOAD_WORKERS + 1)
+        self.captured = 0
+        self.dropped = 0
+        self.finished = False
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        return cap
+
+    def _enqueue(self, frame):
+        # A slow uploader must never block capture: drop the oldest frame instead
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            try:
+                self.pool.release(self.frames.get_nowait())
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            else:
+                FRAMES.inc(self.camera_id, "dropped")
+            self.frames.put_nowait(frame)
+        self.captured += 1
+        FRAMES.inc(self.camera_id, "captured")
+        self.frames_ready.set()
+
+    def run(self):
+        next_capture = 0.0
+        cap = None
+        try:
+            while not self.stop_event.is_set():
+                if cap is None:
+                    cap = self._open()
+                    if cap is None:
+                        if not self.live:
+                            print(f"ERROR! Couldn't open source {self.source!r} for {self.camera_id}")
+                            return
+                        self.stop_event.wait(RECONNECT_DELAY)
+                        continue
+
+                # Read into a recycled array when one is free; OpenCV reallocates if the size changed
+                buffer = self.pool.acquire()
+                ret, frame = cap.read(buffer) if buffer is not None else cap.read()
+                if not ret:
+                    self.pool.release(buffer)
+                    if not self.live:
+                        return  # end of a video file
+                    print(f"Lost stream for {self.camera_id}, reconnecting")
+                    cap.release()
+                    cap = None
+                    continue
+
+                # Live sources are paced by the wall clock, files by their own timestamps
+                now = time.monotonic() if self.live else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                if now >= next_capture:
+                    next_capture = now + self.frame_interval
+                    with span("capture"):
+                        keep = self.gate is None or self.gate.should_keep(frame, now)
+                    if keep:
+                        self._enqueue(frame)
+                    else:
+                        FRAMES.inc(self.camera_id, "unchanged")
+                        self.pool.release(frame)
+                else:
+                    self.pool.release(frame)
+        finally:
+            if cap is not None:
+                cap.release()
+            self.finished = True
+            self.frames_ready.set()
+
+
+class CaptureDaemon:
+    """Captures N cameras concurrently and drains their queues with a shared uploader pool"""
+
+    def __init__(self, supabase, sources, upload_workers=UPLOAD_WORKERS, frame_interval=FRAME_INTERVAL, jpeg_quality=JPEG_QUALITY,
+                 work_queue=None):
+        self.supabase = supabase
+        self.work_queue = work_queue
+        self.jpeg_quality = jpeg_quality
+        self.session_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.stop_event = threading.Event()
+        self.frames_ready = threading.Event()
+        gates = parse_thresholds(os.getenv("MOTION_THRESHOLDS")) if MOTION_GATING else {}
+        self.cameras = []
+        for i, source in enumerate(sources):
+            camera_id = f"cam{i}"
+            gate = gates.get(camera_id, MotionGate()) if MOTION_GATING else None
+            self.cameras.append(CameraWorker(camera_id, source, self.stop_event, self.frames_ready, frame_interval, gate=gate))
+        self.uploaders = [
+            threading.Thread(target=self._upload_loop, args=(i,), name=f"uploader-{i}", daemon=True)
+            for i in range(upload_workers)
+        ]
+        self._counter_lock = threading.Lock()
+        self._clip_counts = {camera.camera_id: 0 for camera in self.cameras}
+        self.uploaded = 0
+        self.failed = 0
+        self.spooled = 0
+
+    def _next_file_name(self, camera_id):
+        with self._counter_lock:
+            self._clip_counts[camera_id] += 1
+            return f"{camera_id}_clip_{self._clip_counts[camera_id]}.jpg"
+
+    def _next_frame(self, offset):
+        """Take a frame from the cameras round-robin, starting at a per-worker offset"""
+        count = len(self.cameras)
+        for i in range(count):
+            camera = self.cameras[(offset + i) % count]
+            try:
+                return camera, camera.frames.get_nowait()
+            except queue.Empty:
+                continue
+        return None, None
+
+    def _capture_done(self):
+        return all(camera.finished for camera in self.cameras)
+
+    def _upload_loop(self, worker_index):
+        offset = worker_index
+        while True:
+            camera, frame = self._next_frame(offset)
+            if frame is None:
+                if self._capture_done():
+                    return
+                self.frames_ready.clear()
+                self.frames_ready.wait(0.1)
+                continue
+            offset += 1
+
+            with span("encode"):
+                encoded = encode_jpeg(frame, self.jpeg_quality)
+            camera.pool.release(frame)
+            if encoded is None:
+                continue
+            file_name = self._next_file_name(camera.camera_id)
+            if self.work_queue is not None:
+                self._spool(camera, encoded, file_name)
+                continue
+            try:
+                with span("upload"):
+                    upload_bytes_to_supabase(self.supabase, encoded, self.session_timestamp, file_name)
+                with self._counter_lock:
+                    self.uploaded += 1
+                FRAMES.inc(camera.camera_id, "uploaded")
+            except Exception as e:
+                print(f"Upload failed for {file_name}: {e}")
+                with self._counter_lock:
+                    self.failed += 1
+                FRAMES.inc(camera.camera_id, "failed")
+
+    def _spool(self, camera, encoded, file_name):
+        """Persist the frame and hand it to the upload stage of the ingestion queue"""
+        # Backpressure: while uploads are behind, stall here; the camera queues then drop their oldest frames
+        while self.work_queue.depth("upload") >= MAX_PENDING_UPLOADS and not self.stop_event.is_set():
+            self.stop_event.wait(0.5)
+
+        directory = os.path.join(SPOOL_DIR, self.session_timestamp)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, file_name)
+        with span("spool"):
+            with open(path + ".tmp", "wb") as f:
+                f.write(encoded)
+            os.replace(path + ".tmp", path)
+            self.work_queue.put("upload", f"{self.session_timestamp}/{file_name}", {
+                "session": self.session_timestamp,
+                "file_name": file_name,
+                "path": path
+            })
+        with self._counter_lock:
+            self.spooled += 1
+        FRAMES.inc(camera.camera_id, "spooled")
+
+    def stop(self, *_):
+        self.stop_event.set()
+        self.frames_ready.set()
+
+    def run(self):
+        """Run until every source ends or SIGINT/SIGTERM; returns the session timestamp"""
+        previous_handlers = None
+        if threading.current_thread() is threading.main_thread():
+            previous_handlers = signal.signal(signal.SIGINT, self.stop), signal.signal(signal.SIGTERM, self.stop)
+
+        start_metrics_server()
+        print(f"Capturing {len(self.cameras)} camera(s) into session {self.session_timestamp}")
+        for thread in self.cameras + self.uploaders:
+            thread.start()
+        for camera in self.cameras:
+            while camera.is_alive():
+                camera.join(0.5)
+        for uploader in self.uploaders:
+            uploader.join()
+
+        for camera in self.cameras:
+            skipped = f", unchanged {camera.gate.skipped}" if camera.gate else ""
+            print(f"{camera.camera_id}: captured {camera.captured}, dropped {camera.dropped}{skipped}")
+        if self.work_queue is not None:
+            print(f"Queued {self.spooled} frames for upload")
+        else:
+            print(f"Uploaded {self.uploaded} frames ({self.failed} failed)")
+
+        if previous_handlers is not None:
+            signal.signal(signal.SIGINT, previous_handlers[0])
+            signal.signal(signal.SIGTERM, previous_handlers[1])
+        return self.session_timestamp
+
+
+def sources_from_env():
+    """CAMERA_SOURCES is a comma-separated list of device indices, stream URLs or files"""
+    return [source for source in os.getenv("CAMERA_SOURCES", "0").split(",") if source.strip()]
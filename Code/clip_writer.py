@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from collections import namedtuple
+import httpx
+from metrics import span, ROWS
+from supabase_init1 import insert_many_into_database
+
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "100"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "2"))  # seconds a row may wait in the buffer
+WRITE_MAX_RETRIES = int(os.getenv("WRITE_MAX_RETRIES", "3"))
+BASE_BACKOFF = 0.5
+
+# Failures where the database never saw the batch; splitting it can't help
+TRANSIENT = (httpx.TransportError, ConnectionError, TimeoutError)
+
+# written: rows stored; failed: (row, error) pairs for rows that could not be
+WriteResult = namedtuple("WriteResult", "written failed")
+
+
+def _upsert(supabase, rows, retries):
+    for attempt in range(retries + 1):
+        try:
+            with span("insert"):
+                insert_many_into_database(supabase, rows)
+            return None
+        except Exception as e:
+            if attempt == retries:
+                return e
+            time.sleep(BASE_BACKOFF * 2 ** attempt)
+
+
+def write_rows(supabase, rows, max_retries=WRITE_MAX_RETRIES):
+    """Upsert (file_name, public_url, description, structured, camera_id) rows in one request, with retries.
+
+    If the database keeps rejecting the batch, it is split in halves until the bad rows are
+    isolated, so one malformed row doesn't sink the rest. Connection failures fail the whole batch.
+    """
+    rows = list(rows)
+    if not rows:
+        return WriteResult([], [])
+
+    error = _upsert(supabase, rows, max_retries)
+    if error is None:
+        ROWS.inc("written", amount=len(rows))
+        return WriteResult(rows, [])
+    if len(rows) == 1 or isinstance(error, TRANSIENT):
+        ROWS.inc("failed", amount=len(rows))
+        return WriteResult([], [(row, error) for row in rows])
+
+    middle = len(rows) // 2
+    left = write_rows(supabase, rows[:middle], max_retries=0)
+    right = write_rows(supabase, rows[middle:], max_retries=0)
+    return WriteResult(left.written + right.written, left.failed + right.failed)
+
+
+class BufferedClipWriter:
+    """Collects clip rows and upserts them in bulk once `batch_size` rows are waiting or `flush_interval` has passed.
+
+    A row added with an on_written callback is reported through it after its flush, with None or
+    the write error; rows without one that fail are kept in `failed` for the caller.
+    """
+
+    def __init__(self, supabase, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL):
+        self.supabase = supabase
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.failed = []
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="clip-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, file_name, public_url, description, structured=None, camera_id=None, on_written=None):
+        with self._lock:
+            self._rows.append(((file_name, public_url, description, structured, camera_id), on_written))
+            full = len(self._rows) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far; returns the WriteResult for those rows"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._rows = self._rows, []
+            result = write_rows(self.supabase, [row for row, _ in pending])
+            self.written += len(result.written)
+            if result.failed:
+                print(f"{len(result.failed)} of {len(pending)} rows failed to write: {result.failed[0][1]}")
+
+            # write_rows hands back the same row objects, so failures map back by identity
+            errors = {id(row): error for row, error in result.failed}
+            for row, on_written in pending:
+                error = errors.get(id(row))
+                if on_written is None:
+                    if error is not None:
+                        self.failed.append((row, error))
+                    continue
+                try:
+                    on_written(error)
+                except Exception as e:
+                    print(f"Write callback for {row[0]} failed: {e}")
+            return result
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the timer and write whatever is left"""
+        self._stop.set()
+        self._thread.join()
+        return self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
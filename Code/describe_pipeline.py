@@ -0,0 +1,105 @@
+import os
+import random
+import threading
+import time
+from metrics import span
+from vision_api import get_image_description, describe_batch
+
+MAX_RETRIES = int(os.getenv("DESCRIBE_MAX_RETRIES", "5"))
+FRAMES_PER_REQUEST = int(os.getenv("DESCRIBE_FRAMES_PER_REQUEST", "4"))
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+
+class RateLimiter:
+    """Shared pause so one 429 backs off every worker, not just the one that saw it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def wait(self):
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+def _status_and_retry_after(error):
+    """Pull the HTTP status and Retry-After header out of an inference error, if present"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None, None
+    retry_after = None
+    try:
+        retry_after = float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        pass
+    return getattr(response, "status_code", None), retry_after
+
+
+def _unusable_reply(error):
+    """The model answered but the reply could not be used; HTTP errors from the client are ValueErrors too"""
+    return isinstance(error, ValueError) and _status_and_retry_after(error)[0] is None
+
+
+def _with_retry(call, limiter):
+    """Run an inference call, retrying transient failures with exponential backoff and jitter"""
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.wait()
+        try:
+            return call()
+        except Exception as e:
+            if _unusable_reply(e):
+                raise  # retrying the same request won't fix it
+            status, retry_after = _status_and_retry_after(e)
+            if status is not None and status < 500 and status != 429:
+                raise
+            if attempt == MAX_RETRIES:
+                raise
+            backoff = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if status == 429:
+                limiter.pause(retry_after if retry_after is not None else backoff)
+            else:
+                time.sleep(backoff)
+
+
+def describe_with_retry(api_key, public_url, limiter, base_url=None):
+    """Free-text description of one image"""
+    def call():
+        with span("describe"):
+            return get_image_description(api_key, public_url, base_url=base_url)
+    return _with_retry(call, limiter)
+
+
+def describe_batch_with_retry(api_key, public_urls, limiter, context=None, base_url=None):
+    """(description, structured) for several images from one request"""
+    def call():
+        with span("describe_batch"):
+            return describe_batch(api_key, public_urls, context=context, base_url=base_url)
+    return _with_retry(call, limiter)
+
+
+def camera_for(file_name):
+    """Camera id from a capture file name such as cam0_clip_12.jpg"""
+    return file_name.rsplit("_clip_", 1)[0] if "_clip_" in file_name else None
+
+
+def describe_frames(api_key, files, limiter, context=None, base_url=None):
+    """Describe one camera's batch as (file_name, public_url, description, structured) rows.
+
+    Falls back to one free-text request per frame when the batched reply can't be matched to the frames.
+    """
+    try:
+        described = describe_batch_with_retry(api_key, [url for _, url in files], limiter, context, base_url)
+        return [(name, url, description, structured) for (name, url), (description, structured) in zip(files, described)]
+    except ValueError as e:
+        if not _unusable_reply(e):
+            raise
+        print(f"Unusable batch reply for {files[0][0]} (+{len(files) - 1}): {e}")
+    return [(name, url, describe_with_retry(api_key, url, limiter, base_url), None) for name, url in files]
+
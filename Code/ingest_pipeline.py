@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from contextlib import suppress
+from functools import partial
+from describe_pipeline import RateLimiter, camera_for, describe_frames, FRAMES_PER_REQUEST
+from metrics import span, JOBS, QUEUE_DEPTH, QUEUE_AGE
+from clip_writer import BufferedClipWriter
+from supabase_init1 import upload_bytes_to_supabase, get_public_url
+from vision_api import load_camera_prompts
+
+UPLOAD_WORKERS = int(os.getenv("INGEST_UPLOAD_WORKERS", "4"))
+DESCRIBE_WORKERS = int(os.getenv("INGEST_DESCRIBE_WORKERS", "4"))
+INDEX_WORKERS = int(os.getenv("INGEST_INDEX_WORKERS", "1"))
+INDEX_BATCH_SIZE = int(os.getenv("INGEST_INDEX_BATCH", "25"))
+POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "0.5"))
+
+
+class IngestPipeline:
+    """Per-stage worker pools moving spooled frames through upload -> describe -> index.
+
+    Every stage reads its jobs from the WorkQueue and enqueues the next stage when it completes,
+    so work survives a crash and resumes on the next start. Stages can be redelivered, so each
+    one is idempotent: uploads overwrite the same object and rows are upserted on Clip_URL.
+    """
+
+    def __init__(self, supabase, work_queue, api_key, base_url=None, upload_workers=UPLOAD_WORKERS,
+                 describe_workers=DESCRIBE_WORKERS, index_workers=INDEX_WORKERS):
+        self.supabase = supabase
+        self.queue = work_queue
+        self.api_key = api_key
+        self.base_url = base_url
+        self.limiter = RateLimiter()
+        self.prompts = load_camera_prompts()
+        self.stop_event = threading.Event()
+        self.stages = [
+            ("upload", self._upload, 1, upload_workers),
+            ("describe", self._describe, max(1, FRAMES_PER_REQUEST), describe_workers),
+            ("index", self._index, INDEX_BATCH_SIZE, index_workers),
+        ]
+        self.threads = []
+        self.writer = None
+        QUEUE_DEPTH.collect = lambda: {(stage,): count for stage, count in work_queue.depth().items()}
+        QUEUE_AGE.collect = lambda: {(stage,): round(age, 3) for stage, age in work_queue.oldest_age().items()}
+
+    def _retry(self, job, error):
+        # Jobs of the batch that already completed are left alone by the queue
+        if self.queue.retry(job, error):
+            JOBS.inc(job.stage, "dead" if job.attempts >= self.queue.max_attempts else "retried")
+
+    def _worker(self, stage, handler, batch_size):
+        while not self.stop_event.is_set():
+            jobs = self.queue.claim(stage, batch_size)
+            if not jobs:
+                self.stop_event.wait(POLL_INTERVAL)
+                continue
+            try:
+                handler(jobs)
+            except Exception as e:
+                print(f"{stage} failed for {len(jobs)} job(s): {e}")
+                for job in jobs:
+                    self._retry(job, e)
+
+    def _upload(self, jobs):
+        for job in jobs:
+            session, file_name, path = job.payload["session"], job.payload["file_name"], job.payload["path"]
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError as e:
+                # The spooled frame is gone, no retry can bring it back
+                if self.queue.fail(job, e):
+                    JOBS.inc("upload", "dead")
+                continue
+            with span("upload"):
+                upload_bytes_to_supabase(self.supabase, data, session, file_name)
+            public_url = get_public_url(self.supabase, session, file_name)
+            self.queue.complete(job, "describe", {"file_name": file_name, "public_url": public_url})
+            JOBS.inc("upload", "done")
+            # The job is done either way; a spool file left behind is only disk space
+            with suppress(OSError):
+                os.remove(path)
+
+    def _describe(self, jobs):
+        by_camera = {}
+        for job in jobs:
+            by_camera.setdefault(camera_for(job.payload["file_name"]), []).append(job)
+
+        for camera_id, camera_jobs in by_camera.items():
+            files = [(job.payload["file_name"], job.payload["public_url"]) for job in camera_jobs]
+            try:
+                rows = describe_frames(self.api_key, files, self.limiter, self.prompts.get(camera_id), self.base_url)
+            except Exception as e:
+                print(f"Failed to describe {files[0][0]} (+{len(files) - 1}): {e}")
+                for job in camera_jobs:
+                    self._retry(job, e)
+                continue
+            for job, (file_name, public_url, description, structured) in zip(camera_jobs, rows):
+                self.queue.complete(job, "index", {
+                    "file_name": file_name,
+                    "public_url": public_url,
+                    "description": description,
+                    "structured": structured,
+                    "camera_id": camera_id
+                })
+                JOBS.inc("describe", "done")
+
+    def _index(self, jobs):
+        # Rows from every index worker share one buffer and go out as bulk upserts; a job stays
+        # leased until its row is written, so a crash before the flush redelivers it
+        for job in jobs:
+            payload = job.payload
+            # Jobs queued before the camera id was part of the payload still carry it in the file name
+            camera_id = payload.get("camera_id") or camera_for(payload["file_name"])
+            self.writer.add(payload["file_name"], payload["public_url"], payload["description"],
+                            payload["structured"], camera_id, on_written=partial(self._indexed, job))
+
+    def _indexed(self, job, error):
+        if error is None:
+            self.queue.complete(job)
+            JOBS.inc("index", "done")
+        else:
+            self._retry(job, error)
+
+    def start(self):
+        """Start every stage's workers; jobs left over from an earlier run are picked up first"""
+        self.queue.purge()
+        self.writer = BufferedClipWriter(self.supabase)
+        for stage, handler, batch_size, workers in self.stages:
+            for i in range(workers):
+                thread = threading.Thread(target=self._worker, args=(stage, handler, batch_size),
+                                          name=f"{stage}-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def drain(self, timeout=None):
+        """Wait until no job is pending or in flight; returns False if the timeout ran out first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.depth():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(POLL_INTERVAL)
+        return True
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+        if self.writer is not None:
+            # Write the rows still buffered so their jobs complete now rather than on redelivery
+            self.writer.close()
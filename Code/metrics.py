@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OTEL_TRACING = os.getenv("OTEL_TRACING", "false").lower() == "true"
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "clip-capture")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables the scrape endpoint
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition layout"""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labelvalues -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.setdefault(labelvalues, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Point-in-time values read from a callback at scrape time, e.g. queue depth"""
+
+    def __init__(self, name, help_text, labelnames=(), collect=None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.collect = collect  # returns {labelvalues tuple: value}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.collect() if self.collect else {}
+        except Exception:
+            values = {}
+        for labelvalues, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("clip_capture_stage_seconds", "Time spent in each ingestion stage", ("stage",))
+STAGE_ERRORS = Counter("clip_capture_stage_errors_total", "Ingestion stages that raised", ("stage",))
+FRAMES = Counter("clip_capture_frames_total", "Frames by outcome", ("camera", "outcome"))
+QUEUE_DEPTH = Gauge("clip_ingest_queue_depth", "Ingestion jobs waiting or in flight", ("stage",))
+QUEUE_AGE = Gauge("clip_ingest_queue_oldest_seconds", "Age of the oldest unfinished job", ("stage",))
+JOBS = Counter("clip_ingest_jobs_total", "Ingestion jobs by outcome", ("stage", "outcome"))
+ROWS = Counter("clip_ingest_rows_total", "Clip rows written to the database by outcome", ("outcome",))
+METRICS = [STAGE_SECONDS, STAGE_ERRORS, FRAMES, QUEUE_DEPTH, QUEUE_AGE, JOBS, ROWS]
+
+
+def _tracer():
+    if not OTEL_TRACING:
+        return None
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        print("OTEL_TRACING is set but the OpenTelemetry SDK/OTLP exporter is not installed")
+        return None
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    return trace.get_tracer(OTEL_SERVICE_NAME)
+
+
+_TRACER = _tracer()
+
+
+@contextmanager
+def span(stage, **attributes):
+    """Time an ingestion stage into clip_capture_stage_seconds, and trace it when OpenTelemetry is on"""
+    started = time.perf_counter()
+    otel_span = _TRACER.start_as_current_span(stage, attributes=attributes) if _TRACER else None
+    try:
+        if otel_span is not None:
+            with otel_span:
+                yield
+        else:
+            yield
+    except Exception:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage)
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve /metrics from a daemon thread; returns the server, or None when disabled"""
+    if not port:
+        return None
+    server = ThreadingHTTPServer(("", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,80 @@
+import os
+import numpy as np
+
+DIFF_THRESHOLD = float(os.getenv("MOTION_DIFF_THRESHOLD", "0.03"))
+HASH_THRESHOLD = int(os.getenv("MOTION_HASH_THRESHOLD", "6"))
+KEEPALIVE_INTERVAL = float(os.getenv("MOTION_KEEPALIVE_INTERVAL", "300"))
+SIGNATURE_SIZE = 32
+
+# BGR -> luma weights, matching OpenCV's channel order
+LUMA_WEIGHTS = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+
+def _block_mean(gray, rows, cols):
+    """Downscale by averaging equal blocks; the frame is cropped to a multiple of the grid"""
+    h, w = gray.shape
+    bh, bw = max(h // rows, 1), max(w // cols, 1)
+    cropped = gray[:bh * rows, :bw * cols]
+    return cropped.reshape(rows, bh, cols, bw).mean(axis=(1, 3))
+
+
+def frame_signature(frame):
+    """Return (grayscale thumbnail in [0, 1], 64-bit difference hash) for a BGR or gray frame"""
+    frame = np.asarray(frame)
+    # Subsample before the colour conversion so the work is proportional to the thumbnail
+    step = max(min(frame.shape[0], frame.shape[1]) // (SIGNATURE_SIZE * 4), 1)
+    small = frame[::step, ::step]
+    gray = small.astype(np.float32) @ LUMA_WEIGHTS if small.ndim == 3 else small.astype(np.float32)
+    thumb = _block_mean(gray, SIGNATURE_SIZE, SIGNATURE_SIZE) / 255.0
+
+    hash_grid = _block_mean(gray, 8, 9)
+    bits = (hash_grid[:, 1:] > hash_grid[:, :-1]).ravel()
+    return thumb, np.packbits(bits)
+
+
+def hamming(a, b):
+    return int(np.unpackbits(np.bitwise_xor(a, b)).sum())
+
+
+class MotionGate:
+    """Drops near-duplicate frames per camera, still keeping one every keep-alive interval"""
+
+    def __init__(self, diff_threshold=DIFF_THRESHOLD, hash_threshold=HASH_THRESHOLD, keepalive=KEEPALIVE_INTERVAL):
+        self.diff_threshold = diff_threshold
+        self.hash_threshold = hash_threshold
+        self.keepalive = keepalive
+        self.last_thumb = None
+        self.last_hash = None
+        self.last_kept = None
+        self.kept = 0
+        self.skipped = 0
+
+    def should_keep(self, frame, now):
+        """Decide whether a frame differs enough from the last kept one to upload it"""
+        thumb, frame_hash = frame_signature(frame)
+
+        keep = (
+            self.last_thumb is None
+            or now - self.last_kept >= self.keepalive
+            or hamming(frame_hash, self.last_hash) >= self.hash_threshold
+            or float(np.abs(thumb - self.last_thumb).mean()) >= self.diff_threshold
+        )
+        if keep:
+            self.last_thumb, self.last_hash, self.last_kept = thumb, frame_hash, now
+            self.kept += 1
+        else:
+            self.skipped += 1
+        return keep
+
+
+def parse_thresholds(spec):
+    """Parse per-camera overrides like "cam0=0.02:4,cam1=0.05" (diff[:hash]) into gates"""
+    gates = {}
+    for entry in filter(None, (part.strip() for part in (spec or "").split(","))):
+        camera_id, _, values = entry.partition("=")
+        diff, _, hash_bits = values.partition(":")
+        gates[camera_id.strip()] = MotionGate(
+            diff_threshold=float(diff) if diff else DIFF_THRESHOLD,
+            hash_threshold=int(hash_bits) if hash_bits else HASH_THRESHOLD
+        )
+    return gates
@@ -1,35 +1,40 @@
 import os
 
 def upload_to_supabase(supabase, file_path, session_timestamp, file_name):
-    print(f"Pushing {file_name} to bucket: ")
-
     with open(file_path, "rb") as f:
         supabase.storage.from_("videostorage").upload(
             f"{session_timestamp}/{file_name}", f, {"content-type": "image/jpeg"}
         )
 
-    print(f"Uploaded: {file_name} to folder {session_timestamp}")
-
-def fetch_uploaded_files(supabase, session_timestamp):
-    file_list_response = supabase.storage.from_("videostorage").list(session_timestamp)
-
-    file_urls = []
-    if file_list_response:
-        for file_info in file_list_response:
-            file_name = file_info["name"]
-            public_url = supabase.storage.from_("videostorage").get_public_url(f"{session_timestamp}/{file_name}").strip()
-            file_urls.append((file_name, public_url))
-            print(f"File: {file_name}, URL: {public_url}")
-    else:
-        print("No files in bucket")
-
-    return file_urls
-
-def insert_into_database(supabase, file_name, public_url, description):
-    supabase.table("todos").insert({
-        "Clip_Name": file_name,  
-        "Clip_URL": public_url,
-        "Clip_Description": description
-    }).execute()
-
-    print("Data successfully added to the database!")
\ No newline at end of file
+def upload_bytes_to_supabase(supabase, data, session_timestamp, file_name):
+    """Upload an already-encoded JPEG held in memory (bytes or a memoryview); re-uploading overwrites"""
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    supabase.storage.from_("videostorage").upload(
+        f"{session_timestamp}/{file_name}", data, {"content-type": "image/jpeg", "upsert": "true"}
+    )
+
+def get_public_url(supabase, session_timestamp, file_name):
+    return supabase.storage.from_("videostorage").get_public_url(f"{session_timestamp}/{file_name}").strip()
+
+def insert_into_database(supabase, file_name, public_url, description, structured=None, camera_id=None):
+    """Single-row write; prefer clip_writer.BufferedClipWriter when writing more than one"""
+    insert_many_into_database(supabase, [(file_name, public_url, description, structured, camera_id)])
+
+def insert_many_into_database(supabase, rows):
+    """Upsert (file_name, public_url, description, structured, camera_id) tuples with a single request.
+
+    Rows are keyed on Clip_URL, so inserting the same frame twice leaves one row.
+    """
+    if not rows:
+        return
+    supabase.table("todos").upsert([
+        {
+            "Clip_Name": file_name,
+            "Clip_URL": public_url,
+            "Clip_Description": description,
+            "Clip_Attributes": structured,
+            "camera_id": camera_id
+        }
+        for file_name, public_url, description, structured, camera_id in rows
+    ], on_conflict="Clip_URL").execute()
\ No newline at end of file
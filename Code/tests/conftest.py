@@ -0,0 +1,117 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import pytest
+
+# Offline settings, applied before the ingestion modules are first imported
+os.environ.setdefault("VLM_BACKEND", "fake")
+os.environ.setdefault("WRITE_FLUSH_INTERVAL", "0.05")
+os.environ.setdefault("INGEST_POLL_INTERVAL", "0.05")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeTable:
+    """Records upserts keyed on Clip_URL; rows whose description is "reject" fail the request"""
+
+    def __init__(self):
+        self.rows = {}
+        self.requests = 0
+
+    def upsert(self, rows, on_conflict=None):
+        def execute():
+            self.requests += 1
+            if any(row["Clip_Description"] == "reject" for row in rows):
+                raise ValueError("rejected row")
+            for row in rows:
+                self.rows[row[on_conflict]] = row
+        return SimpleNamespace(execute=execute)
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects = {}
+
+    def upload(self, path, data, options=None):
+        self.objects[path] = bytes(data)
+
+    def get_public_url(self, path):
+        return f"https://storage.test/videostorage/{path}"
+
+
+class FakeSupabase:
+    """The parts of the Supabase client the ingestion pipeline uses"""
+
+    def __init__(self):
+        self.todos = FakeTable()
+        self.bucket = FakeBucket()
+        self.storage = SimpleNamespace(from_=lambda name: self.bucket)
+
+    def table(self, name):
+        return self.todos
+
+
+@pytest.fixture
+def supabase():
+    return FakeSupabase()
+
+
+class StubInferenceHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible chat completions that describe each image by its file name"""
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        content = request["messages"][-1]["content"]
+        names = [part["image_url"]["url"].rsplit("/", 1)[-1] for part in content if part["type"] == "image_url"]
+        batched = "JSON array" in content[0]["text"]
+        with server.lock:
+            server.requests.append({"path": self.path, "images": names, "batched": batched})
+            status = server.fail_next.pop(0) if server.fail_next else 200
+        if status != 200:
+            self.send_error(status)
+            return
+
+        if batched and server.batch_reply is not None:
+            reply = server.batch_reply
+        elif batched:
+            reply = json.dumps([
+                {"description": f"A person near the door ({name}).", "objects": ["person"], "colors": [],
+                 "actions": ["standing"], "counts": {"person": 1}}
+                for name in names
+            ])
+        else:
+            reply = f"A person near the door ({names[0]})."
+        body = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": reply}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def inference_server(monkeypatch):
+    """Local stub inference server; set fail_next to HTTP statuses to fail the next requests"""
+    import vision_api
+    monkeypatch.setattr(vision_api, "VLM_BACKEND", "hf")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubInferenceHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.fail_next = []
+    server.batch_reply = None
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,46 @@
+import pytest
+import describe_pipeline
+from describe_pipeline import RateLimiter, describe_frames
+
+FILES = [(f"cam0_clip_{i}.jpg", f"https://storage.test/videostorage/s/cam0_clip_{i}.jpg") for i in range(3)]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(describe_pipeline, "BASE_BACKOFF", 0)
+
+
+def describe(inference_server, files=FILES):
+    return describe_frames("key", files, RateLimiter(), "Front door camera.", inference_server.base_url)
+
+
+def test_batch_is_described_in_one_request(inference_server):
+    rows = describe(inference_server)
+    assert [row[0] for row in rows] == [name for name, _ in FILES]
+    assert rows[1][2] == "A person near the door (cam0_clip_1.jpg)."
+    assert rows[1][3]["objects"] == ["person"]
+    assert len(inference_server.requests) == 1
+    assert inference_server.requests[0]["path"] == "/v1/chat/completions"
+
+
+def test_server_errors_are_retried(inference_server):
+    inference_server.fail_next = [429, 500]
+    rows = describe(inference_server)
+    assert [row[3] is not None for row in rows] == [True, True, True]
+    # The same batch request three times, no per-frame fallback
+    assert [request["batched"] for request in inference_server.requests] == [True, True, True]
+
+
+def test_client_errors_are_not_retried(inference_server):
+    inference_server.fail_next = [400]
+    with pytest.raises(Exception):
+        describe(inference_server)
+    assert len(inference_server.requests) == 1
+
+
+def test_unusable_batch_reply_falls_back_to_one_request_per_frame(inference_server):
+    inference_server.batch_reply = '[{"description": "only one frame"}]'
+    rows = describe(inference_server)
+    assert [row[2] for row in rows] == [f"A person near the door ({name})." for name, _ in FILES]
+    assert all(row[3] is None for row in rows)
+    assert [request["batched"] for request in inference_server.requests] == [True, False, False, False]
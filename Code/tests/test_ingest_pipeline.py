@@ -0,0 +1,119 @@
+import pytest
+import clip_writer
+from ingest_pipeline import IngestPipeline
+from work_queue import WorkQueue
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(clip_writer, "BASE_BACKOFF", 0)
+
+
+@pytest.fixture
+def work_queue(tmp_path):
+    work_queue = WorkQueue(str(tmp_path / "queue.sqlite3"), max_attempts=2)
+    yield work_queue
+    work_queue.close()
+
+
+def enqueue_described(work_queue, count, rejected=()):
+    for i in range(count):
+        file_name = f"cam0_clip_{i}.jpg"
+        work_queue.put("index", file_name, {
+            "file_name": file_name,
+            "public_url": f"https://storage.test/videostorage/s/{file_name}",
+            "description": "reject" if i in rejected else "A still frame.",
+            "structured": None
+        })
+
+
+def job_statuses(work_queue, stage):
+    return dict(work_queue.conn.execute("SELECT key, status FROM jobs WHERE stage = ?", (stage,)).fetchall())
+
+
+def test_index_stage_writes_through_one_buffer(supabase, work_queue):
+    enqueue_described(work_queue, 60)
+    pipeline = IngestPipeline(supabase, work_queue, "key", index_workers=2)
+    pipeline.start()
+    assert pipeline.drain(timeout=10)
+    pipeline.stop()
+
+    assert len(supabase.todos.rows) == 60
+    # Claims of INGEST_INDEX_BATCH rows from two workers are combined into larger upserts
+    assert supabase.todos.requests < 60 / 25
+    assert set(job_statuses(work_queue, "index").values()) == {"done"}
+    # Index jobs queued without a camera id take it from the file name
+    assert {row["camera_id"] for row in supabase.todos.rows.values()} == {"cam0"}
+
+
+def test_rejected_row_is_retried_without_failing_the_batch(supabase, work_queue):
+    enqueue_described(work_queue, 5, rejected={0})
+    pipeline = IngestPipeline(supabase, work_queue, "key")
+    pipeline.start()
+    assert pipeline.drain(timeout=10)
+    pipeline.stop()
+
+    statuses = job_statuses(work_queue, "index")
+    assert statuses.pop("cam0_clip_0.jpg") == "dead"
+    assert set(statuses.values()) == {"done"}
+    assert len(supabase.todos.rows) == 4
+
+
+def spool_frames(tmp_path, work_queue, cameras, per_camera):
+    session = "2025-06-18_12-00-00"
+    for camera_id in cameras:
+        for i in range(per_camera):
+            file_name = f"{camera_id}_clip_{i}.jpg"
+            path = tmp_path / file_name
+            path.write_bytes(b"\xff\xd8 frame \xff\xd9")
+            work_queue.put("upload", f"{session}/{file_name}", {"session": session, "file_name": file_name, "path": str(path)})
+    return session
+
+
+def test_spooled_frames_become_clip_rows(tmp_path, supabase, work_queue, inference_server):
+    session = spool_frames(tmp_path, work_queue, ["cam0", "cam1"], 5)
+    pipeline = IngestPipeline(supabase, work_queue, "key", base_url=inference_server.base_url)
+    pipeline.start()
+    assert pipeline.drain(timeout=20)
+    pipeline.stop()
+
+    assert len(supabase.bucket.objects) == 10
+    assert not list(tmp_path.glob("*.jpg"))
+    rows = supabase.todos.rows
+    assert len(rows) == 10
+    row = rows[f"https://storage.test/videostorage/{session}/cam1_clip_3.jpg"]
+    assert row["Clip_Name"] == "cam1_clip_3.jpg"
+    assert row["Clip_Description"] == "A person near the door (cam1_clip_3.jpg)."
+    assert row["Clip_Attributes"]["counts"] == {"person": 1}
+    assert row["camera_id"] == "cam1"
+    # Frames are described in batches, and a batch never mixes cameras
+    batches = [request["images"] for request in inference_server.requests]
+    assert len(batches) < 10
+    assert all(len({name.split("_")[0] for name in images}) == 1 for images in batches)
+
+
+def test_late_failure_does_not_reopen_a_completed_job(work_queue):
+    work_queue.put("upload", "a", {})
+    work_queue.put("upload", "b", {})
+    first, second = work_queue.claim("upload", 2)
+    work_queue.complete(first, "describe", {})
+
+    # e.g. the worker's handler raising after part of its batch completed
+    assert not work_queue.retry(first, "late")
+    assert not work_queue.fail(first, "late")
+    assert work_queue.retry(second, "boom")
+    assert job_statuses(work_queue, "upload") == {"a": "done", "b": "pending"}
+
+
+def test_upload_is_not_retried_when_the_spool_file_cannot_be_removed(tmp_path, supabase, work_queue, monkeypatch):
+    spool_frames(tmp_path, work_queue, ["cam0"], 2)
+    pipeline = IngestPipeline(supabase, work_queue, "key")
+
+    def remove(path):
+        raise PermissionError(path)
+
+    monkeypatch.setattr("ingest_pipeline.os.remove", remove)
+    pipeline._upload(work_queue.claim("upload", 2))
+
+    assert set(job_statuses(work_queue, "upload").values()) == {"done"}
+    assert len(job_statuses(work_queue, "describe")) == 2
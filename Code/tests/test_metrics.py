@@ -0,0 +1,15 @@
+from metrics import Counter, Histogram
+
+
+def test_label_values_are_escaped():
+    counter = Counter("frames_total", "Frames", ("camera", "outcome"))
+    counter.inc('lobby "east"', "back\\slash\nnewline")
+    assert counter.render()[-1] == 'frames_total{camera="lobby \\"east\\"",outcome="back\\\\slash\\nnewline"} 1'
+
+
+def test_histogram_series_keep_their_le_label():
+    histogram = Histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.5, 'up"load')
+    lines = histogram.render()
+    assert 'stage_seconds_bucket{stage="up\\"load",le="1.0"} 1' in lines
+    assert 'stage_seconds_count{stage="up\\"load"} 1' in lines
@@ -1,12 +1,67 @@
+import json
+import os
+import threading
+from types import SimpleNamespace
 from huggingface_hub import InferenceClient
 
+VISION_MODEL = "meta-llama/Llama-3.2-11B-Vision-Instruct"
+TOKENS_PER_IMAGE = int(os.getenv("VLM_TOKENS_PER_IMAGE", "300"))
+CAMERA_PROMPTS_PATH = os.getenv("CAMERA_PROMPTS_PATH", "")
+# "hf" for Hugging Face or an OpenAI-compatible server at HF_INFERENCE_URL (e.g. a local llama.cpp or vLLM),
+# "fake" for canned offline replies
+VLM_BACKEND = os.getenv("VLM_BACKEND", "hf")
+
+STRUCTURED_FIELDS = ("objects", "colors", "actions", "counts")
+
+BATCH_PROMPT = """{context}You are given {count} surveillance camera frames, in order.
+For each frame, describe what is visible and extract structured fields.
+Respond with only a JSON array of {count} objects, one per frame in the same order:
+[{{"description": "one or two sentences", "objects": ["person", "car"], "colors": ["red car", "black shirt"],
+"actions": ["walking"], "counts": {{"person": 1, "car": 1}}}}]"""
+
+class FakeVisionClient:
+    """Offline stand-in for InferenceClient that answers every request with well-formed descriptions"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, max_tokens=None):
+        content = messages[-1]["content"]
+        names = [part["image_url"]["url"].rsplit("/", 1)[-1] for part in content if part["type"] == "image_url"]
+        if "JSON array" in content[0]["text"]:
+            reply = json.dumps([
+                {"description": f"A still frame ({name}).", "objects": [], "colors": [], "actions": [], "counts": {}}
+                for name in names
+            ])
+        else:
+            reply = f"A still frame ({names[0]})." if names else ""
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key, base_url=None):
+    """Return a shared InferenceClient for this key/endpoint instead of building one per call"""
+    key = (api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            if VLM_BACKEND == "fake":
+                client = FakeVisionClient()
+            elif base_url:
+                # e.g. a local OpenAI-compatible stub server
+                client = InferenceClient(base_url=base_url, api_key=api_key)
+            else:
+                client = InferenceClient(provider="hf-inference", api_key=api_key)
+            _clients[key] = client
+    return client
+
 
 #code from generates only basic description, needs to be edited based on user needs.
-def get_image_description(api_key, image_url):
-    client = InferenceClient(
-        provider="hf-inference",
-        api_key=api_key
-    )
+def get_image_description(api_key, image_url, base_url=None):
+    client = get_client(api_key, base_url)
 
     messages = [
         {
@@ -19,9 +74,61 @@ def get_image_description(api_key, image_url):
     ]
 
     completion = client.chat.completions.create(
-        model="meta-llama/Llama-3.2-11B-Vision-Instruct",
+        model=VISION_MODEL,
         messages=messages,
         max_tokens=500
     )
 
-    return completion.choices[0].message.content  
\ No newline at end of file
+    return completion.choices[0].message.content
+
+
+def load_camera_prompts(path=CAMERA_PROMPTS_PATH):
+    """Per-camera prompt context from a JSON file, e.g. {"cam0": "Front door camera facing the street."}"""
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_batch_prompt(count, context=None):
+    return BATCH_PROMPT.format(count=count, context=f"{context.strip()}\n" if context else "")
+
+
+def _normalize(item):
+    """One frame's structured output with every field present and the expected types"""
+    if not isinstance(item, dict):
+        raise ValueError(f"Expected a JSON object per frame, got {type(item).__name__}")
+    counts = item.get("counts") if isinstance(item.get("counts"), dict) else {}
+    structured = {
+        field: [str(value) for value in item.get(field) or [] if value]
+        for field in STRUCTURED_FIELDS if field != "counts"
+    }
+    structured["counts"] = {str(name): int(n) for name, n in counts.items() if isinstance(n, (int, float))}
+    return str(item.get("description") or "").strip(), structured
+
+
+def parse_batch_response(text, expected):
+    """Split a batched reply into (description, structured) pairs; raises ValueError when it doesn't line up"""
+    start = text.find("[")
+    if start == -1:
+        raise ValueError("No JSON array in the model response")
+    items, _ = json.JSONDecoder().raw_decode(text[start:])
+    if not isinstance(items, list) or len(items) != expected:
+        raise ValueError(f"Expected {expected} frames in the model response, got {len(items) if isinstance(items, list) else 0}")
+    return [_normalize(item) for item in items]
+
+
+def describe_batch(api_key, image_urls, context=None, base_url=None):
+    """Describe several frames with one request; returns a (description, structured) pair per frame"""
+    client = get_client(api_key, base_url)
+
+    content = [{"type": "text", "text": build_batch_prompt(len(image_urls), context)}]
+    content.extend({"type": "image_url", "image_url": {"url": url}} for url in image_urls)
+
+    completion = client.chat.completions.create(
+        model=VISION_MODEL,
+        messages=[{"role": "user", "content": content}],
+        max_tokens=TOKENS_PER_IMAGE * len(image_urls)
+    )
+
+    return parse_batch_response(completion.choices[0].message.content, len(image_urls))
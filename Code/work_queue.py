@@ -0,0 +1,145 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "ingest_queue.sqlite3")
+LEASE_SECONDS = float(os.getenv("INGEST_LEASE_SECONDS", "300"))
+MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "8"))
+BASE_BACKOFF = 2.0
+MAX_BACKOFF = 300.0
+
+Job = namedtuple("Job", "id stage key payload attempts")
+
+
+class WorkQueue:
+    """Durable at-least-once job queue in a SQLite WAL file, shared by every ingestion stage.
+
+    A claimed job is leased rather than removed; if its worker dies before complete() the lease
+    runs out and the job is handed out again. Jobs are unique per (stage, key), so re-enqueueing
+    the same frame is a no-op and a redelivered job can't fan out twice.
+    """
+
+    def __init__(self, path=QUEUE_PATH, lease=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    stage TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    error TEXT,
+                    UNIQUE (stage, key)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready_idx ON jobs (stage, status, available_at)")
+
+    def _insert(self, stage, key, payload, now):
+        self.conn.execute(
+            "INSERT OR IGNORE INTO jobs (stage, key, payload, available_at, created_at) VALUES (?, ?, ?, ?, ?)",
+            (stage, key, json.dumps(payload), now, now)
+        )
+
+    def put(self, stage, key, payload):
+        """Enqueue a job; a job already queued for this stage and key is left as it is"""
+        with self._lock:
+            self._insert(stage, key, payload, time.time())
+
+    def claim(self, stage, limit=1):
+        """Lease up to `limit` ready jobs of a stage, oldest first; expired leases count as ready"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute(
+                    "SELECT id, key, payload, attempts FROM jobs "
+                    "WHERE stage = ? AND status IN ('pending', 'leased') AND available_at <= ? "
+                    "ORDER BY available_at LIMIT ?",
+                    (stage, now, limit)
+                ).fetchall()
+                self.conn.executemany(
+                    "UPDATE jobs SET status = 'leased', attempts = attempts + 1, available_at = ? WHERE id = ?",
+                    [(now + self.lease, row[0]) for row in rows]
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [Job(job_id, stage, key, json.loads(payload), attempts + 1) for job_id, key, payload, attempts in rows]
+
+    def complete(self, job, next_stage=None, next_payload=None):
+        """Mark a job done and, in the same transaction, enqueue its follow-up stage"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("UPDATE jobs SET status = 'done', error = NULL WHERE id = ?", (job.id,))
+                if next_stage is not None:
+                    self._insert(next_stage, job.key, next_payload, now)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def retry(self, job, error):
+        """Back off and retry a failed job, or park it as dead once it has used its attempts.
+
+        Only a job still leased is moved, so a late failure can't undo a complete(); returns
+        whether the job was moved.
+        """
+        if job.attempts >= self.max_attempts:
+            return self.fail(job, error)
+        delay = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (job.attempts - 1))
+        with self._lock:
+            return self.conn.execute(
+                "UPDATE jobs SET status = 'pending', available_at = ?, error = ? WHERE id = ? AND status = 'leased'",
+                (time.time() + delay, str(error), job.id)
+            ).rowcount > 0
+
+    def fail(self, job, error):
+        """Park a leased job that can never succeed; it stays in the table for inspection"""
+        with self._lock:
+            return self.conn.execute(
+                "UPDATE jobs SET status = 'dead', error = ? WHERE id = ? AND status = 'leased'", (str(error), job.id)
+            ).rowcount > 0
+
+    def depth(self, stage=None):
+        """Jobs not yet done, per stage"""
+        sql = "SELECT stage, COUNT(*) FROM jobs WHERE status IN ('pending', 'leased')"
+        params = ()
+        if stage is not None:
+            sql += " AND stage = ?"
+            params = (stage,)
+        with self._lock:
+            counts = dict(self.conn.execute(sql + " GROUP BY stage", params).fetchall())
+        return counts.get(stage, 0) if stage is not None else counts
+
+    def oldest_age(self):
+        """Seconds the oldest unfinished job of each stage has been waiting"""
+        now = time.time()
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT stage, MIN(created_at) FROM jobs WHERE status IN ('pending', 'leased') GROUP BY stage"
+            ).fetchall()
+        return {stage: now - created_at for stage, created_at in rows}
+
+    def purge(self, older_than=24 * 3600):
+        """Delete finished jobs created more than `older_than` seconds ago"""
+        with self._lock:
+            self.conn.execute("DELETE FROM jobs WHERE status = 'done' AND created_at < ?", (time.time() - older_than,))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -1,16 +1,23 @@
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi import FastAPI, Request, HTTPException, Depends
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
-from search import ClipSearchEngine
+import asyncio
+import json
+import time
 import uvicorn
-import base64
-from db import SupabaseConnector
+from services import default_services
+from config import IMAGE_CACHE_MAX_AGE, SEARCH_TIMEOUT
+from metrics import span, render_metrics, configure_tracing
 
 
 app = FastAPI(title="Clip Search Engine")
 
-# Initialize search engine
-search_engine = ClipSearchEngine()
+# Clients are built on first use (or by the startup warmup) and shared by every request;
+# database and LLM calls are awaited so one worker serves many searches
+services = default_services()
+SearchEngine = Depends(services.dependency("search_engine"))
+Database = Depends(services.dependency("db"))
+Blobs = Depends(services.dependency("blob_store"))
 
 # Model for search query
 class SearchQuery(BaseModel):
@@ -224,7 +231,7 @@ HTML_CONTENT = """
             function isImageUrl(url) {
                 const imageExtensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.svg'];
                 const lowerCaseUrl = url.toLowerCase();
-                return lowerCaseUrl.startsWith('data:image/') || imageExtensions.some(ext => lowerCaseUrl.endsWith(ext));
+                return lowerCaseUrl.startsWith('data:image/') || lowerCaseUrl.startsWith('/api/image/') || imageExtensions.some(ext => lowerCaseUrl.endsWith(ext));
             }
 
             // Function to check if URL is a video
@@ -248,7 +255,7 @@ HTML_CONTENT = """
             }
 
             // Function to create appropriate media element
-            function createMediaElement(url) {
+            function createMediaElement(url, fullUrl) {
                 if (isImageUrl(url)) {
                     // Create image container
                     const container = document.createElement('div');
@@ -259,12 +266,22 @@ HTML_CONTENT = """
                     img.className = 'result-image';
                     img.src = url;
                     img.alt = 'Clip result';
+                    img.loading = 'lazy';
                     img.onerror = function() {
                         this.onerror = null;
                         this.src = 'https://via.placeholder.com/400x300?text=Image+Not+Available';
                     };
                     
-                    container.appendChild(img);
+                    // Link the preview to the full-size frame when one is available
+                    if (fullUrl) {
+                        const link = document.createElement('a');
+                        link.href = fullUrl;
+                        link.target = '_blank';
+                        link.appendChild(img);
+                        container.appendChild(link);
+                    } else {
+                        container.appendChild(img);
+                    }
                     return container;
                 } else if (isVideoUrl(url)) {
                     // For simplicity, treat as generic video link
@@ -300,47 +317,111 @@ HTML_CONTENT = """
                 }
             }
 
-            // Function to display search results
-            function displayResults(results) {
-                const aiMessage = document.createElement('div');
-                aiMessage.className = 'ai-message';
+            // Function to build one result card
+            function createResultElement(result) {
+                const resultDiv = document.importNode(resultTemplate.content, true).firstElementChild;
                 
-                if (results.length === 0) {
-                    aiMessage.textContent = 'No matching clips found. Try a different search.';
-                    chatContainer.appendChild(aiMessage);
-                    return;
+                resultDiv.querySelector('.result-name').textContent = result.name;
+                resultDiv.querySelector('.result-relevance').textContent = `Relevance: ${result.relevance}`;
+
+                if (result.time_stamp) {
+                    const timestamp = new Date(result.time_stamp);
+                    const timestampElement = document.createElement('p');
+                    timestampElement.className = 'result-timestamp';
+                    timestampElement.textContent = `Recorded: ${timestamp.toLocaleString()}`;
+                    resultDiv.querySelector('.result-description').after(timestampElement);
+                }
+
+                resultDiv.querySelector('.result-description').textContent = result.description;
+                
+                const mediaContainer = resultDiv.querySelector('.media-container');
+                const mediaElement = createMediaElement(result.url, result.full_url);
+                mediaContainer.appendChild(mediaElement);
+                return resultDiv;
+            }
+
+            // A result group is updated in place as refined rankings stream in
+            function createResultGroup() {
+                const message = document.createElement('div');
+                message.className = 'ai-message';
+                const list = document.createElement('div');
+                return { message, list, items: new Map(), attached: false };
+            }
+
+            function renderResults(group, results, final) {
+                if (!group.attached) {
+                    chatContainer.appendChild(group.message);
+                    chatContainer.appendChild(group.list);
+                    group.attached = true;
                 }
 
-                aiMessage.textContent = `Found ${results.length} relevant clips:`;
-                chatContainer.appendChild(aiMessage);
+                if (final && results.length === 0) {
+                    group.message.textContent = 'No matching clips found. Try a different search.';
+                } else if (final) {
+                    group.message.textContent = `Found ${results.length} relevant clips:`;
+                } else {
+                    group.message.textContent = `Found ${results.length} candidate clips, refining...`;
+                }
 
-                // Display each result
+                // Reuse existing cards so thumbnails are not reloaded, and reorder them by the new ranking
+                const keep = new Set();
                 results.forEach(result => {
-                    const resultDiv = document.importNode(resultTemplate.content, true);
-                    
-                    resultDiv.querySelector('.result-name').textContent = result.name;
-                    resultDiv.querySelector('.result-relevance').textContent = `Relevance: ${result.relevance}`;
-
-                    if (result.time_stamp) {
-                                const timestamp = new Date(result.time_stamp);
-                                const timestampElement = document.createElement('p');
-                                timestampElement.className = 'result-timestamp';
-                                timestampElement.textContent = `Recorded: ${timestamp.toLocaleString()}`;
-                                resultDiv.querySelector('.result-description').after(timestampElement);
-                        }
-
-                    resultDiv.querySelector('.result-description').textContent = result.description;
-                    
-                    const mediaContainer = resultDiv.querySelector('.media-container');
-                    const mediaElement = createMediaElement(result.url);
-                    mediaContainer.appendChild(mediaElement);
-                    
-                    chatContainer.appendChild(resultDiv);
+                    const key = String(result.id);
+                    let element = group.items.get(key);
+                    if (!element) {
+                        element = createResultElement(result);
+                        group.items.set(key, element);
+                    } else {
+                        element.querySelector('.result-relevance').textContent = `Relevance: ${result.relevance}`;
+                    }
+                    keep.add(key);
+                    group.list.appendChild(element);
+                });
+                group.items.forEach((element, key) => {
+                    if (!keep.has(key)) {
+                        element.remove();
+                        group.items.delete(key);
+                    }
                 });
 
                 chatContainer.scrollTop = chatContainer.scrollHeight;
             }
 
+            // Function to display search results
+            function displayResults(results) {
+                renderResults(createResultGroup(), results, true);
+            }
+
+            // Stream candidates and refined rankings over server-sent events
+            function streamSearch(query) {
+                const group = createResultGroup();
+                let lastResults = null;
+                const source = new EventSource(`/api/search/stream?q=${encodeURIComponent(query)}`);
+
+                source.addEventListener('results', (event) => {
+                    removeLoadingIndicator();
+                    lastResults = JSON.parse(event.data).results;
+                    renderResults(group, lastResults, false);
+                });
+
+                source.addEventListener('done', () => {
+                    source.close();
+                    removeLoadingIndicator();
+                    renderResults(group, lastResults || [], true);
+                });
+
+                source.addEventListener('error', (event) => {
+                    source.close();
+                    removeLoadingIndicator();
+                    if (lastResults) {
+                        renderResults(group, lastResults, true);
+                    } else {
+                        console.error('Error:', event.data || 'stream closed');
+                        addMessage('Sorry, there was an error processing your search. Please try again.', 'ai-message');
+                    }
+                });
+            }
+
             // Function to perform search
             async function performSearch(query) {
                 if (!query.trim()) return;
@@ -351,6 +432,11 @@ HTML_CONTENT = """
                 // Show loading indicator
                 addLoadingIndicator();
 
+                if (window.EventSource) {
+                    streamSearch(query);
+                    return;
+                }
+
                 try {
                     const response = await fetch('/api/search', {
                         method: 'POST',
@@ -408,62 +494,143 @@ async def home():
 
 
 @app.get("/api/image/{clip_id}")
-async def get_image(clip_id: str):
-    # Get the specific image from database
-    db_connector = SupabaseConnector()
-    response = db_connector.client.table("todos").select("base_64_image").eq("id", clip_id).execute()
+async def get_image(clip_id: str, request: Request, size: str = "full", db=Database, blob_store=Blobs):
+    if size not in ("thumb", "full"):
+        raise HTTPException(status_code=400, detail="size must be 'thumb' or 'full'")
     
-    if not response.data:
-        return HTTPException(status_code=404, detail="Image not found")
+    # Frames are pulled from the database once, then served from the blob store. The store
+    # does file I/O, SQLite lookups and image resizing, so it runs in a worker thread
+    digest = await asyncio.to_thread(blob_store.digest_for, clip_id)
+    if digest is None:
+        base64_data = await db.get_clip_image(clip_id)
+        if not base64_data:
+            raise HTTPException(status_code=404, detail="Image not found")
+        try:
+            digest = await asyncio.to_thread(blob_store.ingest, clip_id, base64_data)
+        except Exception as e:
+            print(f"Error decoding image: {e}")
+            raise HTTPException(status_code=500, detail="Error processing image")
     
-    base64_data = response.data[0]["base_64_image"]
+    etag = f'"{digest}-{size}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={IMAGE_CACHE_MAX_AGE}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
     
-    # If base64 includes a data URI prefix, remove it
-    if "," in base64_data:
-        _, base64_data = base64_data.split(",", 1)
-    
-    # Decode the base64 data
-    try:
-        image_data = base64.b64decode(base64_data)
-        return Response(content=image_data, media_type="image/jpeg")
-    except Exception as e:
-        print(f"Error decoding image: {e}")
-        return HTTPException(status_code=500, detail="Error processing image")
+    image_data, content_type = await asyncio.to_thread(blob_store.read, digest, size)
+    if image_data is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return Response(content=image_data, media_type=content_type, headers=headers)
 
 # API endpoint 
 @app.post("/api/search")
-async def search(query: SearchQuery):
-    results = search_engine.search(query.query)
+async def search(query: SearchQuery, request: Request, search_engine=SearchEngine):
+    search_task = asyncio.create_task(search_engine.search(query.query))
+    disconnect_task = asyncio.create_task(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {search_task, disconnect_task},
+            timeout=SEARCH_TIMEOUT,
+            return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        disconnect_task.cancel()
     
-    # Format the results
-    formatted_results = []
-    for clip in results:
-        relevance = clip.get("relevance_score", 0) * 100
+    # Abandoned or overdue searches are cancelled so their LLM and database calls stop too
+    if search_task not in done:
+        search_task.cancel()
+        if disconnect_task in done:
+            print(f"Client disconnected, cancelled search: '{query.query}'")
+            return Response(status_code=499)
+        raise HTTPException(status_code=504, detail=f"Search timed out after {SEARCH_TIMEOUT}s")
+    results = search_task.result()
+    return {"results": _format_results(results)}
+
+
+@app.get("/api/search/stream")
+async def search_stream(q: str, search_engine=SearchEngine):
+    """Server-sent events: cheap candidates first, then each refined ranking as it completes.
+    
+    Starlette cancels the generator when the client disconnects, which cancels the search.
+    """
+    async def events():
+        deadline = time.monotonic() + SEARCH_TIMEOUT
+        stages = search_engine.search_stream(q)
+        try:
+            while True:
+                try:
+                    stage, results = await asyncio.wait_for(stages.__anext__(), deadline - time.monotonic())
+                except StopAsyncIteration:
+                    break
+                yield _sse("results", {"stage": stage, "results": _format_results(results)})
+            yield _sse("done", {})
+        except asyncio.TimeoutError:
+            yield _sse("error", {"detail": f"Search timed out after {SEARCH_TIMEOUT}s"})
+        except Exception as e:
+            print(f"Error in streaming search: {e}")
+            yield _sse("error", {"detail": "Search failed"})
+        finally:
+            await stages.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _format_results(results):
+    """Shape clips for the frontend; images are referenced by URL instead of inlined"""
+    with span("format_results"):
+        return [
+            {
+                "id": clip.id,
+                "name": clip.camera_id,
+                "url": f"/api/image/{clip.id}?size=thumb",
+                "full_url": f"/api/image/{clip.id}?size=full",
+                "description": clip.image_description,
+                "relevance": f"{(clip.relevance_score or 0) * 100:.1f}%",
+                "time_stamp": clip.time_created
+            }
+            for clip in results
+        ]
 
 
-        base64_data = clip.get("base_64_image", "")
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
-        if base64_data and "," in base64_data:
-            _, base64_data = base64_data.split(",", 1)
+async def _wait_for_disconnect(request, poll_interval=0.5):
+    """Return once the client has gone away"""
+    while not await request.is_disconnected():
+        await asyncio.sleep(poll_interval)
 
-        img_actual = f"data:image/jpeg;base64,{base64_data}"
-        
-        # Add the timestamp to the response
-        formatted_result = {
-            "name": clip['camera_id'],
-            "url": img_actual, #NOT DISPLAYING THE BASE 64 IMAGE
-            "description": clip['image_description'],
-            "relevance": f"{relevance:.1f}%",
-            "time_stamp": clip.get('time_created') 
-        }
-        formatted_results.append(formatted_result)
-    
-    print(f"API returning {len(formatted_results)} results to frontend")
-    if formatted_results:
-        print(f"First result: {formatted_results[0]}")
-    
-    return {"results": formatted_results}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until every service is built and warmed up"""
+    return JSONResponse(
+        {"ready": services.ready, "services": services.status},
+        status_code=200 if services.ready else 503
+    )
+
+
+@app.on_event("startup")
+async def startup():
+    configure_tracing()
+    # Warm up in the background so the server accepts connections at once; /ready reports when it is done
+    app.state.warmup = asyncio.create_task(services.warmup())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.warmup.cancel()
+    await services.aclose()
 
 # http://localhost:8000/
 if __name__ == "__main__":
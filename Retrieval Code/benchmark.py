@@ -0,0 +1,401 @@
+# benchmark.py
+"""Benchmark harness for ClipSearchEngine.search with replayable database and LLM fixtures.
+
+Generates (or loads) a synthetic clip corpus, serves it from an in-memory fake of the
+Supabase connector, answers LLM calls from a recorded fixture file, and runs keyword,
+time-range, latest and full-day query suites. Results are written as JSON so runs can be
+compared:
+
+    python benchmark.py --clips 100000 --output before.json
+    python benchmark.py --clips 100000 --output after.json --compare before.json
+
+With --record, LLM calls go to the real OpenAI API and the replies are saved to the fixture
+file; later runs replay them without network access.
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from embeddings import HashingEmbedder
+from llm_backend import fake_reply
+from llm_cache import LLMCache
+from llm_process import QueryProcessor
+from search import ClipSearchEngine
+from storage import to_timestamp, day_bounds, next_cursor
+
+SUBJECTS = ["person", "man", "woman", "child", "delivery driver", "red car", "white van", "black suv",
+            "dog", "cat", "cyclist", "truck", "group of people", "security guard", "motorcycle"]
+ACTIONS = ["walking", "standing", "running", "parked", "carrying a box", "sitting", "waiting", "crossing",
+           "talking on a phone", "opening a door", "loading boxes", "looking around"]
+PLACES = ["near the gate", "in the parking lot", "by the front door", "on the sidewalk", "in the driveway",
+          "in the lobby", "next to the loading dock", "under the streetlight"]
+LIGHTING = ["in daylight", "at dusk", "under artificial light", "in the rain", "at night"]
+
+SCENARIOS = {
+    "keyword": [
+        "red car in the parking lot",
+        "delivery driver carrying a box",
+        "dog on the sidewalk",
+        "security guard in the lobby",
+        "cyclist crossing under the streetlight",
+    ],
+    "time_range": [
+        "person near the gate yesterday afternoon",
+        "white van in the driveway last night",
+        "people in the lobby this morning",
+        "truck at the loading dock between 2 pm and 5 pm yesterday",
+    ],
+    "latest": [
+        "latest person",
+        "most recent car",
+        "newest image",
+        "latest dog",
+    ],
+    "full_day": [
+        "clips from yesterday",
+        "footage from today",
+        "show me everything from 3 days ago",
+    ],
+}
+
+
+class StageRecorder:
+    """Accumulates time and call counts per pipeline stage"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+
+    def record(self, stage, seconds):
+        self.seconds[stage] += seconds
+        self.calls[stage] += 1
+
+    def timed(self, stage, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+
+def generate_corpus(clips, cameras=8, days=14, seed=7, now=None):
+    """Synthetic clip rows spread over the last `days` days, oldest first"""
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    span = days * 24 * 3600
+    offsets = sorted((rng.randint(0, span) for _ in range(clips)), reverse=True)
+    for clip_id, offset in enumerate(offsets, start=1):
+        description = (f"The image shows a {rng.choice(SUBJECTS)} {rng.choice(ACTIONS)} "
+                       f"{rng.choice(PLACES)} {rng.choice(LIGHTING)}.")
+        yield {
+            "id": clip_id,
+            "camera_id": f"cam{rng.randrange(cameras)}",
+            "image_description": description,
+            "time_created": to_timestamp(now - timedelta(seconds=offset)),
+        }
+
+
+def load_corpus(path, clips, cameras, days, seed):
+    """Read a corpus fixture, generating and saving it first if it does not exist"""
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+    rows = list(generate_corpus(clips, cameras, days, seed))
+    if path:
+        with open(path, "w") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+    return rows
+
+
+class FakeSupabaseConnector:
+    """In-memory SupabaseConnector over a fixed corpus, with optional simulated round-trip latency"""
+
+    def __init__(self, rows, recorder, latency=0.0):
+        self.rows = sorted(rows, key=lambda row: row["time_created"])
+        self.times = [row["time_created"] for row in self.rows]
+        self.by_id = {row["id"]: row for row in self.rows}
+        self.recorder = recorder
+        self.latency = latency
+
+    def _fetch(self, rows):
+        if self.latency:
+            time.sleep(self.latency)
+        self.recorder.counters["db_rows"] += len(rows)
+        return [dict(row) for row in rows]
+
+    def _range(self, start_time=None, end_time=None):
+        lo = bisect_left(self.times, to_timestamp(start_time)) if start_time else 0
+        hi = bisect_right(self.times, to_timestamp(end_time)) if end_time else len(self.times)
+        return self.rows[lo:hi]
+
+    def _matches(self, rows, keyword):
+        keyword = keyword.lower()
+        return [row for row in rows if keyword in row["image_description"].lower()]
+
+    def get_all_clips(self, limit=None):
+        return self.recorder.timed("db", lambda: self._fetch(self.rows[:limit]))
+
+    def get_clips_by_keyword(self, keyword, limit=None):
+        return self.recorder.timed("db", lambda: self._fetch(self._matches(self.rows, keyword)[:limit]))
+
+    def get_clips_by_timeframe(self, start_time, end_time, limit=None):
+        return self.recorder.timed("db", lambda: self._fetch(self._range(start_time, end_time)[:limit]))
+
+    def get_latest_clips(self, limit=10, keyword=None):
+        def latest():
+            rows = self._matches(self.rows, keyword) if keyword else self.rows
+            return self._fetch(rows[:-limit - 1:-1] if limit else [])
+        return self.recorder.timed("db", latest)
+
+    def get_clips_by_keyword_and_time(self, keyword, start_time=None, end_time=None, limit=None):
+        return self.recorder.timed(
+            "db", lambda: self._fetch(self._matches(self._range(start_time, end_time), keyword)[:limit])
+        )
+
+    def get_clips_by_date(self, date_string, limit=None):
+        start, end = day_bounds(date_string)
+
+        def by_date():
+            lo, hi = bisect_left(self.times, start), bisect_left(self.times, end)
+            return self._fetch(self.rows[lo:hi][:limit])
+        return self.recorder.timed("db", by_date)
+
+    def get_clips_by_keywords(self, keywords, start_time=None, end_time=None, limit=None):
+        def by_keywords():
+            words = [keyword.lower() for keyword in keywords]
+            counted = []
+            for row in self._range(start_time, end_time):
+                description = row["image_description"].lower()
+                match_count = sum(word in description for word in words)
+                if match_count:
+                    counted.append((match_count, row))
+            counted.sort(key=lambda pair: (pair[0], pair[1]["time_created"]), reverse=True)
+            return [{**row, "match_count": match_count} for match_count, row in self._fetch_counted(counted, limit)]
+        return self.recorder.timed("db", by_keywords)
+
+    def _fetch_counted(self, counted, limit):
+        counted = counted[:limit]
+        rows = self._fetch([row for _, row in counted])
+        return [(match_count, row) for (match_count, _), row in zip(counted, rows)]
+
+    def get_clips_page(self, after=None, page_size=100, keyword=None, start_time=None, end_time=None,
+                       with_image=False, newest_first=False):
+        def page():
+            rows = self._range(start_time, end_time)
+            if keyword:
+                rows = self._matches(rows, keyword)
+            if newest_first:
+                rows = rows[::-1]
+            if after is not None:
+                key = tuple(after)
+                rows = [row for row in rows
+                        if ((row["time_created"], row["id"]) < key if newest_first else (row["time_created"], row["id"]) > key)]
+            rows = self._fetch(rows[:page_size])
+            return rows, next_cursor(rows, page_size)
+        return self.recorder.timed("db", page)
+
+    def iter_clips(self, page_size=100, **filters):
+        after = None
+        while True:
+            rows, after = self.get_clips_page(after, page_size, **filters)
+            yield from rows
+            if after is None:
+                return
+
+    def get_clip_image(self, clip_id):
+        return None
+
+    def get_clip_ids(self):
+        return self.recorder.timed("db", lambda: [row["id"] for row in self.rows])
+
+    def get_clips_by_ids(self, clip_ids):
+        return self.recorder.timed("db", lambda: self._fetch([self.by_id[i] for i in clip_ids if i in self.by_id]))
+
+
+class ReplayQueryProcessor(QueryProcessor):
+    """QueryProcessor that answers from a fixture file, or records real replies into it"""
+
+    def __init__(self, recorder, fixtures_path=None, record=False, latency=0.0):
+        self.recorder = recorder
+        self.fixtures_path = fixtures_path
+        self.record_mode = record
+        self.latency = latency
+        self.fixtures = {}
+        if fixtures_path and os.path.exists(fixtures_path):
+            with open(fixtures_path) as f:
+                self.fixtures = json.load(f)
+        if record:
+            super().__init__()
+        else:
+            self.model = "replay"
+        # Caching would hide the LLM stage after the first iteration
+        self.cache = LLMCache(max_size=0, path="")
+
+    def _fixture_key(self, messages):
+        return hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _complete(self, messages):
+        stage = "llm_rank" if "Clips to evaluate" in messages[-1]["content"] else "llm_terms"
+        started = time.perf_counter()
+        key = self._fixture_key(messages)
+        if key in self.fixtures:
+            reply = self.fixtures[key]
+        elif self.record_mode:
+            reply = self.fixtures[key] = super()._complete(messages)
+        else:
+            reply = fake_reply(messages)
+        if self.latency:
+            time.sleep(self.latency)
+        self.recorder.record(stage, time.perf_counter() - started)
+        return reply
+
+    def save(self):
+        if self.fixtures_path and self.record_mode:
+            with open(self.fixtures_path, "w") as f:
+                json.dump(self.fixtures, f, indent=1, sort_keys=True)
+
+
+class TimedEmbedder(HashingEmbedder):
+    def __init__(self, recorder):
+        super().__init__()
+        self.recorder = recorder
+
+    def embed(self, texts):
+        return self.recorder.timed("embed", super().embed, texts)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_scenario(engine, recorder, queries, iterations):
+    """Run each query `iterations` times; returns the scenario's JSON summary"""
+    latencies = []
+    recorder.reset()
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for query in queries:
+            query_started = time.perf_counter()
+            engine.search(query)
+            latencies.append(time.perf_counter() - query_started)
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    stages = {
+        stage: {
+            "calls": recorder.calls[stage],
+            "total_ms": round(seconds * 1000, 3),
+            "mean_ms": round(seconds * 1000 / recorder.calls[stage], 3),
+            "share": round(seconds / total, 4) if total else 0.0,
+        }
+        for stage, seconds in sorted(recorder.seconds.items())
+    }
+    other = total - sum(recorder.seconds.values())
+    stages["local"] = {"total_ms": round(other * 1000, 3), "share": round(other / total, 4) if total else 0.0}
+
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "peak_traced_mb": round(peak / 2 ** 20, 3),
+        "db_rows_fetched": recorder.counters["db_rows"],
+        "stages": stages,
+    }
+
+
+def compare(current, baseline):
+    """Print p50/p95/throughput changes against a previous run"""
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        deltas = []
+        for metric in ("p50_ms", "p95_ms", "throughput_rps"):
+            change = (result[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            deltas.append(f"{metric} {before[metric]} -> {result[metric]} ({change:+.1f}%)")
+        print(f"{name:<11} " + "  ".join(deltas), file=sys.stderr)
+
+
+def main(args):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+def run(args):
+    recorder = StageRecorder()
+    setup_started = time.perf_counter()
+    rows = load_corpus(args.corpus, args.clips, args.cameras, args.days, args.seed)
+    db = FakeSupabaseConnector(rows, recorder, latency=args.db_latency)
+    processor = ReplayQueryProcessor(recorder, args.llm_fixtures, record=args.record, latency=args.llm_latency)
+    engine = ClipSearchEngine(db=db, processor=processor, embedder=TimedEmbedder(recorder))
+    # Repeated queries would otherwise be served whole from the result cache
+    engine.result_cache = None
+    engine.sync_index(force=True)
+    setup_seconds = time.perf_counter() - setup_started
+
+    scenarios = {}
+    for name in args.scenarios:
+        # One untimed pass warms caches and lazy imports
+        run_scenario(engine, recorder, SCENARIOS[name], 1)
+        scenarios[name] = run_scenario(engine, recorder, SCENARIOS[name], args.iterations)
+    processor.save()
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "corpus": {"clips": len(rows), "cameras": args.cameras, "days": args.days, "seed": args.seed},
+        "settings": {"iterations": args.iterations, "db_latency": args.db_latency, "llm_latency": args.llm_latency},
+        "setup_seconds": round(setup_seconds, 3),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "scenarios": scenarios,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", type=int, default=10000, help="synthetic corpus size (10k-1M)")
+    parser.add_argument("--cameras", type=int, default=8)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--corpus", help="JSONL corpus fixture; generated on first use")
+    parser.add_argument("--llm-fixtures", help="JSON file of recorded LLM replies")
+    parser.add_argument("--record", action="store_true", help="call the real LLM and save its replies")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=20, help="passes over each scenario's queries")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="seconds added to each database call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds added to each LLM call")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="previous JSON report to diff against")
+    main(parser.parse_args())
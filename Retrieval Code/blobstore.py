@@ -0,0 +1,104 @@
+# blobstore.py
+import base64
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+from config import BLOB_STORE_PATH, THUMBNAIL_SIZE, THUMBNAIL_FORMAT, THUMBNAIL_QUALITY
+
+CONTENT_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+def decode_base64_image(base64_data):
+    """Decode a base64 frame, tolerating a data URI prefix"""
+    if "," in base64_data:
+        _, base64_data = base64_data.split(",", 1)
+    return base64.b64decode(base64_data)
+
+
+class BlobStore:
+    """Content-addressed store for clip frames and their downscaled previews"""
+
+    def __init__(self, root=BLOB_STORE_PATH):
+        self.root = root
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(root, "thumbs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "refs.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS clip_blobs (clip_id TEXT PRIMARY KEY, digest TEXT NOT NULL)")
+        self._conn.commit()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def _thumb_path(self, digest):
+        return os.path.join(self.root, "thumbs", f"{digest}_{THUMBNAIL_SIZE}.{THUMBNAIL_FORMAT}")
+
+    def _write(self, path, data):
+        """Write atomically so concurrent readers never see a partial file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put(self, data):
+        """Store bytes under their sha256 digest and return the digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            self._write(path, data)
+        return digest
+
+    def get(self, digest):
+        """Return the stored bytes for a digest, or None"""
+        try:
+            with open(self._blob_path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def digest_for(self, clip_id):
+        """Return the digest recorded for a clip, or None if not ingested yet"""
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM clip_blobs WHERE clip_id = ?", (str(clip_id),)).fetchone()
+        return row[0] if row else None
+
+    def ingest(self, clip_id, base64_data):
+        """Store a clip's frame, generate its preview and record the clip -> digest mapping"""
+        digest = self.put(decode_base64_image(base64_data))
+        self.make_thumbnail(digest)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO clip_blobs (clip_id, digest) VALUES (?, ?)", (str(clip_id), digest))
+            self._conn.commit()
+        return digest
+
+    def make_thumbnail(self, digest):
+        """Generate the downscaled preview for a stored frame (needs Pillow)"""
+        path = self._thumb_path(digest)
+        if os.path.exists(path):
+            return path
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+
+        image = Image.open(io.BytesIO(self.get(digest)))
+        image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format=THUMBNAIL_FORMAT.upper(), quality=THUMBNAIL_QUALITY)
+        self._write(path, buffer.getvalue())
+        return path
+
+    def read(self, digest, size="thumb"):
+        """Return (bytes, content type) for the full frame or its preview"""
+        if size == "thumb":
+            path = self.make_thumbnail(digest)
+            if path:
+                with open(path, "rb") as f:
+                    return f.read(), CONTENT_TYPES.get(THUMBNAIL_FORMAT, "image/jpeg")
+        return self.get(digest), "image/jpeg"
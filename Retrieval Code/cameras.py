@@ -0,0 +1,112 @@
+# cameras.py
+import json
+import re
+
+# Words around a camera mention that belong to the mention, not to what is being searched for
+MENTION_PREFIX = r"(?:(?:on|from|in|at|by)\s+)?(?:the\s+)?"
+MENTION_SUFFIX = r"(?:\s+(?:cameras?|cams?|feeds?))?"
+# Ids are often short or numeric ("2", "front"), so they only count in an explicit form such
+# as "camera 2", "cam 2" or "cam2"; on their own they would capture queries like "2 people"
+ID_MENTION = r"(?:cameras?|cams?)[\s#_-]*"
+
+
+def _alternation(phrases):
+    return "|".join(map(re.escape, sorted(phrases, key=len, reverse=True)))
+
+
+class Camera:
+    """Registry entry: a camera id with its display name, location and free-form tags"""
+
+    __slots__ = ("id", "name", "location", "tags")
+
+    def __init__(self, id, name=None, location=None, tags=()):
+        self.id = id
+        self.name = name
+        self.location = location
+        self.tags = tuple(tags or ())
+
+    @classmethod
+    def from_row(cls, row):
+        if isinstance(row, cls):
+            return row
+        tags = row.get("tags") or ()
+        if isinstance(tags, str):
+            tags = json.loads(tags) if tags.startswith("[") else [tag.strip() for tag in tags.split(",")]
+        return cls(row["id"], row.get("name"), row.get("location"), tags)
+
+    def phrases(self):
+        """Lowercased names, locations and tags a query can use to refer to this camera"""
+        return {phrase.strip().lower() for phrase in (self.name, self.location, *self.tags) if phrase and phrase.strip()}
+
+    def id_tokens(self):
+        """Forms of the id that may follow "camera" or "cam": the id itself, and for cam0 also 0"""
+        token = str(self.id).strip().lower()
+        tokens = {token} if token else set()
+        if token.startswith("cam") and token[3:].strip("_- "):
+            tokens.add(token[3:].strip("_- "))
+        return tokens
+
+    def to_dict(self):
+        return {"id": self.id, "name": self.name, "location": self.location, "tags": list(self.tags)}
+
+
+class CameraRegistry:
+    """Camera metadata plus a matcher that finds camera mentions in a search query"""
+
+    def __init__(self, cameras=()):
+        self.load(cameras)
+
+    @classmethod
+    def from_file(cls, path):
+        """Registry from a JSON list of {"id", "name", "location", "tags"} objects"""
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def load(self, cameras):
+        """Replace the registry contents with the given cameras (rows or Camera records)"""
+        self.cameras = {camera.id: camera for camera in map(Camera.from_row, cameras or [])}
+        self.by_phrase = {}
+        self.by_id_token = {}
+        for camera in self.cameras.values():
+            for phrase in camera.phrases():
+                self.by_phrase.setdefault(phrase, set()).add(camera.id)
+            for token in camera.id_tokens():
+                self.by_id_token.setdefault(token, set()).add(camera.id)
+
+        # Longest first so "north lobby" wins over "lobby" and "12" over "1"
+        mentions = []
+        if self.by_phrase:
+            mentions.append(rf"(?P<phrase>{_alternation(self.by_phrase)}){MENTION_SUFFIX}")
+        if self.by_id_token:
+            mentions.append(rf"{ID_MENTION}(?P<id>{_alternation(self.by_id_token)})")
+        self._pattern = re.compile(
+            rf"\b{MENTION_PREFIX}(?:{'|'.join(mentions)})\b",
+            re.IGNORECASE
+        ) if mentions else None
+
+    def __len__(self):
+        return len(self.cameras)
+
+    def __contains__(self, camera_id):
+        return camera_id in self.cameras
+
+    def resolve(self, query):
+        """(sorted ids of the cameras the query mentions, the query without those mentions).
+
+        Returns (None, query) when nothing matches, so an unscoped search is unchanged.
+        """
+        if self._pattern is None:
+            return None, query
+        camera_ids = set()
+
+        def strip(match):
+            if match.group("id") is not None:
+                camera_ids.update(self.by_id_token[match.group("id").lower()])
+            else:
+                camera_ids.update(self.by_phrase[match.group("phrase").lower()])
+            return " "
+
+        remainder = " ".join(self._pattern.sub(strip, query).split())
+        if not camera_ids:
+            return None, query
+        return sorted(camera_ids, key=str), remainder
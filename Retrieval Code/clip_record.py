@@ -0,0 +1,77 @@
+# clip_record.py
+
+
+class Clip:
+    """Compact clip record passed through search and ranking instead of row dicts.
+
+    The frame is held by reference: a base_64_image already on the row is kept as-is, otherwise
+    it is fetched through the loader on first access. with_score() returns a new record that
+    shares every field, so scoring never copies payloads.
+    """
+
+    __slots__ = ("id", "camera_id", "image_description", "time_created", "relevance_score", "_image", "_loader")
+
+    def __init__(self, id, camera_id=None, image_description=None, time_created=None,
+                 relevance_score=None, image=None, loader=None):
+        self.id = id
+        self.camera_id = camera_id
+        self.image_description = image_description
+        self.time_created = time_created
+        self.relevance_score = relevance_score
+        self._image = image
+        self._loader = loader
+
+    @classmethod
+    def from_row(cls, row, loader=None):
+        """Build a record from a database row; records pass through unchanged"""
+        if isinstance(row, cls):
+            return row
+        return cls(
+            row["id"],
+            row.get("camera_id"),
+            row.get("image_description"),
+            row.get("time_created"),
+            row.get("relevance_score"),
+            row.get("base_64_image"),
+            loader
+        )
+
+    @classmethod
+    def from_rows(cls, rows, loader=None):
+        return [cls.from_row(row, loader) for row in rows or []]
+
+    @property
+    def image(self):
+        """Base64 frame, loaded on first access"""
+        if self._image is None and self._loader is not None:
+            self._image = self._loader(self.id)
+        return self._image
+
+    def with_score(self, score):
+        """Same clip with a relevance score; the frame reference is shared, not copied"""
+        return Clip(self.id, self.camera_id, self.image_description, self.time_created,
+                    score, self._image, self._loader)
+
+    # Mapping-style access so the indexes accept records and raw rows alike
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "camera_id": self.camera_id,
+            "image_description": self.image_description,
+            "time_created": self.time_created,
+            "relevance_score": self.relevance_score
+        }
+
+    def __repr__(self):
+        return f"Clip(id={self.id!r}, camera_id={self.camera_id!r}, time_created={self.time_created!r}, relevance_score={self.relevance_score!r})"
@@ -13,6 +13,71 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GPT_MODEL = os.getenv("GPT_MODEL", "gpt-4o-mini")
 
+# LLM backend settings
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")  # "openai", "local" (in-process model) or "fake"
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "")  # OpenAI-compatible server, e.g. http://localhost:8080/v1
+LLM_FALLBACK_BACKEND = os.getenv("LLM_FALLBACK_BACKEND", "")  # used when LLM_BACKEND can't be reached
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "32"))  # in-flight completions per backend
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "Qwen/Qwen2.5-0.5B-Instruct")
+LOCAL_LLM_MAX_TOKENS = int(os.getenv("LOCAL_LLM_MAX_TOKENS", "512"))
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "8"))  # prompts per in-process generate call
+LLM_BATCH_WAIT = float(os.getenv("LLM_BATCH_WAIT", "0.01"))  # seconds to wait for a batch to fill
+
 # Search settings
 RELEVANCE_THRESHOLD = float(os.getenv("RELEVANCE_THRESHOLD", "0.6"))
-MAX_RESULTS = int(os.getenv("MAX_RESULTS", "10"))
\ No newline at end of file
+MAX_RESULTS = int(os.getenv("MAX_RESULTS", "10"))
+MAX_CANDIDATES = int(os.getenv("MAX_CANDIDATES", "1000"))  # rows read from the database before ranking
+DB_PAGE_SIZE = int(os.getenv("DB_PAGE_SIZE", "250"))  # rows per keyset page
+ID_PAGE_SIZE = int(os.getenv("ID_PAGE_SIZE", "1000"))  # ids per page in the index sync; keep at or below PostgREST max-rows
+LOCAL_TIME_PARSER = os.getenv("LOCAL_TIME_PARSER", "true").lower() == "true"
+
+# Embedding index settings
+USE_EMBEDDING_INDEX = os.getenv("USE_EMBEDDING_INDEX", "true").lower() == "true"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")  # "openai" or "hashing"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "512"))
+EMBEDDING_INDEX_PATH = os.getenv("EMBEDDING_INDEX_PATH", "")
+EMBEDDING_THRESHOLD = float(os.getenv("EMBEDDING_THRESHOLD", "0.2"))
+INDEX_SYNC_INTERVAL = float(os.getenv("INDEX_SYNC_INTERVAL", "30"))
+LLM_RERANK = os.getenv("LLM_RERANK", "false").lower() == "true"
+
+# Full-text index settings
+USE_TEXT_INDEX = os.getenv("USE_TEXT_INDEX", "true").lower() == "true"
+
+# Camera registry settings
+CAMERA_REGISTRY_PATH = os.getenv("CAMERA_REGISTRY_PATH", "")  # JSON list of cameras; empty reads the cameras table
+
+# Image blob store settings
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "blob_store")
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "320"))
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "webp").lower()  # "webp" or "jpeg"
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "75"))
+IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", "86400"))
+
+# LLM response cache settings
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")  # SQLite file; empty keeps the cache in memory only
+LLM_CACHE_DISK_SIZE = int(os.getenv("LLM_CACHE_DISK_SIZE", "100000"))
+
+# Search result cache settings
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))  # 0 disables; needs a local index to see new clips
+
+# Storage backend settings
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase")  # "supabase" or "sqlite"
+SQLITE_PATH = os.getenv("SQLITE_PATH", "clips.sqlite3")
+
+# Async request path settings
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "10"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "60"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+
+# Tracing settings
+OTEL_TRACING = os.getenv("OTEL_TRACING", "false").lower() == "true"  # needs opentelemetry-sdk and the OTLP exporter
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "clip-search")
+
+# LLM ranking settings
+RERANK_CHUNK_SIZE = int(os.getenv("RERANK_CHUNK_SIZE", "20"))  # candidates per ranking prompt
+RERANK_CONCURRENCY = int(os.getenv("RERANK_CONCURRENCY", "4"))
+RERANK_STABLE_CHUNKS = int(os.getenv("RERANK_STABLE_CHUNKS", "0"))  # stop once top-k survives this many chunks; 0 scores all
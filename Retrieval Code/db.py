@@ -1,99 +1,331 @@
 # db_connector.py
-from supabase import create_client
-from config import SUPABASE_URL, SUPABASE_KEY
+from supabase import create_client, acreate_client
+from supabase.lib.client_options import AsyncClientOptions
+from config import SUPABASE_URL, SUPABASE_KEY, DB_TIMEOUT, DB_PAGE_SIZE, ID_PAGE_SIZE
+from storage import to_timestamp, day_bounds, next_cursor
+from metrics import DB_ROWS
+
+# Metadata-only projection; frames are fetched one at a time via get_clip_image
+CLIP_COLUMNS = "id, camera_id, image_description, time_created"
+CLIP_IMAGE_COLUMNS = f"{CLIP_COLUMNS}, base_64_image"
+CAMERA_COLUMNS = "id, name, location, tags"
+
+
+def _scoped(query, camera_ids):
+    """Restrict a clip query to some cameras; None leaves it unscoped"""
+    return query.in_("camera_id", list(camera_ids)) if camera_ids else query
+
+
+def _bounded(query, limit):
+    """Push a row cap down to the database; None leaves the query unbounded"""
+    return query.limit(limit) if limit else query
+
+
+def _after(query, cursor, newest_first):
+    """Keyset condition: rows strictly past the (time_created, id) cursor in scan order"""
+    if cursor is None:
+        return query
+    after_time, after_id = cursor
+    op = "lt" if newest_first else "gt"
+    return query.or_(f'time_created.{op}."{after_time}",and(time_created.eq."{after_time}",id.{op}.{after_id})')
+
 
 class SupabaseConnector:
     def __init__(self):
         """Initialize connection to Supabase"""
         self.client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    
-    def get_all_clips(self):
-        """Retrieve all clips from the database"""
-        response = self.client.table("todos").select("id, camera_id, base_64_image, image_description,time_created").execute()
-        
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Error fetching clips: {response.error}")
-        
-        return response.data
-    
-    def get_clips_by_keyword(self, keyword):
-        """Retrieve clips that match a simple keyword search"""
-        response = self.client.table("todos").select("id, camera_id, base_64_image, image_description,time_created").ilike("image_description", f"%{keyword}%").execute()
-        
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Error in keyword search: {response.error}")
-        
-        return response.data
-    def get_clips_by_timeframe(self, start_time, end_time):
-        """Retrieve clips within a specific time range"""
-        # Convert ISO format to database text format by replacing 'T' with space
-        db_start_time = start_time.replace('T', ' ') if start_time else None
-        db_end_time = end_time.replace('T', ' ') if end_time else None
-        
-        print(f"Querying timeframe: {db_start_time} to {db_end_time}")
-        
-        response = self.client.table("todos").select("id, camera_id, base_64_image, image_description, time_created") \
-            .gte("time_created", db_start_time) \
-            .lte("time_created", db_end_time) \
-            .execute()
-        
-        print(f"Timeframe query returned {len(response.data) if response.data else 0} results")
-        
+
+    def _check(self, response, action):
+        """Raise if PostgREST reported an error, otherwise return the rows"""
         if hasattr(response, 'error') and response.error:
-            raise Exception(f"Error in timeframe search: {response.error}")
-        
+            raise Exception(f"Error {action}: {response.error}")
+        DB_ROWS.inc(action, amount=len(response.data or []))
         return response.data
-    def get_latest_clips(self, limit=10):
-        """Retrieve the most recent clips from the database, ordered by time"""
-        response = self.client.table("todos") \
-            .select("id, camera_id, base_64_image, image_description, time_created") \
+
+    # Query builders shared by the sync and async connectors
+
+    def _all_clips_query(self, camera_ids=None, limit=None):
+        return _bounded(_scoped(self.client.table("todos").select(CLIP_COLUMNS), camera_ids), limit)
+
+    def _keyword_query(self, keyword, camera_ids=None, limit=None):
+        query = self.client.table("todos").select(CLIP_COLUMNS).ilike("image_description", f"%{keyword}%")
+        return _bounded(_scoped(query, camera_ids), limit)
+
+    def _timeframe_query(self, start_time, end_time, camera_ids=None, limit=None):
+        db_start_time = to_timestamp(start_time)
+        db_end_time = to_timestamp(end_time)
+
+        query = _scoped(self.client.table("todos").select(CLIP_COLUMNS), camera_ids)
+        if db_start_time:
+            query = query.gte("time_created", db_start_time)
+        if db_end_time:
+            query = query.lte("time_created", db_end_time)
+        return _bounded(query.order("time_created"), limit)
+
+    def _latest_query(self, limit, keyword=None, camera_ids=None):
+        query = _scoped(self.client.table("todos").select(CLIP_COLUMNS), camera_ids)
+        if keyword:
+            query = query.ilike("image_description", f"%{keyword}%")
+
+        # ORDER BY ... LIMIT is pushed down to the time_created (or camera_id, time_created) index
+        return query \
             .order("time_created", desc=True) \
-            .limit(limit) \
-            .execute()
-        
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Error fetching latest clips: {response.error}")
-        
-        return response.data
+            .limit(limit)
 
+    def _keyword_and_time_query(self, keyword, start_time=None, end_time=None, camera_ids=None, limit=None):
+        db_start_time = to_timestamp(start_time)
+        db_end_time = to_timestamp(end_time)
 
-    def get_clips_by_keyword_and_time(self, keyword, start_time=None, end_time=None):
-        """Retrieve clips that match both keyword and time constraints"""
-        # Convert ISO format to database text format
-        db_start_time = start_time.replace('T', ' ') if start_time else None
-        db_end_time = end_time.replace('T', ' ') if end_time else None
-        
-        query = self.client.table("todos").select("id, camera_id, base_64_image, image_description, time_created") \
+        query = self.client.table("todos").select(CLIP_COLUMNS) \
             .ilike("image_description", f"%{keyword}%")
-        
+        query = _scoped(query, camera_ids)
+
         if db_start_time:
             query = query.gte("time_created", db_start_time)
         if db_end_time:
             query = query.lte("time_created", db_end_time)
-            
-        response = query.execute()
-        
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Error in combined search: {response.error}")
-        
-        return response.data
-    def get_clips_by_date(self, date_string):
-        """Retrieve clips from a specific date"""
-        # For text-based date columns, we can use LIKE to find all entries on a specific date
-        # Assuming the date part is always in YYYY-MM-DD format
-        if len(date_string) == 10:  # Just the date part
-            date_pattern = f"{date_string}%"  # e.g., "2025-04-06%"
-            
-            response = self.client.table("todos").select("id, camera_id, base_64_image, image_description, time_created") \
-                .like("time_created", date_pattern) \
-                .execute()
-            
-            print(f"Date pattern query for {date_pattern} returned {len(response.data) if response.data else 0} results")
-            
-            if hasattr(response, 'error') and response.error:
-                raise Exception(f"Error in date pattern search: {response.error}")
-            
-            return response.data
-        else:
-            # Fall back to exact time search
-            return self.get_clips_by_timeframe(date_string, date_string)
\ No newline at end of file
+        return _bounded(query, limit)
+
+    def _date_query(self, date_string, camera_ids=None, limit=None):
+        # A half-open [midnight, next midnight) range uses the time_created index
+        start, end = day_bounds(date_string)
+
+        query = _scoped(self.client.table("todos").select(CLIP_COLUMNS), camera_ids)
+        return _bounded(query
+                        .gte("time_created", start)
+                        .lt("time_created", end)
+                        .order("time_created"), limit)
+
+    def _page_query(self, after=None, page_size=DB_PAGE_SIZE, keyword=None, start_time=None, end_time=None,
+                    camera_ids=None, with_image=False, newest_first=False):
+        db_start_time = to_timestamp(start_time)
+        db_end_time = to_timestamp(end_time)
+
+        query = self.client.table("todos").select(CLIP_IMAGE_COLUMNS if with_image else CLIP_COLUMNS)
+        query = _scoped(query, camera_ids)
+        if keyword:
+            query = query.ilike("image_description", f"%{keyword}%")
+        if db_start_time:
+            query = query.gte("time_created", db_start_time)
+        if db_end_time:
+            query = query.lte("time_created", db_end_time)
+
+        # (time_created, id) is a total order, so each page resumes on the index where the last one stopped
+        return _after(query, after, newest_first) \
+            .order("time_created", desc=newest_first) \
+            .order("id", desc=newest_first) \
+            .limit(page_size)
+
+    def _keywords_query(self, keywords, start_time=None, end_time=None, camera_ids=None, limit=None):
+        # match_clips_by_keywords (schema.sql) ORs the keywords in one statement and counts matches per row
+        return self.client.rpc("match_clips_by_keywords", {
+            "keywords": list(keywords),
+            "start_time": to_timestamp(start_time),
+            "end_time": to_timestamp(end_time),
+            "camera_ids": list(camera_ids) if camera_ids else None,
+            "max_rows": limit
+        })
+
+    def _image_query(self, clip_id):
+        return self.client.table("todos").select("base_64_image").eq("id", clip_id)
+
+    def _ids_query(self, after=None, page_size=ID_PAGE_SIZE):
+        query = self.client.table("todos").select("id")
+        if after is not None:
+            query = query.gt("id", after)
+        return query.order("id").limit(page_size)
+
+    def _by_ids_query(self, clip_ids, columns=CLIP_COLUMNS):
+        return self.client.table("todos").select(columns).in_("id", clip_ids)
+
+    def _cameras_query(self):
+        return self.client.table("cameras").select(CAMERA_COLUMNS)
+
+    # Sync API
+
+    def get_all_clips(self, camera_ids=None, limit=None):
+        """Retrieve all clips from the database, or the first `limit`"""
+        return self._check(self._all_clips_query(camera_ids, limit).execute(), "fetching clips")
+
+    def get_clips_by_keyword(self, keyword, camera_ids=None, limit=None):
+        """Retrieve clips that match a simple keyword search"""
+        return self._check(self._keyword_query(keyword, camera_ids, limit).execute(), "in keyword search")
+
+    def get_clips_by_timeframe(self, start_time, end_time, camera_ids=None, limit=None):
+        """Retrieve clips within a specific time range, oldest first"""
+        query = self._timeframe_query(start_time, end_time, camera_ids, limit)
+        return self._check(query.execute(), "in timeframe search")
+
+    def get_latest_clips(self, limit=10, keyword=None, camera_ids=None):
+        """Retrieve the most recent clips from the database, ordered by time"""
+        return self._check(self._latest_query(limit, keyword, camera_ids).execute(), "fetching latest clips")
+
+    def get_clips_by_keyword_and_time(self, keyword, start_time=None, end_time=None, camera_ids=None, limit=None):
+        """Retrieve clips that match both keyword and time constraints"""
+        query = self._keyword_and_time_query(keyword, start_time, end_time, camera_ids, limit)
+        return self._check(query.execute(), "in combined search")
+
+    def get_clips_by_date(self, date_string, camera_ids=None, limit=None):
+        """Retrieve clips from a specific date, oldest first"""
+        return self._check(self._date_query(date_string, camera_ids, limit).execute(), "in date search")
+
+    def get_clips_by_keywords(self, keywords, start_time=None, end_time=None, camera_ids=None, limit=None):
+        """Retrieve clips matching any of the keywords in one round trip.
+
+        Each row appears once with a match_count of how many keywords it contains; rows come
+        back most matches first, then newest first.
+        """
+        query = self._keywords_query(keywords, start_time, end_time, camera_ids, limit)
+        return self._check(query.execute(), "in multi-keyword search")
+
+    def get_clips_page(self, after=None, page_size=DB_PAGE_SIZE, **filters):
+        """One keyset page of clips in (time_created, id) order: (rows, cursor for the next page or None).
+
+        filters: keyword, start_time, end_time, camera_ids, with_image (adds base_64_image to the
+        projection) and newest_first. Every page costs the same however deep the scan is.
+        """
+        rows = self._check(self._page_query(after, page_size, **filters).execute(), "fetching clip page")
+        return rows, next_cursor(rows, page_size)
+
+    def iter_clips(self, page_size=DB_PAGE_SIZE, **filters):
+        """Yield matching clips, fetching the next page only when the caller gets that far"""
+        after = None
+        while True:
+            rows, after = self.get_clips_page(after, page_size, **filters)
+            yield from rows
+            if after is None:
+                return
+
+    def get_clip_image(self, clip_id):
+        """Retrieve the base64 frame for a single clip, or None if it does not exist"""
+        rows = self._check(self._image_query(clip_id).execute(), "fetching clip image")
+        return rows[0]["base_64_image"] if rows else None
+
+    def get_clip_ids(self, page_size=ID_PAGE_SIZE):
+        """Retrieve the ids of every clip without pulling any row payloads.
+
+        Paged by keyset over id: a single select would be cut off at PostgREST's max-rows, and
+        the ids past the cap would look deleted to the index sync.
+        """
+        ids = []
+        after = None
+        while True:
+            rows = self._check(self._ids_query(after, page_size).execute(), "fetching clip ids")
+            ids.extend(row["id"] for row in rows)
+            if len(rows) < page_size:
+                return ids
+            after = rows[-1]["id"]
+
+    def get_clips_by_ids(self, clip_ids, chunk_size=200):
+        """Retrieve clip rows for the given ids, preserving the requested order"""
+        clip_ids = list(clip_ids)
+        by_id = {}
+        for i in range(0, len(clip_ids), chunk_size):
+            rows = self._check(self._by_ids_query(clip_ids[i:i + chunk_size]).execute(), "fetching clips by id")
+            by_id.update((row["id"], row) for row in rows)
+
+        return [by_id[clip_id] for clip_id in clip_ids if clip_id in by_id]
+
+    def get_cameras(self):
+        """Retrieve the camera registry: id, name, location and tags of every camera"""
+        return self._check(self._cameras_query().execute(), "fetching cameras")
+
+
+class AsyncSupabaseConnector(SupabaseConnector):
+    """SupabaseConnector on the async client; one pooled connection set shared by all requests"""
+
+    def __init__(self):
+        """The async client is created on first use, inside the running event loop"""
+        self.client = None
+
+    async def connect(self):
+        if self.client is None:
+            self.client = await acreate_client(
+                SUPABASE_URL, SUPABASE_KEY,
+                options=AsyncClientOptions(postgrest_client_timeout=DB_TIMEOUT)
+            )
+        return self.client
+
+    async def _run(self, build, action):
+        await self.connect()
+        return self._check(await build().execute(), action)
+
+    async def get_all_clips(self, camera_ids=None, limit=None):
+        """Retrieve all clips from the database, or the first `limit`"""
+        return await self._run(lambda: self._all_clips_query(camera_ids, limit), "fetching clips")
+
+    async def get_clips_by_keyword(self, keyword, camera_ids=None, limit=None):
+        """Retrieve clips that match a simple keyword search"""
+        return await self._run(lambda: self._keyword_query(keyword, camera_ids, limit), "in keyword search")
+
+    async def get_clips_by_timeframe(self, start_time, end_time, camera_ids=None, limit=None):
+        """Retrieve clips within a specific time range, oldest first"""
+        return await self._run(
+            lambda: self._timeframe_query(start_time, end_time, camera_ids, limit), "in timeframe search"
+        )
+
+    async def get_latest_clips(self, limit=10, keyword=None, camera_ids=None):
+        """Retrieve the most recent clips from the database, ordered by time"""
+        return await self._run(lambda: self._latest_query(limit, keyword, camera_ids), "fetching latest clips")
+
+    async def get_clips_by_keyword_and_time(self, keyword, start_time=None, end_time=None, camera_ids=None, limit=None):
+        """Retrieve clips that match both keyword and time constraints"""
+        return await self._run(
+            lambda: self._keyword_and_time_query(keyword, start_time, end_time, camera_ids, limit), "in combined search"
+        )
+
+    async def get_clips_by_date(self, date_string, camera_ids=None, limit=None):
+        """Retrieve clips from a specific date, oldest first"""
+        return await self._run(lambda: self._date_query(date_string, camera_ids, limit), "in date search")
+
+    async def get_clips_by_keywords(self, keywords, start_time=None, end_time=None, camera_ids=None, limit=None):
+        """Retrieve clips matching any of the keywords in one round trip, annotated with match_count"""
+        return await self._run(
+            lambda: self._keywords_query(keywords, start_time, end_time, camera_ids, limit), "in multi-keyword search"
+        )
+
+    async def get_clips_page(self, after=None, page_size=DB_PAGE_SIZE, **filters):
+        """One keyset page of clips in (time_created, id) order: (rows, cursor for the next page or None)"""
+        rows = await self._run(lambda: self._page_query(after, page_size, **filters), "fetching clip page")
+        return rows, next_cursor(rows, page_size)
+
+    async def iter_clips(self, page_size=DB_PAGE_SIZE, **filters):
+        """Yield matching clips, fetching the next page only when the caller gets that far"""
+        after = None
+        while True:
+            rows, after = await self.get_clips_page(after, page_size, **filters)
+            for row in rows:
+                yield row
+            if after is None:
+                return
+
+    async def get_clip_image(self, clip_id):
+        """Retrieve the base64 frame for a single clip, or None if it does not exist"""
+        rows = await self._run(lambda: self._image_query(clip_id), "fetching clip image")
+        return rows[0]["base_64_image"] if rows else None
+
+    async def get_clip_ids(self, page_size=ID_PAGE_SIZE):
+        """Retrieve the ids of every clip without pulling any row payloads, paged by keyset over id"""
+        ids = []
+        after = None
+        while True:
+            rows = await self._run(lambda: self._ids_query(after, page_size), "fetching clip ids")
+            ids.extend(row["id"] for row in rows)
+            if len(rows) < page_size:
+                return ids
+            after = rows[-1]["id"]
+
+    async def get_clips_by_ids(self, clip_ids, chunk_size=200):
+        """Retrieve clip rows for the given ids, preserving the requested order"""
+        clip_ids = list(clip_ids)
+        by_id = {}
+        for i in range(0, len(clip_ids), chunk_size):
+            chunk = clip_ids[i:i + chunk_size]
+            rows = await self._run(lambda: self._by_ids_query(chunk), "fetching clips by id")
+            by_id.update((row["id"], row) for row in rows)
+
+        return [by_id[clip_id] for clip_id in clip_ids if clip_id in by_id]
+
+    async def get_cameras(self):
+        """Retrieve the camera registry: id, name, location and tags of every camera"""
+        return await self._run(self._cameras_query, "fetching cameras")
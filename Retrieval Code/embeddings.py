@@ -0,0 +1,195 @@
+# embeddings.py
+import hashlib
+import json
+import os
+import re
+import numpy as np
+from config import OPENAI_API_KEY, EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_DIM
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(vectors):
+    """Scale rows to unit length so dot products are cosine similarities"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class HashingEmbedder:
+    """Deterministic offline embedder using the feature hashing trick"""
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text):
+        tokens = TOKEN_PATTERN.findall((text or "").lower())
+        bigrams = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return tokens + bigrams
+
+    def embed(self, texts):
+        """Embed a list of texts into a (len(texts), dim) float32 matrix"""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dim] += sign
+        return _normalize(vectors)
+
+
+class OpenAIEmbedder:
+    """Embedder backed by the OpenAI embeddings endpoint"""
+
+    def __init__(self, model=EMBEDDING_MODEL, batch_size=256):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.model = model
+        self.batch_size = batch_size
+        self.dim = None
+
+    def embed(self, texts):
+        """Embed a list of texts into a (len(texts), dim) float32 matrix"""
+        rows = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = [text or " " for text in texts[i:i + self.batch_size]]
+            response = self.client.embeddings.create(model=self.model, input=batch)
+            rows.extend(item.embedding for item in response.data)
+        vectors = np.asarray(rows, dtype=np.float32)
+        if vectors.size:
+            self.dim = vectors.shape[1]
+        return _normalize(vectors.reshape(len(texts), -1))
+
+
+def get_embedder(backend=EMBEDDING_BACKEND):
+    """Build the embedder selected in config"""
+    if backend == "hashing":
+        return HashingEmbedder()
+    if backend == "openai":
+        return OpenAIEmbedder()
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+class EmbeddingIndex:
+    """Contiguous matrix of normalized description embeddings keyed by clip id"""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.vectors = None
+        self.ids = []
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, clip_id):
+        return clip_id in self.rows
+
+    def _reserve(self, dim, extra):
+        """Grow the backing matrix geometrically so appends stay amortized O(1)"""
+        size = len(self.ids)
+        if self.vectors is None:
+            self.vectors = np.zeros((max(extra, 64), dim), dtype=np.float32)
+            return
+        if self.vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension changed from {self.vectors.shape[1]} to {dim}")
+        if size + extra > self.vectors.shape[0] or not self.vectors.flags.writeable:
+            capacity = max(size + extra, self.vectors.shape[0] * 2)
+            grown = np.zeros((capacity, dim), dtype=np.float32)
+            grown[:size] = self.vectors[:size]
+            self.vectors = grown
+
+    def add(self, clips):
+        """Embed and insert (or refresh) clips that carry an image_description; returns the number of new rows"""
+        clips = [clip for clip in clips if clip.get("image_description")]
+        if not clips:
+            return 0
+        return self.add_vectors(clips, self.embedder.embed([clip["image_description"] for clip in clips]))
+
+    def add_vectors(self, clips, embedded):
+        """Insert (or refresh) clips whose descriptions were already embedded; returns the number of new rows"""
+        if not len(clips):
+            return 0
+        self._reserve(embedded.shape[1], len(clips))
+        added = 0
+        for clip, vector in zip(clips, embedded):
+            clip_id = clip["id"]
+            row = self.rows.get(clip_id)
+            if row is None:
+                row = len(self.ids)
+                self.ids.append(clip_id)
+                self.rows[clip_id] = row
+                added += 1
+            self.vectors[row] = vector
+        return added
+
+    def remove(self, clip_ids):
+        """Drop clips from the index by moving the last row into each hole"""
+        removed = 0
+        for clip_id in clip_ids:
+            row = self.rows.pop(clip_id, None)
+            if row is None:
+                continue
+            self._reserve(self.vectors.shape[1], 0)
+            last = len(self.ids) - 1
+            if row != last:
+                moved_id = self.ids[last]
+                self.vectors[row] = self.vectors[last]
+                self.ids[row] = moved_id
+                self.rows[moved_id] = row
+            self.ids.pop()
+            removed += 1
+        return removed
+
+    def search(self, query, k=10, candidate_ids=None):
+        """Return up to k (clip_id, cosine score) pairs, best first"""
+        if not self.ids:
+            return []
+        return self.search_vector(self.embedder.embed([query])[0], k, candidate_ids)
+
+    def search_vector(self, query_vector, k=10, candidate_ids=None):
+        """search() for a query that was already embedded"""
+        if not self.ids:
+            return []
+        if candidate_ids is None:
+            ids = self.ids
+            scores = self.vectors[:len(self.ids)] @ query_vector
+        else:
+            ids = [clip_id for clip_id in candidate_ids if clip_id in self.rows]
+            if not ids:
+                return []
+            rows = np.fromiter((self.rows[clip_id] for clip_id in ids), dtype=np.int64, count=len(ids))
+            scores = self.vectors[rows] @ query_vector
+
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    def save(self, path):
+        """Persist the index as <path>.npy plus an id list in <path>.ids.json"""
+        if self.vectors is None:
+            return
+        # The loaded matrix may be a memory map of <path>.npy, so never write over it in place
+        with open(f"{path}.ids.json.tmp", "w") as f:
+            json.dump(self.ids, f)
+        with open(f"{path}.npy.tmp", "wb") as f:
+            np.save(f, self.vectors[:len(self.ids)])
+        os.replace(f"{path}.ids.json.tmp", f"{path}.ids.json")
+        os.replace(f"{path}.npy.tmp", f"{path}.npy")
+
+    def load(self, path, mmap=True):
+        """Load a saved index; with mmap the matrix stays on disk until modified"""
+        if not os.path.exists(f"{path}.npy"):
+            return False
+        vectors = np.load(f"{path}.npy", mmap_mode="r" if mmap else None)
+        with open(f"{path}.ids.json") as f:
+            ids = json.load(f)
+        # A save interrupted between the two renames leaves a pair that does not match
+        if len(ids) != vectors.shape[0]:
+            return False
+        self.vectors = vectors
+        self.ids = ids
+        self.rows = {clip_id: row for row, clip_id in enumerate(self.ids)}
+        return True
@@ -0,0 +1,277 @@
+# llm_backend.py
+import asyncio
+import json
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+import httpx
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APITimeoutError
+from config import (OPENAI_API_KEY, GPT_MODEL, OPENAI_TIMEOUT, HTTP_POOL_SIZE, LLM_BACKEND, LLM_BASE_URL,
+                    LLM_FALLBACK_BACKEND, LLM_CONCURRENCY, LOCAL_LLM_MODEL, LOCAL_LLM_MAX_TOKENS,
+                    LLM_BATCH_SIZE, LLM_BATCH_WAIT)
+from metrics import LLM_TOKENS, LLM_FALLBACKS
+
+# Failures that mean the backend couldn't be reached, as opposed to a bad request
+UNREACHABLE = (APIConnectionError, APITimeoutError, httpx.TransportError, ConnectionError, TimeoutError)
+
+
+class OpenAIBackend:
+    """Chat completions from the OpenAI API or any OpenAI-compatible server (llama.cpp, vLLM, Ollama)"""
+
+    def __init__(self, model=GPT_MODEL, base_url=LLM_BASE_URL, api_key=OPENAI_API_KEY, concurrency=LLM_CONCURRENCY):
+        self.model = model
+        self.base_url = base_url or None
+        # Local servers usually ignore the key, but the client refuses to start without one
+        self.api_key = api_key or ("local" if self.base_url else None)
+        self.concurrency = concurrency
+        self._client = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(concurrency)
+        # The backend is a process-wide singleton, but an asyncio.Semaphore and an httpx pool
+        # bind to the event loop that first uses them, so each loop gets its own pair
+        self._loops = weakref.WeakKeyDictionary()  # event loop -> (semaphore, AsyncOpenAI)
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=OPENAI_TIMEOUT)
+            return self._client
+
+    def _loop_state(self):
+        """(concurrency semaphore, AsyncOpenAI) for the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loops.get(loop)
+            if state is None:
+                http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+                    timeout=OPENAI_TIMEOUT
+                )
+                client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                     timeout=OPENAI_TIMEOUT, http_client=http_client)
+                state = self._loops[loop] = (asyncio.Semaphore(self.concurrency), client)
+            return state
+
+    @property
+    def async_client(self):
+        """AsyncOpenAI on a keep-alive connection pool shared by every request on the running event loop"""
+        return self._loop_state()[1]
+
+    def complete(self, messages):
+        """Send a chat completion and return the reply text"""
+        with self._slots:
+            response = self.client.chat.completions.create(model=self.model, messages=messages)
+        return self._reply(response)
+
+    async def acomplete(self, messages):
+        slots, client = self._loop_state()
+        async with slots:
+            response = await client.chat.completions.create(model=self.model, messages=messages)
+        return self._reply(response)
+
+    def _reply(self, response):
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            LLM_TOKENS.inc("prompt", amount=usage.prompt_tokens or 0)
+            LLM_TOKENS.inc("completion", amount=usage.completion_tokens or 0)
+        return response.choices[0].message.content
+
+    def warmup(self):
+        """Open the client, and have a local server load the model before the first search needs it"""
+        client = self.client
+        if self.base_url:
+            client.chat.completions.create(model=self.model, messages=[{"role": "user", "content": "ping"}], max_tokens=1)
+
+    async def aclose(self):
+        """Close the running loop's connection pool; the next call on this loop opens a new one"""
+        with self._lock:
+            state = self._loops.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[1].close()
+
+
+class LocalBackend:
+    """Small chat model run in-process on CPU with transformers.
+
+    The model is loaded once and shared. Requests that arrive within LLM_BATCH_WAIT of each other
+    are run as one batched generate call, up to LLM_BATCH_SIZE prompts.
+    """
+
+    def __init__(self, model=LOCAL_LLM_MODEL, batch_size=LLM_BATCH_SIZE, batch_wait=LLM_BATCH_WAIT,
+                 max_new_tokens=LOCAL_LLM_MAX_TOKENS):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.max_new_tokens = max_new_tokens
+        self._pipeline = None
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._pipeline is None:
+                try:
+                    from transformers import pipeline
+                except ImportError as e:
+                    raise RuntimeError("LLM_BACKEND=local needs the transformers and torch packages") from e
+                generator = pipeline("text-generation", model=self.model, device=-1)
+                generator.tokenizer.padding_side = "left"
+                if generator.tokenizer.pad_token is None:
+                    generator.tokenizer.pad_token = generator.tokenizer.eos_token
+                self._pipeline = generator
+                threading.Thread(target=self._serve, name="local-llm", daemon=True).start()
+            return self._pipeline
+
+    def _next_batch(self):
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _serve(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                outputs = self._pipeline(
+                    [messages for messages, _ in batch],
+                    batch_size=len(batch),
+                    max_new_tokens=self.max_new_tokens,
+                    do_sample=False,
+                    return_full_text=False
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output[0]["generated_text"])
+
+    def complete(self, messages):
+        """Queue the prompt for the next batch and wait for its reply"""
+        self._load()
+        future = Future()
+        self._requests.put((messages, future))
+        return future.result()
+
+    async def acomplete(self, messages):
+        # The first call (or one racing the startup warmup) waits for the weights off the loop
+        if self._pipeline is None:
+            await asyncio.to_thread(self._load)
+        future = Future()
+        self._requests.put((messages, future))
+        return await asyncio.wrap_future(future)
+
+    def warmup(self):
+        """Load the weights and run one generation so the first search doesn't pay for it"""
+        self.complete([{"role": "user", "content": "ping"}])
+
+    async def aclose(self):
+        pass
+
+
+def fake_reply(messages):
+    """Well-formed reply for the term extraction and ranking prompts, built from the prompt itself"""
+    prompt = messages[-1]["content"]
+    if "Clips to evaluate" in prompt:
+        listing = prompt.split("Clips to evaluate:", 1)[1]
+        clip_data, _ = json.JSONDecoder().raw_decode(listing[listing.index("["):])
+        return json.dumps([{"id": item["id"], "score": round(0.95 - 0.01 * i, 2)} for i, item in enumerate(clip_data)])
+    query = prompt.split('Analyze this search query: "', 1)[-1].split('"', 1)[0]
+    words = [word for word in query.split() if len(word) > 2]
+    return json.dumps({"keywords": words, "primary_objects": words[:1], "attributes": [], "actions": [],
+                       "time_references": {}})
+
+
+class FakeBackend:
+    """Deterministic offline backend for tests and benchmarks; no network, no model"""
+
+    def __init__(self, latency=0.0):
+        self.model = "fake"
+        self.latency = latency
+
+    def complete(self, messages):
+        if self.latency:
+            time.sleep(self.latency)
+        return fake_reply(messages)
+
+    async def acomplete(self, messages):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return fake_reply(messages)
+
+    def warmup(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+class FallbackBackend:
+    """Primary backend that hands a request to the secondary when the primary can't be reached"""
+
+    def __init__(self, primary, secondary):
+        self.primary = primary
+        self.secondary = secondary
+        self.model = primary.model
+
+    def complete(self, messages):
+        try:
+            return self.primary.complete(messages)
+        except UNREACHABLE:
+            LLM_FALLBACKS.inc()
+            return self.secondary.complete(messages)
+
+    async def acomplete(self, messages):
+        try:
+            return await self.primary.acomplete(messages)
+        except UNREACHABLE:
+            LLM_FALLBACKS.inc()
+            return await self.secondary.acomplete(messages)
+
+    def warmup(self):
+        self.secondary.warmup()
+        self.primary.warmup()
+
+    async def aclose(self):
+        await self.primary.aclose()
+        await self.secondary.aclose()
+
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "local": LocalBackend,
+    "fake": FakeBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def _build(name):
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend: {name}") from None
+
+
+def get_llm_backend(name=LLM_BACKEND, fallback=LLM_FALLBACK_BACKEND):
+    """Shared backend selected in config, so every processor uses one client pool and one loaded model"""
+    key = (name, fallback)
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = _build(name)
+            if fallback and fallback != name:
+                backend = FallbackBackend(backend, _build(fallback))
+            _backends[key] = backend
+    return backend
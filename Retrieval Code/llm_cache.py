@@ -0,0 +1,117 @@
+# llm_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from metrics import LLM_CACHE
+from config import LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_PATH, LLM_CACHE_DISK_SIZE
+
+# The disk tier is trimmed once per this many writes, so it can run over disk_size by that much
+DISK_EVICT_INTERVAL = 100
+
+
+def normalize_query(text):
+    """Case- and whitespace-insensitive form of a query used in cache keys"""
+    return " ".join((text or "").lower().split())
+
+
+def make_key(namespace, *parts):
+    """Stable key for a namespace plus any JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return f"{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class LLMCache:
+    """Two-tier cache for LLM responses: in-process LRU with TTL, plus optional SQLite"""
+
+    def __init__(self, max_size=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL, path=LLM_CACHE_PATH, disk_size=LLM_CACHE_DISK_SIZE):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk_size = disk_size
+        self._writes = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires_idx ON llm_cache (expires_at)")
+            self._conn.commit()
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss or expiry"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[1] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                LLM_CACHE.inc("hit")
+                return json.loads(entry[0])
+            if entry:
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row:
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    LLM_CACHE.inc("disk_hit")
+                    return json.loads(row[0])
+
+            self.misses += 1
+            LLM_CACHE.inc("miss")
+            return None
+
+    def set(self, key, value):
+        """Store a JSON-serializable value in both tiers"""
+        serialized = json.dumps(value)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, serialized, expires_at)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, serialized, expires_at)
+                )
+                self._writes += 1
+                if self._writes % DISK_EVICT_INTERVAL == 0:
+                    self._evict_disk()
+                self._conn.commit()
+
+    def _evict_disk(self):
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN "
+            "(SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_size,)
+        )
+
+    def stats(self):
+        """Hit/miss counters for both tiers"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "size": len(self._memory)
+            }
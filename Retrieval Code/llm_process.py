@@ -1,20 +1,119 @@
 # llm_processor.py
+import asyncio
+import heapq
 import json
-from openai import OpenAI
-from config import OPENAI_API_KEY, GPT_MODEL
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from config import LOCAL_TIME_PARSER, RERANK_CHUNK_SIZE, RERANK_CONCURRENCY, RERANK_STABLE_CHUNKS
+from llm_backend import get_llm_backend
+from llm_cache import LLMCache, make_key, normalize_query
+from clip_record import Clip
+from metrics import span
+from time_parser import parse_time_expression
+
+# Filler words dropped when keywords are extracted locally
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "for", "with", "from", "by", "is", "are",
+    "was", "were", "be", "been", "any", "all", "some", "that", "this", "these", "those", "there", "their",
+    "me", "my", "show", "find", "get", "give", "search", "look", "looking", "see", "clip", "clips",
+    "image", "images", "picture", "pictures", "photo", "photos", "footage", "video", "videos", "frame",
+    "frames", "who", "what", "when", "where", "which", "can", "you", "please", "during", "between",
+    "before", "after", "since", "until", "around"
+}
+
+class RankingMerger:
+    """Merges per-chunk rankings and notices when the top-k stops changing"""
+
+    def __init__(self, top_k=None, threshold=0.0, stable_chunks=RERANK_STABLE_CHUNKS):
+        self.top_k = top_k
+        self.threshold = threshold
+        self.stable_chunks = stable_chunks
+        self.scores = {}
+        self._top = None
+        self._unchanged = 0
+
+    @property
+    def rankings(self):
+        return [{"id": clip_id, "score": score} for clip_id, score in self.scores.items()]
+
+    def add(self, rankings):
+        """Merge one chunk's rankings; returns True once the top-k has been stable long enough"""
+        self.scores.update((ranking["id"], ranking["score"]) for ranking in rankings)
+        if not self.top_k or not self.stable_chunks:
+            return False
+
+        passing = ((clip_id, score) for clip_id, score in self.scores.items() if score >= self.threshold)
+        top = [clip_id for clip_id, _ in heapq.nlargest(self.top_k, passing, key=lambda item: item[1])]
+        if len(top) < self.top_k or top != self._top:
+            self._top = top
+            self._unchanged = 0
+            return False
+        self._unchanged += 1
+        return self._unchanged >= self.stable_chunks
+
 
-#localhost code needs to be added
 class QueryProcessor:
-    def __init__(self):
-        """Initialize OpenAI client"""
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.model = GPT_MODEL
+    def __init__(self, backend=None):
+        """Use the LLM backend selected in config (see llm_backend) unless one is passed in"""
+        self.backend = backend or get_llm_backend()
+        self.model = self.backend.model
+        self.cache = LLMCache()
+    
+    def _complete(self, messages):
+        """Send a chat completion and return the reply text"""
+        with span("llm_completion", model=self.model):
+            return self.backend.complete(messages)
     
     def extract_search_terms(self, user_query):
         """Extract structured search terms from user query including temporal aspects"""
+        with span("extract_terms"):
+            local_terms = self._try_local_terms(user_query)
+            if local_terms is not None:
+                return local_terms
+            
+            # Time language the local parser resolved is stripped, so the LLM only extracts terms
+            parsed = self._local_time(user_query)
+            terms_query = parsed["remainder"] if parsed is not None else user_query
+            cache_key = self._terms_cache_key(terms_query, dated=parsed is None)
+            search_terms = self.cache.get(cache_key)
+            if search_terms is None:
+                content = self._complete(self._terms_messages(terms_query))
+                search_terms = self._parse_search_terms(content, terms_query, cache_key)
+            return self._with_local_time(search_terms, parsed)
+    
+    def _local_time(self, user_query):
+        """The locally parsed query when it has time language the parser fully resolved, else None"""
+        if LOCAL_TIME_PARSER:
+            parsed = parse_time_expression(user_query)
+            if parsed["found"] and parsed["resolved"]:
+                return parsed
+        return None
+    
+    def _try_local_terms(self, user_query):
+        """Skip the LLM when the query is resolved time language plus at most one search word"""
+        parsed = self._local_time(user_query)
+        if parsed is not None:
+            search_terms = self._local_search_terms(parsed)
+            if len(search_terms["keywords"]) <= 1:
+                return search_terms
+        return None
+    
+    def _terms_cache_key(self, user_query, dated=True):
+        # Relative dates resolve differently each day, so the date is part of the key unless
+        # the time language was already resolved locally and stripped from the query
+        day = datetime.now().strftime('%Y-%m-%d') if dated else None
+        return make_key("terms", normalize_query(user_query), day, self.model)
+    
+    def _with_local_time(self, search_terms, parsed):
+        """Replace the extracted time references with the locally resolved window"""
+        if parsed is None:
+            return search_terms
+        return {**search_terms, "time_references": self._local_time_references(parsed)}
+    
+    def _terms_messages(self, user_query):
+        """Build the term extraction prompt"""
         system_prompt = "You are a surveillance footage search query analyzer. Extract key visual elements and time references from the user's search query."
         
-        from datetime import datetime, timedelta
         current_date = datetime.now()
         
         user_prompt = f"""
@@ -48,25 +147,25 @@ class QueryProcessor:
         Return only the JSON without explanation.
         """
         
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _parse_search_terms(self, content, user_query, cache_key):
+        """Parse the term extraction reply, falling back to plain query words"""
         try:
-            content = response.choices[0].message.content
             # Extract JSON from response (in case model adds explanations)
             start_idx = content.find('{')
             end_idx = content.rfind('}') + 1
             
             if start_idx >= 0 and end_idx > start_idx:
-                json_str = content[start_idx:end_idx]
-                return json.loads(json_str)
+                search_terms = json.loads(content[start_idx:end_idx])
+            else:
+                search_terms = json.loads(content)
             
-            return json.loads(content)
+            self.cache.set(cache_key, search_terms)
+            return search_terms
         except Exception as e:
             print(f"Error parsing search terms: {e}")
             # Fallback to basic structure
@@ -77,19 +176,92 @@ class QueryProcessor:
                 "actions": []
             }
     
-    def rank_clips(self, user_query, clips, threshold=0.6):
-        """Rank clips by relevance to the query"""
+    def _local_search_terms(self, parsed):
+        """Build the extract_search_terms structure from a locally parsed query"""
+        keywords = [
+            word for word in (token.strip(".,!?;:'\"") for token in parsed["remainder"].split())
+            if len(word) > 2 and word not in STOPWORDS
+        ]
+        return {
+            "keywords": keywords,
+            "primary_objects": [],
+            "attributes": [],
+            "actions": [],
+            "time_references": self._local_time_references(parsed)
+        }
+    
+    def _local_time_references(self, parsed):
+        if not parsed["found"]:
+            return {}
+        return {"time_period": {"start": parsed["start_time"], "end": parsed["end_time"]}}
+    
+    def rank_clips(self, user_query, clips, threshold=0.6, top_k=None):
+        """Rank clips by relevance to the query.
+
+        Candidates are scored in RERANK_CHUNK_SIZE prompts, RERANK_CONCURRENCY at a time. Pass
+        candidates best first: with top_k set and RERANK_STABLE_CHUNKS enabled, scoring stops
+        once the top-k survives that many further chunks.
+        """
         if not clips:
             return []
         
-        # Prepare clip data
-        clip_data = []
-        for clip in clips:
-            clip_data.append({
-                "id": clip["id"],
-                "description": clip["image_description"]
-            })
+        clips = Clip.from_rows(clips)
+        merger = RankingMerger(top_k, threshold)
+        pool = ThreadPoolExecutor(max_workers=RERANK_CONCURRENCY)
+        try:
+            with span("rerank"):
+                futures = [pool.submit(self._rank_chunk, user_query, chunk) for chunk in self._chunks(clips)]
+                # Merge in submission order so "stable" refers to the best candidates, not the fastest replies
+                for future in futures:
+                    if merger.add(future.result()):
+                        break
+        finally:
+            # On early exit, drop queued chunks and don't wait for the prompts already in flight
+            pool.shutdown(wait=False, cancel_futures=True)
         
+        return self._apply_rankings(merger.rankings, clips, threshold)
+    
+    def _chunks(self, clips):
+        return [clips[i:i + RERANK_CHUNK_SIZE] for i in range(0, len(clips), RERANK_CHUNK_SIZE)]
+    
+    def _rank_chunk(self, user_query, clips):
+        """Score one chunk, through the cache; a malformed reply scores nothing"""
+        clip_data = self._clip_data(clips)
+        cache_key = self._rank_cache_key(user_query, clip_data)
+        rankings = self.cache.get(cache_key)
+        if rankings is None:
+            with span("rerank_chunk"):
+                rankings = self._score_clips(user_query, clip_data)
+            if rankings is None:
+                return []
+            self.cache.set(cache_key, rankings)
+        return rankings
+    
+    def _clip_data(self, clips):
+        """Prepare the id/description pairs sent to the LLM"""
+        return [{"id": clip.id, "description": clip.image_description} for clip in clips]
+    
+    def _rank_cache_key(self, user_query, clip_data):
+        # Rankings depend only on the query and the candidate set, not on candidate order
+        return make_key("rank", normalize_query(user_query), sorted(str(item["id"]) for item in clip_data), self.model)
+    
+    def _apply_rankings(self, rankings, clips, threshold):
+        """Filter by threshold and map back to clip records by id"""
+        by_id = {clip.id: clip for clip in clips}
+        results = [
+            by_id[ranking["id"]].with_score(ranking["score"])
+            for ranking in rankings
+            if ranking["score"] >= threshold and ranking["id"] in by_id
+        ]
+        
+        return sorted(results, key=lambda clip: clip.relevance_score, reverse=True)
+    
+    def _score_clips(self, user_query, clip_data):
+        """Ask the LLM for id/score pairs; returns None if the response can't be parsed"""
+        return self._parse_rankings(self._complete(self._rank_messages(user_query, clip_data)))
+    
+    def _rank_messages(self, user_query, clip_data):
+        """Build the ranking prompt"""
         system_prompt = """
         You are a clip search system. Evaluate how relevant each clip is to the user's search query.
         Return a JSON list of objects with id and score fields, where score is between 0 and 1.
@@ -111,16 +283,14 @@ class QueryProcessor:
         Return only a JSON array of objects with 'id' and 'score' fields, sorted by score in descending order.
         """
         
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _parse_rankings(self, content):
+        """Parse the ranking reply into id/score pairs, or None if it is malformed"""
         try:
-            content = response.choices[0].message.content
             # Extract JSON array from response
             start_idx = content.find('[')
             end_idx = content.rfind(']') + 1
@@ -131,23 +301,11 @@ class QueryProcessor:
             else:
                 rankings = json.loads(content)
             
-            # Filter by threshold and map back to full clip data
-            results = []
-            for ranking in rankings:
-                if ranking["score"] >= threshold:
-                    for clip in clips:
-                        if clip["id"] == ranking["id"]:
-                            results.append({
-                                **clip,
-                                "relevance_score": ranking["score"]
-                            })
-                            break
-            
-            return sorted(results, key=lambda x: x["relevance_score"], reverse=True)
+            return [{"id": ranking["id"], "score": float(ranking["score"])} for ranking in rankings]
         except Exception as e:
             print(f"Error ranking clips: {e}")
-            print(f"Raw response: {response.choices[0].message.content}")
-            return []
+            print(f"Raw response: {content}")
+            return None
     def parse_time_references(self, time_refs):
         """Convert natural language time references to actual timestamps"""
         from datetime import datetime, timedelta
@@ -155,8 +313,6 @@ class QueryProcessor:
         now = datetime.now()
         result = {"start_time": None, "end_time": None}
 
-        print(f"Parsing time references: {time_refs}")
-
         if time_refs.get("time_period") and isinstance(time_refs["time_period"], dict):
             period = time_refs["time_period"]
             if period.get("start"):
@@ -231,5 +387,83 @@ class QueryProcessor:
                 result["start_time"] = base_date.replace(hour=22).isoformat()
                 result["end_time"] = (base_date + timedelta(days=1)).replace(hour=6).isoformat()
         
-        print(f"Parsed result: {result}")
-        return result
\ No newline at end of file
+        return result
+
+
+class AsyncQueryProcessor(QueryProcessor):
+    """QueryProcessor that awaits the backend, so LLM calls never block the event loop"""
+    
+    async def _complete(self, messages):
+        """Send a chat completion and return the reply text"""
+        with span("llm_completion", model=self.model):
+            return await self.backend.acomplete(messages)
+    
+    async def extract_search_terms(self, user_query):
+        """Extract structured search terms from user query including temporal aspects"""
+        with span("extract_terms"):
+            local_terms = self._try_local_terms(user_query)
+            if local_terms is not None:
+                return local_terms
+            
+            # Time language the local parser resolved is stripped, so the LLM only extracts terms
+            parsed = self._local_time(user_query)
+            terms_query = parsed["remainder"] if parsed is not None else user_query
+            cache_key = self._terms_cache_key(terms_query, dated=parsed is None)
+            search_terms = self.cache.get(cache_key)
+            if search_terms is None:
+                content = await self._complete(self._terms_messages(terms_query))
+                search_terms = self._parse_search_terms(content, terms_query, cache_key)
+            return self._with_local_time(search_terms, parsed)
+    
+    async def rank_clips(self, user_query, clips, threshold=0.6, top_k=None):
+        """Rank clips by relevance to the query"""
+        results = []
+        async for results in self.rank_clips_progressive(user_query, clips, threshold, top_k):
+            pass
+        return results
+    
+    async def rank_clips_progressive(self, user_query, clips, threshold=0.6, top_k=None):
+        """Yield the merged ranking as each chunk is scored, in submission order; chunks run RERANK_CONCURRENCY at a time"""
+        if not clips:
+            return
+        
+        clips = Clip.from_rows(clips)
+        semaphore = asyncio.Semaphore(RERANK_CONCURRENCY)
+        
+        async def score(chunk):
+            async with semaphore:
+                return await self._rank_chunk(user_query, chunk)
+        
+        merger = RankingMerger(top_k, threshold)
+        tasks = [asyncio.create_task(score(chunk)) for chunk in self._chunks(clips)]
+        try:
+            for task in tasks:
+                stable = merger.add(await task)
+                yield self._apply_rankings(merger.rankings, clips, threshold)
+                if stable:
+                    break
+        finally:
+            # Early exit, cancellation or an error: don't leave prompts in flight
+            for task in tasks:
+                task.cancel()
+    
+    async def _rank_chunk(self, user_query, clips):
+        """Score one chunk, through the cache; a malformed reply scores nothing"""
+        clip_data = self._clip_data(clips)
+        cache_key = self._rank_cache_key(user_query, clip_data)
+        rankings = self.cache.get(cache_key)
+        if rankings is None:
+            with span("rerank_chunk"):
+                rankings = await self._score_clips(user_query, clip_data)
+            if rankings is None:
+                return []
+            self.cache.set(cache_key, rankings)
+        return rankings
+    
+    async def _score_clips(self, user_query, clip_data):
+        """Ask the LLM for id/score pairs; returns None if the response can't be parsed"""
+        return self._parse_rankings(await self._complete(self._rank_messages(user_query, clip_data)))
+    
+    async def aclose(self):
+        """Close the backend's pooled HTTP connections"""
+        await self.backend.aclose()
@@ -0,0 +1,204 @@
+# loadtest.py
+"""Concurrent-user load test for the search path, with simulated LLM and database latency.
+
+Runs the blocking ClipSearchEngine (as the old handler did, one search at a time on the
+event loop) and AsyncClipSearchEngine against the same seeded SQLite store, and prints
+throughput and p50/p95 latency at each concurrency level.
+
+    python loadtest.py --users 1 10 100 --llm-latency 0.8 --db-latency 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from embeddings import HashingEmbedder
+from llm_cache import LLMCache
+from llm_process import QueryProcessor, AsyncQueryProcessor
+from search import ClipSearchEngine, AsyncClipSearchEngine
+from sqlite_store import SQLiteConnector, AsyncSQLiteConnector
+
+SUBJECTS = ["person", "man", "woman", "delivery driver", "red car", "white van", "dog", "cat", "cyclist", "truck"]
+ACTIONS = ["walking", "standing", "running", "parked", "carrying a box", "sitting", "waiting", "crossing"]
+PLACES = ["near the gate", "in the parking lot", "by the front door", "on the sidewalk", "in the driveway"]
+
+QUERIES = [
+    "person walking near the gate",
+    "red car in the parking lot",
+    "delivery driver carrying a box",
+    "dog on the sidewalk",
+    "white van parked in the driveway",
+    "someone waiting by the front door",
+    "cyclist crossing",
+    "truck near the gate",
+]
+
+
+def seed_store(path, clips, seed=7):
+    """Fill a SQLite clip store with synthetic descriptions spread over the last week"""
+    rng = random.Random(seed)
+    store = SQLiteConnector(path)
+    now = datetime.now()
+    for i in range(clips):
+        description = f"A {rng.choice(SUBJECTS)} {rng.choice(ACTIONS)} {rng.choice(PLACES)}."
+        time_created = now - timedelta(seconds=rng.randint(0, 7 * 24 * 3600))
+        store.insert_clip(f"cam{i % 4}", description, time_created)
+    return store
+
+
+def canned_reply(messages):
+    """Term extraction JSON built from the query words, like a well-behaved model would return"""
+    query = re.search(r'Analyze this search query: "(.*)"', messages[-1]["content"])
+    words = [word for word in (query.group(1) if query else "").split() if len(word) > 2]
+    return json.dumps({
+        "keywords": words,
+        "primary_objects": words[:1],
+        "attributes": [],
+        "actions": [],
+        "time_references": {}
+    })
+
+
+def canned_rankings(clip_data):
+    return [{"id": item["id"], "score": 0.9 - 0.01 * i} for i, item in enumerate(clip_data)]
+
+
+class StubQueryProcessor(QueryProcessor):
+    """QueryProcessor whose LLM calls block for a fixed latency"""
+
+    def __init__(self, latency):
+        self.model = "stub"
+        self.cache = LLMCache(max_size=0, path="")
+        self.latency = latency
+
+    def _try_local_terms(self, user_query):
+        # Every query pays the term extraction round trip, the worst case for the request path
+        return None
+
+    def _complete(self, messages):
+        time.sleep(self.latency)
+        return canned_reply(messages)
+
+    def _score_clips(self, user_query, clip_data):
+        time.sleep(self.latency)
+        return canned_rankings(clip_data)
+
+
+class AsyncStubQueryProcessor(AsyncQueryProcessor):
+    """AsyncQueryProcessor whose LLM calls await a fixed latency"""
+
+    def __init__(self, latency):
+        self.model = "stub"
+        self.cache = LLMCache(max_size=0, path="")
+        self.latency = latency
+
+    def _try_local_terms(self, user_query):
+        return None
+
+    async def _complete(self, messages):
+        await asyncio.sleep(self.latency)
+        return canned_reply(messages)
+
+    async def _score_clips(self, user_query, clip_data):
+        await asyncio.sleep(self.latency)
+        return canned_rankings(clip_data)
+
+    async def aclose(self):
+        pass
+
+
+class LatentSQLiteConnector:
+    """SQLiteConnector with a blocking round trip added to every call"""
+
+    def __init__(self, store, latency):
+        self.store = store
+        self.latency = latency
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+
+        def call(*args, **kwargs):
+            time.sleep(self.latency)
+            return method(*args, **kwargs)
+        return call
+
+
+async def run_users(search, users, requests_per_user):
+    """Run `users` concurrent clients; returns (wall seconds, per-request latencies)"""
+    latencies = []
+
+    async def user(n):
+        for i in range(requests_per_user):
+            query = QUERIES[(n + i) % len(QUERIES)]
+            started = time.perf_counter()
+            await search(query)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(n) for n in range(users)))
+    return time.perf_counter() - started, latencies
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(name, users, wall, latencies):
+    print(f"{name:<9} users={users:<4} requests={len(latencies):<5} "
+          f"throughput={len(latencies) / wall:8.1f} req/s  "
+          f"p50={percentile(latencies, 0.50) * 1000:8.1f} ms  "
+          f"p95={percentile(latencies, 0.95) * 1000:8.1f} ms  "
+          f"mean={statistics.mean(latencies) * 1000:8.1f} ms")
+
+
+async def main(args):
+    path = os.path.join(tempfile.mkdtemp(), "loadtest.sqlite3")
+    store = seed_store(path, args.clips)
+    print(f"Seeded {args.clips} clips in {path}")
+
+    blocking = ClipSearchEngine(
+        db=LatentSQLiteConnector(store, args.db_latency),
+        processor=StubQueryProcessor(args.llm_latency),
+        embedder=HashingEmbedder()
+    )
+    concurrent = AsyncClipSearchEngine(
+        db=AsyncSQLiteConnector(store, latency=args.db_latency),
+        processor=AsyncStubQueryProcessor(args.llm_latency),
+        embedder=HashingEmbedder()
+    )
+
+    # Every request should pay for a full search, not a result cache hit
+    blocking.result_cache = concurrent.result_cache = None
+
+    # Build the indexes up front so the measurements exclude the first sync
+    blocking.sync_index(force=True)
+    await concurrent.sync_index(force=True)
+
+    async def blocking_search(query):
+        # The previous handler called the sync engine straight from the coroutine
+        return blocking.search(query)
+
+    for users in args.users:
+        if not args.skip_blocking:
+            report("blocking", users, *await run_users(blocking_search, users, args.requests))
+        report("async", users, *await run_users(concurrent.search, users, args.requests))
+
+    await concurrent.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--requests", type=int, default=5, help="requests per user")
+    parser.add_argument("--clips", type=int, default=5000)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds per simulated LLM call")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="seconds per simulated database call")
+    parser.add_argument("--skip-blocking", action="store_true", help="only measure the async engine")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,175 @@
+# metrics.py
+import threading
+import time
+from contextlib import contextmanager
+from config import OTEL_TRACING, OTEL_SERVICE_NAME
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition layout"""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labelvalues -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Every metric in Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "clip_search_stage_seconds", "Time spent in each pipeline stage", ("stage",)))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "clip_search_stage_errors_total", "Pipeline stages that raised", ("stage",)))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "clip_search_llm_tokens_total", "LLM tokens used", ("kind",)))
+LLM_FALLBACKS = REGISTRY.register(Counter(
+    "clip_search_llm_fallbacks_total", "LLM requests served by the fallback backend"))
+LLM_CACHE = REGISTRY.register(Counter(
+    "clip_search_llm_cache_lookups_total", "LLM cache lookups by result", ("result",)))
+DB_ROWS = REGISTRY.register(Counter(
+    "clip_search_db_rows_fetched_total", "Rows returned by database queries", ("query",)))
+RESULT_CACHE = REGISTRY.register(Counter(
+    "clip_search_result_cache_lookups_total", "Search result cache lookups by result", ("result",)))
+RESULT_CACHE_AGE = REGISTRY.register(Histogram(
+    "clip_search_result_cache_age_seconds", "Age of cached search results when served",
+    buckets=(1, 5, 30, 60, 300, 900, 3600, 21600, 86400, 604800)))
+RESULT_CACHE_INVALIDATIONS = REGISTRY.register(Counter(
+    "clip_search_result_cache_invalidations_total", "Cached searches dropped because matching clips were ingested or removed"))
+
+
+def _tracer():
+    if not OTEL_TRACING:
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace.get_tracer(OTEL_SERVICE_NAME)
+
+
+def configure_tracing():
+    """Install an OTLP span exporter when OTEL_TRACING is on and the OpenTelemetry SDK is installed"""
+    global _TRACER
+    if not OTEL_TRACING:
+        return False
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        print("OTEL_TRACING is set but the OpenTelemetry SDK/OTLP exporter is not installed")
+        return False
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _TRACER = _tracer()
+    return True
+
+
+_TRACER = _tracer()
+
+
+@contextmanager
+def span(stage, **attributes):
+    """Time a pipeline stage into clip_search_stage_seconds, and trace it when OpenTelemetry is on"""
+    started = time.perf_counter()
+    otel_span = _TRACER.start_as_current_span(stage, attributes=attributes) if _TRACER else None
+    try:
+        if otel_span is not None:
+            with otel_span:
+                yield
+        else:
+            yield
+    except Exception:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage)
+
+
+def render_metrics():
+    return REGISTRY.render()
@@ -0,0 +1,132 @@
+# result_cache.py
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from llm_cache import normalize_query
+from text_index import time_key
+from metrics import RESULT_CACHE, RESULT_CACHE_AGE, RESULT_CACHE_INVALIDATIONS
+from config import INDEX_SYNC_INTERVAL, RESULT_CACHE_SIZE
+
+# results: final ranked Clips; ids: their clip ids; stored_at: monotonic time of the search;
+# windowed: False when the results came from an unbounded fallback search
+Entry = namedtuple("Entry", "results ids stored_at windowed")
+
+
+class ResultCache:
+    """LRU of final search results keyed on (kind, normalized query, time window, camera scope).
+
+    Entries have no TTL. When the index sync picks up new clips, only the entries whose time
+    window and camera scope contain one of them are dropped, so a closed historical range stays
+    cached while "latest" and other open-ended queries refresh.
+
+    Window bounds in the key are widened to a `granularity`-second grid, the interval at which
+    the index sync can notice new clips. Relative windows such as "last 3 hours" then share an
+    entry for that long instead of getting a new key every second.
+    """
+
+    def __init__(self, max_size=RESULT_CACHE_SIZE, granularity=INDEX_SYNC_INTERVAL):
+        self.max_size = max_size
+        self.granularity = granularity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def key(self, kind, query, time_constraints=None, camera_ids=None):
+        """Cache key; time bounds are normalized so equivalent windows share an entry"""
+        time_constraints = time_constraints or {}
+        return (
+            kind,
+            normalize_query(query),
+            self._snap(time_constraints.get("start_time"), up=False),
+            self._snap(time_constraints.get("end_time"), up=True),
+            tuple(camera_ids) if camera_ids else None
+        )
+
+    def _snap(self, bound, up):
+        """A time bound as a time_key, moved out to the granularity grid so the window only grows"""
+        key = time_key(bound)
+        if not key or self.granularity <= 0:
+            return key or None
+        try:
+            moment = datetime.fromisoformat(key)
+        except ValueError:
+            return key
+        step = timedelta(seconds=self.granularity)
+        snapped = datetime.min + (moment - datetime.min) // step * step
+        if up and snapped < moment:
+            snapped += step
+        return snapped.isoformat(sep=" ", timespec="seconds")
+
+    def get(self, key):
+        """Cached results for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        RESULT_CACHE.inc("miss" if entry is None else "hit")
+        if entry is None:
+            return None
+        RESULT_CACHE_AGE.observe(time.monotonic() - entry.stored_at)
+        return list(entry.results)
+
+    def set(self, key, results, windowed=True):
+        """Store results; windowed=False marks a fallback that searched outside the key's window"""
+        entry = Entry(list(results), {clip.id for clip in results}, time.monotonic(), windowed)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _affected(self, key, entry, added, removed_ids):
+        _, _, start, end, camera_ids = key
+        if removed_ids and not entry.ids.isdisjoint(removed_ids):
+            return True
+        if not entry.windowed:
+            start = end = None
+        for camera_id, clip_time in added:
+            if camera_ids is not None and camera_id not in camera_ids:
+                continue
+            if (start is None or clip_time >= start) and (end is None or clip_time <= end):
+                return True
+        return False
+
+    def invalidate(self, added=(), removed_ids=()):
+        """Drop entries that new clips fall into, or that returned a clip which is now gone"""
+        added = [(clip.camera_id, time_key(clip.time_created)) for clip in added]
+        removed_ids = set(removed_ids)
+        if not added and not removed_ids:
+            return 0
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if self._affected(key, entry, added, removed_ids)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        if stale:
+            RESULT_CACHE_INVALIDATIONS.inc(amount=len(stale))
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Hit/miss/invalidation counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries)
+            }
@@ -0,0 +1,65 @@
+-- Convert todos.time_created from text to a real timestamp and index it so range,
+-- date and latest-N queries are served by an index scan instead of a full table scan.
+ALTER TABLE todos
+    ALTER COLUMN time_created TYPE timestamp
+    USING replace(time_created, 'T', ' ')::timestamp;
+
+CREATE INDEX IF NOT EXISTS todos_time_created_idx ON todos (time_created DESC);
+
+-- Structured VLM output (objects, colors, actions, counts) stored next to the free-text
+-- description; the GIN index serves containment filters such as
+--   "Clip_Attributes" @> '{"objects": ["car"]}'
+ALTER TABLE todos ADD COLUMN IF NOT EXISTS "Clip_Attributes" jsonb;
+CREATE INDEX IF NOT EXISTS todos_clip_attributes_idx ON todos USING gin ("Clip_Attributes" jsonb_path_ops);
+
+-- Ingestion is at-least-once, so rows are upserted on the frame's storage URL; the unique
+-- index is the conflict target and keeps a redelivered frame from being inserted twice.
+CREATE UNIQUE INDEX IF NOT EXISTS todos_clip_url_key ON todos ("Clip_URL");
+
+-- Camera registry: the names, locations and tags a search can scope itself with
+-- ("person at the loading dock"). The composite index serves per-camera range and
+-- latest-N queries without touching other cameras' rows.
+CREATE TABLE IF NOT EXISTS cameras (
+    id text PRIMARY KEY,
+    name text,
+    location text,
+    tags text[] NOT NULL DEFAULT '{}'
+);
+
+-- Written by ingestion from the capture file name (cam0_clip_12.jpg -> cam0)
+ALTER TABLE todos ADD COLUMN IF NOT EXISTS camera_id text;
+CREATE INDEX IF NOT EXISTS todos_camera_time_idx ON todos (camera_id, time_created DESC);
+
+-- Keyset pagination walks clips in (time_created, id) order; id breaks ties between
+-- frames captured in the same second, so every page resumes exactly where the last ended.
+CREATE INDEX IF NOT EXISTS todos_time_id_idx ON todos (time_created, id);
+
+-- Multi-keyword candidate fetch in one round trip: rows matching any keyword, each once,
+-- with the number of keywords it matched. Called as an RPC by get_clips_by_keywords.
+-- The trigram index serves the ILIKE ANY prefilter.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS todos_description_trgm_idx ON todos USING gin (image_description gin_trgm_ops);
+
+CREATE OR REPLACE FUNCTION match_clips_by_keywords(
+    keywords text[],
+    start_time timestamp DEFAULT NULL,
+    end_time timestamp DEFAULT NULL,
+    camera_ids text[] DEFAULT NULL,
+    max_rows integer DEFAULT NULL
+)
+RETURNS TABLE (id bigint, camera_id text, image_description text, time_created timestamp, match_count integer)
+LANGUAGE sql STABLE AS $$
+    SELECT t.id, t.camera_id, t.image_description, t.time_created, m.match_count
+    FROM todos t
+    CROSS JOIN LATERAL (
+        SELECT count(*)::integer AS match_count
+        FROM unnest(keywords) AS k
+        WHERE t.image_description ILIKE '%' || k || '%'
+    ) m
+    WHERE t.image_description ILIKE ANY (ARRAY(SELECT '%' || k || '%' FROM unnest(keywords) AS k))
+      AND (start_time IS NULL OR t.time_created >= start_time)
+      AND (end_time IS NULL OR t.time_created <= end_time)
+      AND (camera_ids IS NULL OR t.camera_id = ANY (camera_ids))
+    ORDER BY m.match_count DESC, t.time_created DESC
+    LIMIT max_rows;
+$$;
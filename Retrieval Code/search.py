@@ -1,279 +1,725 @@
 # search_engine.py
-from db import SupabaseConnector
-from llm_process import QueryProcessor
-from config import RELEVANCE_THRESHOLD, MAX_RESULTS
+from storage import get_connector, get_async_connector, to_timestamp
+from llm_process import QueryProcessor, AsyncQueryProcessor
+from embeddings import EmbeddingIndex, get_embedder
+from text_index import TextIndex, tokenize
+from cameras import CameraRegistry
+from result_cache import ResultCache
+from clip_record import Clip
+from metrics import span
+from time_parser import parse_time_expression
+from config import (RELEVANCE_THRESHOLD, MAX_RESULTS, MAX_CANDIDATES, DB_PAGE_SIZE, USE_EMBEDDING_INDEX, EMBEDDING_INDEX_PATH,
+                    EMBEDDING_THRESHOLD, INDEX_SYNC_INTERVAL, LLM_RERANK, LOCAL_TIME_PARSER, USE_TEXT_INDEX,
+                    CAMERA_REGISTRY_PATH, RESULT_CACHE_SIZE)
 from datetime import datetime, timedelta
+import asyncio
+import time
+
+LATEST_TERMS = ["latest", "most recent", "newest", "last"]
+SINGLE_IMAGE_TERMS = ["image", "picture", "photo", "snapshot", "frame"]
+LATEST_OBJECTS = ["person", "people", "car", "vehicle", "bike", "bicycle", "dog", "cat", "animal"]
 
 class ClipSearchEngine:
-    def __init__(self):
+    def __init__(self, db=None, processor=None, embedder=None):
         """Initialize search engine components"""
-        self.db = SupabaseConnector()
-        self.processor = QueryProcessor()
+        self.db = db or get_connector()
+        self.processor = processor or QueryProcessor()
         self.threshold = RELEVANCE_THRESHOLD
         self.max_results = MAX_RESULTS
-    
+
+        # Local vector index over image descriptions; the LLM becomes an optional rerank
+        self.index = EmbeddingIndex(embedder or get_embedder()) if USE_EMBEDDING_INDEX else None
+        self.last_index_sync = 0.0
+        if self.index is not None and EMBEDDING_INDEX_PATH:
+            self.index.load(EMBEDDING_INDEX_PATH)
+
+        # In-memory BM25 index for candidate generation instead of per-keyword ILIKE scans
+        self.text_index = TextIndex() if USE_TEXT_INDEX else None
+
+        # Camera names, locations and tags a query can scope itself with ("... at the loading dock")
+        self.cameras = CameraRegistry.from_file(CAMERA_REGISTRY_PATH) if CAMERA_REGISTRY_PATH else CameraRegistry()
+        self.last_camera_sync = 0.0
+
+        # Final results per query, window and scope; the index sync tells it which entries new clips affect
+        self.result_cache = ResultCache() if RESULT_CACHE_SIZE and self._indexes() else None
+
+        # Lets Clip.image fetch a frame on demand; the async engine serves frames by URL instead
+        self._image_loader = self.db.get_clip_image
+
     def search(self, user_query):
         """Execute search for clips matching the user query including temporal aspects"""
-        print(f"Processing search: '{user_query}'")
-        
-        # Check for "latest" or "most recent" queries
-        lower_query = user_query.lower()
-        if any(term in lower_query for term in ["latest", "most recent", "newest", "last"]):
-            print("Detected request for latest images")
-            
-            # Check if the user is asking for a single image
-            single_image_request = any(term in lower_query for term in ["image", "picture", "photo", "snapshot", "frame"])
-            
-            # Get the latest matches
-            latest_clips = self._get_latest_clips(lower_query)
-            
+        with span("search"):
+            return self._search(user_query)
+
+    def _search(self, user_query):
+        # Camera mentions become a filter and are stripped before term extraction and ranking
+        self.sync_cameras()
+        camera_ids, user_query = self.cameras.resolve(user_query)
+
+        # Check for "latest" or "most recent" queries; "last night" or "last week" are time ranges instead
+        is_latest, single_image_request = self._latest_request(user_query, camera_ids)
+        if is_latest:
+            self.sync_index()
+            key = self._result_key("latest", user_query, None, camera_ids)
+            cached = self._cached_results(key)
+            if cached is not None:
+                return cached
+            with span("candidate_fetch", kind="latest"):
+                latest_clips = self._get_latest_clips(user_query.lower(), camera_ids)
             if latest_clips:
-                # If specifically requesting a single image, return only the most recent one
-                if single_image_request:
-                    print("Returning single latest image as requested")
-                    return [latest_clips[0]]  # Return just the first (most recent) result
-                else:
-                    print(f"Returning {len(latest_clips)} latest clips")
-                    return latest_clips
-        
+                return self._remember_results(key, self._latest_results(latest_clips, single_image_request))
+
         # Regular search flow continues if not a "latest" query or if no results
         # Extract structured search terms from query
         search_terms = self.processor.extract_search_terms(user_query)
-        print(f"Extracted terms: {search_terms}")
-        
+
         # Parse time references if present
-        time_constraints = None
-        if "time_references" in search_terms and any(search_terms.get("time_references", {}).values()):
-            time_constraints = self.processor.parse_time_references(search_terms["time_references"])
-            print(f"Time constraints: {time_constraints}")
-            
-            # Fix the date format - convert ISO format to database text format
-            if time_constraints.get("start_time"):
-                time_constraints["start_time"] = time_constraints["start_time"].replace('T', ' ')
-            if time_constraints.get("end_time"):
-                time_constraints["end_time"] = time_constraints["end_time"].replace('T', ' ')
-            print(f"Adjusted time constraints for DB format: {time_constraints}")
-        
-        # Special handling for full-day searches
-        if time_constraints and time_constraints.get("start_time") and time_constraints.get("end_time"):
-            # Check if this is a full day search (00:00:00 to 23:59:59)
-            start_parts = time_constraints["start_time"].split(' ')
-            end_parts = time_constraints["end_time"].split(' ')
-            
-            if len(start_parts) == 2 and len(end_parts) == 2:
-                date_part_start = start_parts[0]
-                date_part_end = end_parts[0]
-                time_part_start = start_parts[1]
-                time_part_end = end_parts[1]
-                
-                if (date_part_start == date_part_end and 
-                    time_part_start == "00:00:00" and 
-                    time_part_end == "23:59:59"):
-                    
-                    print(f"Using date pattern search for {date_part_start}")
-                    potential_matches = self.db.get_clips_by_date(date_part_start)
-                    
-                    # Skip to ranking if we have matches
-                    # Skip ranking for date-based searches - directly return results
-                    if potential_matches:
-                        print(f"Bypassing ranking for date-specific search, returning {len(potential_matches)} results directly")
-                        # Format results with default high relevance score
-                        for match in potential_matches:
-                            match["relevance_score"] = 0.95  # Set a high default relevance
-                        
-                        # Limit number of results
-                        results = potential_matches[:self.max_results]
-                        return results
-        
-        # Standard search flow if not a full day search or if full day search found no results
-        potential_matches = self._get_potential_matches(search_terms, time_constraints)
-        print(f"Found {len(potential_matches)} potential matches")
-        
-        # If no matches, try with all clips within time constraints if specified
-        if not potential_matches and time_constraints and (time_constraints.get("start_time") or time_constraints.get("end_time")):
-            print("No keyword matches, trying with time constraints only")
-            if time_constraints.get("start_time") and time_constraints.get("end_time"):
-                potential_matches = self.db.get_clips_by_timeframe(
-                    time_constraints["start_time"],
-                    time_constraints["end_time"]
-                )
-            elif time_constraints.get("start_time"):
-                # Only start time specified, use until now
-                now_formatted = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                potential_matches = self.db.get_clips_by_timeframe(
-                    time_constraints["start_time"],
-                    now_formatted
-                )
-            elif time_constraints.get("end_time"):
-                # Only end time specified, use from beginning of available data
-                potential_matches = self.db.get_clips_by_timeframe(
-                    "1970-01-01 00:00:00",  # Unix epoch start as earliest possible date
-                    time_constraints["end_time"]
-                )
-            
-            print(f"Time-only search found {len(potential_matches)} matches")
-            
-            # If we found time-based matches, return them with default relevance scores
-            if potential_matches:
-                for match in potential_matches:
-                    match["relevance_score"] = 0.8  # Good default relevance for time-based matches
-                results = potential_matches[:self.max_results]
-                return results
-        
-        # If still no matches, try with all clips
-        if not potential_matches:
-            print("No matches with constraints, trying with all clips")
-            potential_matches = self.db.get_all_clips()
-        
-        # Limit to reasonable number before semantic ranking
-        if len(potential_matches) > 50:
-            potential_matches = potential_matches[:50]
-        
-        # Include time relevance info in query if time constraints exist
-        enhanced_query = user_query
-        if time_constraints:
-            time_info = ""
-            if time_constraints.get("start_time"):
-                time_info += f" from {time_constraints['start_time']}"
-            if time_constraints.get("end_time"):
-                time_info += f" until {time_constraints['end_time']}"
-            if time_info:
-                enhanced_query += f". Consider time relevance:{time_info}"
-        
-        print(f"Enhanced query for ranking: {enhanced_query}\n")
-        
-        # Rank results by semantic relevance
-        ranked_results = self.processor.rank_clips(
-            enhanced_query, 
-            potential_matches,
-            self.threshold
-        )
-        # print(f"Datatype of ranked list: {type(ranked_results)}\n")
-        # print(f"Results: {ranked_results}\n")
-        print(f"Ranking returned {len(ranked_results)} results\n")
-        
-        # If ranking filtered out all results but we had potential matches,
-        # lower the threshold and try again
-        # '''if not ranked_results and potential_matches:
-        #     print("Warning: Ranking filtered out all results. Trying with lower threshold.")
-        #     fallback_threshold = 0.3  # Lower threshold as fallback
-        #     ranked_results = self.processor.rank_clips(
-        #         enhanced_query,
-        #         potential_matches,
-        #         fallback_threshold
-        #     )
-        #     print(f"Fallback ranking returned {len(ranked_results)} results")'''
-        
+        time_constraints = self._time_constraints(search_terms)
+
+        # New clips are only noticed by the index sync, so run it before trusting the cache
+        self.sync_index()
+        key = self._result_key("search", user_query, time_constraints, camera_ids)
+        cached = self._cached_results(key)
+        if cached is not None:
+            return cached
+        results, windowed = self._search_matches(user_query, search_terms, time_constraints, camera_ids)
+        return self._remember_results(key, results, windowed)
+
+    def _search_matches(self, user_query, search_terms, time_constraints, camera_ids):
+        """Candidate fetch and ranking for a query whose terms and time window are resolved.
+
+        Returns (results, windowed); windowed is False when nothing matched in the time window
+        and the results come from a search over every clip instead.
+        """
+        scope = self._scope(camera_ids)
+        windowed = True
+        with span("candidate_fetch"):
+            # Special handling for full-day searches
+            full_day = self._full_day(time_constraints)
+            if full_day:
+                potential_matches = self._clips(self.db.get_clips_by_date(full_day, limit=self.max_results, **scope))
+
+                # Skip ranking for date-based searches - directly return results
+                if potential_matches:
+                    return self._with_score(potential_matches, 0.95), windowed
+
+            # Standard search flow if not a full day search or if full day search found no results
+            potential_matches = self._get_potential_matches(search_terms, time_constraints, camera_ids)
+
+            # If no matches, try with all clips within time constraints if specified
+            if not potential_matches and self._has_time(time_constraints):
+                potential_matches = self._clips(self.db.get_clips_by_timeframe(
+                    *self._time_only_bounds(time_constraints), limit=self.max_results, **scope
+                ))
+
+                # If we found time-based matches, return them with default relevance scores
+                if potential_matches:
+                    return self._with_score(potential_matches, 0.8), windowed
+
+            # If still no matches, search the embedding index or fall back to all clips
+            if not potential_matches:
+                windowed = False
+                if self.index is None:
+                    potential_matches = self._candidates([{}], camera_ids)
+
+        with span("rank"):
+            if not potential_matches:
+                # Without the embedding index there is nothing left to search
+                return (self._search_index(user_query, camera_ids) if self.index is not None else []), windowed
+
+            # Include time relevance info in query if time constraints exist
+            enhanced_query = self._enhanced_query(user_query, time_constraints)
+
+            # Rank results by semantic relevance
+            ranked_results = self._rank_candidates(user_query, enhanced_query, potential_matches)
+
         # Limit number of results
-        results = ranked_results[:self.max_results] if len(ranked_results) > self.max_results else ranked_results
-        
-        # Debug output
-        print(f"Final results count: {len(results)}")
-        
+        return ranked_results[:self.max_results], windowed
+
+    # Pure steps of the search flow, shared with AsyncClipSearchEngine
+
+    def _latest_request(self, user_query, camera_ids=None):
+        """(is a "latest" query, wants a single image)"""
+        if camera_ids and not user_query.strip():
+            # Nothing but a camera, e.g. "lobby camera": show its most recent clips
+            return True, False
+        lower_query = user_query.lower()
+        is_time_query = LOCAL_TIME_PARSER and parse_time_expression(user_query)["found"]
+        if is_time_query or not any(term in lower_query for term in LATEST_TERMS):
+            return False, False
+        return True, any(term in lower_query for term in SINGLE_IMAGE_TERMS)
+
+    def _latest_results(self, latest_clips, single_image_request):
+        # If specifically requesting a single image, return only the most recent one
+        if single_image_request:
+            return [latest_clips[0]]
+        return latest_clips
+
+    def _result_key(self, kind, user_query, time_constraints, camera_ids):
+        return None if self.result_cache is None else self.result_cache.key(kind, user_query, time_constraints, camera_ids)
+
+    def _cached_results(self, key):
+        return None if key is None else self.result_cache.get(key)
+
+    def _remember_results(self, key, results, windowed=True):
+        if key is not None:
+            self.result_cache.set(key, results, windowed)
         return results
-    
-    def _get_latest_clips(self, query):
-        """Get the most recent clips from the database"""
+
+    def _invalidate_results(self, added, removed_ids):
+        if self.result_cache is not None:
+            self.result_cache.invalidate(added, removed_ids)
+
+    def _scope(self, camera_ids):
+        """Camera filter for connector calls; unscoped calls pass nothing, so any connector works"""
+        return {"camera_ids": camera_ids} if camera_ids else {}
+
+    def _scope_ids(self, camera_ids):
+        """Ids of the indexed clips from the scoped cameras, or None for an unscoped search"""
+        if not camera_ids or self.text_index is None:
+            return None
+        return [clip.id for clip in self.text_index.in_range(camera_ids=camera_ids)]
+
+    def _in_scope(self, clips, camera_ids):
+        return [clip for clip in clips if clip.camera_id in camera_ids] if camera_ids else clips
+
+    def _camera_sync_due(self, force):
+        # A registry file is authoritative; otherwise the cameras table is polled with the indexes
+        if CAMERA_REGISTRY_PATH or not hasattr(self.db, "get_cameras"):
+            return False
+        return force or time.monotonic() - self.last_camera_sync >= INDEX_SYNC_INTERVAL
+
+    def sync_cameras(self, force=False):
+        """Reload the camera registry from the database"""
+        if not self._camera_sync_due(force):
+            return
+        self.last_camera_sync = time.monotonic()
         try:
-            # Get all clips with timestamp
-            all_clips = self.db.get_all_clips()
-            
-            if not all_clips:
-                return []
-            
-            # Filter for specific keywords if mentioned (e.g., "latest person", "latest car")
-            specific_object = None
-            for obj in ["person", "people", "car", "vehicle", "bike", "bicycle", "dog", "cat", "animal"]:
-                if obj in query:
-                    specific_object = obj
-                    break
-            
-            if specific_object:
-                print(f"Filtering latest results for '{specific_object}'")
-                filtered_clips = []
-                for clip in all_clips:
-                    if specific_object in clip.get("image_description", "").lower():
-                        filtered_clips.append(clip)
-                
-                if filtered_clips:
-                    all_clips = filtered_clips
-                else:
-                    print(f"No clips found with '{specific_object}', returning general latest clips")
-            
-            # Sort by time_created (most recent first)
-            sorted_clips = sorted(
-                all_clips, 
-                key=lambda x: x.get("time_created", "1970-01-01 00:00:00"), 
-                reverse=True
-            )
-            
-            # Add relevance scores
-            for clip in sorted_clips:
-                clip["relevance_score"] = 0.95  # High score for latest clips
-            
-            # Return top N results
-            return sorted_clips[:self.max_results]
-            
+            self.cameras.load(self.db.get_cameras())
         except Exception as e:
-            print(f"Error getting latest clips: {e}")
+            print(f"Error loading cameras: {e}")
+
+    def _preview(self, user_query, camera_ids=None):
+        """Instant candidates from the in-memory text index, before any LLM or database call.
+
+        Scores are the fraction of query terms a clip matches, so they read like relevance.
+        """
+        if self.text_index is None or not len(self.text_index):
+            return []
+        parsed = parse_time_expression(user_query) if LOCAL_TIME_PARSER else {"found": False}
+        text = parsed["remainder"] if parsed["found"] else user_query
+        query_terms = set(tokenize(text))
+        if not query_terms:
             return []
-    
-    def _get_potential_matches(self, search_terms, time_constraints=None):
-        """Get potential matches using keyword filtering and time constraints"""
+        hits = self.text_index.search(
+            [text],
+            parsed.get("start_time") if parsed["found"] else None,
+            parsed.get("end_time") if parsed["found"] else None,
+            limit=self.max_results,
+            camera_ids=camera_ids
+        )
+        return [clip.with_score(matched / len(query_terms)) for clip, _, matched in hits]
+
+    def _latest_object(self, query):
+        """Object named in a "latest" query (e.g., "latest person", "latest car"), if any"""
+        for obj in LATEST_OBJECTS:
+            if obj in query:
+                return obj
+        return None
+
+    def _time_constraints(self, search_terms):
+        """Resolve the extracted time references to timestamp bounds, or None"""
+        if not any(search_terms.get("time_references", {}).values()):
+            return None
+        time_constraints = self.processor.parse_time_references(search_terms["time_references"])
+
+        # Normalize to timestamps so every backend compares them the same way
+        return {key: self._to_timestamp(value) for key, value in time_constraints.items()}
+
+    def _has_time(self, time_constraints):
+        return bool(time_constraints and (time_constraints.get("start_time") or time_constraints.get("end_time")))
+
+    def _full_day(self, time_constraints):
+        """The date of a 00:00:00 to 23:59:59 single-day range, or None"""
+        if not time_constraints or not time_constraints.get("start_time") or not time_constraints.get("end_time"):
+            return None
+        start_parts = time_constraints["start_time"].split('T')
+        end_parts = time_constraints["end_time"].split('T')
+        if len(start_parts) != 2 or len(end_parts) != 2:
+            return None
+        if start_parts[0] == end_parts[0] and start_parts[1] == "00:00:00" and end_parts[1] == "23:59:59":
+            return start_parts[0]
+        return None
+
+    def _time_only_bounds(self, time_constraints):
+        """Close an open-ended range at the Unix epoch or at now"""
+        return (
+            time_constraints.get("start_time") or "1970-01-01T00:00:00",
+            time_constraints.get("end_time") or to_timestamp(datetime.now())
+        )
+
+    def _with_score(self, clips, score):
+        """Give clips a default relevance and cap them at max_results"""
+        return [clip.with_score(score) for clip in clips[:self.max_results]]
+
+    def _keywords(self, search_terms):
+        """Flatten the extracted terms into keywords, skipping time_references and very short terms"""
         all_terms = []
-        
-        # Extract all keywords from search terms
         for key, value in search_terms.items():
-            if key != "time_references":  # Skip time_references object
+            if key != "time_references":
                 if isinstance(value, list):
                     all_terms.extend(value)
                 elif isinstance(value, str):
                     all_terms.append(value)
-        
-        # Filter out terms that are too short and skip the time_references field
-        keywords = [term for term in all_terms if term and len(term) > 2]
-        print(f"Search keywords: {keywords}")
-        
-        # If both keywords and time constraints exist, use combined search
-        if keywords and time_constraints and (time_constraints.get("start_time") or time_constraints.get("end_time")):
-            all_matches = []
-            seen_ids = set()
-            
-            for keyword in keywords:
-                matches = self.db.get_clips_by_keyword_and_time(
-                    keyword,
-                    time_constraints.get("start_time"),
-                    time_constraints.get("end_time")
-                )
-                for match in matches:
-                    if match["id"] not in seen_ids:
-                        all_matches.append(match)
-                        seen_ids.add(match["id"])
-            
-            return all_matches
-        
-        # If only time constraints exist
-        elif time_constraints and (time_constraints.get("start_time") or time_constraints.get("end_time")):
-            return self.db.get_clips_by_timeframe(
-                time_constraints.get("start_time", "1970-01-01 00:00:00"),
-                time_constraints.get("end_time", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-            )
-        
+        return [term for term in all_terms if term and len(term) > 2]
+
+    def _text_index_matches(self, keywords, time_constraints, camera_ids=None):
+        """Answer keyword, time-bounded and camera-scoped lookups from the local index in one pass"""
+        has_time = self._has_time(time_constraints)
+        start_time = time_constraints.get("start_time") if has_time else None
+        end_time = time_constraints.get("end_time") if has_time else None
+        if keywords:
+            return [clip for clip, _, _ in self.text_index.search(keywords, start_time, end_time, camera_ids=camera_ids)]
+        return self.text_index.in_range(start_time, end_time, camera_ids=camera_ids)
+
+    def _keyword_bounds(self, time_constraints):
+        """Time bounds for a keyword fetch; either end may stay open"""
+        if not self._has_time(time_constraints):
+            return None, None
+        return time_constraints.get("start_time"), time_constraints.get("end_time")
+
+    def _keyword_matches(self, rows, keywords):
+        """Clips from a multi-keyword fetch in database order, pre-scored by the share of keywords matched"""
+        return [
+            clip.with_score(row.get("match_count", 1) / len(keywords))
+            for clip, row in zip(self._clips(rows), rows)
+        ]
+
+    def _page_size(self):
+        return max(1, min(DB_PAGE_SIZE, MAX_CANDIDATES))
+
+    def _enhanced_query(self, user_query, time_constraints):
+        """Append the time bounds to the query so the ranker can weigh them"""
+        if not time_constraints:
+            return user_query
+        time_info = ""
+        if time_constraints.get("start_time"):
+            time_info += f" from {time_constraints['start_time']}"
+        if time_constraints.get("end_time"):
+            time_info += f" until {time_constraints['end_time']}"
+        if time_info:
+            return f"{user_query}. Consider time relevance:{time_info}"
+        return user_query
+
+    def _clips(self, rows):
+        """Wrap database rows in Clip records; frames stay in the database until asked for"""
+        return Clip.from_rows(rows, self._image_loader)
+
+    def _ranked_hits(self, by_id, hits):
+        return [
+            by_id[clip_id].with_score(score)
+            for clip_id, score in hits
+            if score >= EMBEDDING_THRESHOLD
+        ]
+
+    def _indexes(self):
+        return [index for index in (self.text_index, self.index) if index is not None]
+
+    def _sync_due(self, force):
+        return bool(self._indexes()) and (force or time.monotonic() - self.last_index_sync >= INDEX_SYNC_INTERVAL)
+
+    def _sync_diff(self, index, current_ids, fetched):
+        """(stale ids, missing ids, ids whose rows still have to be fetched) for one index"""
+        stale = [clip_id for clip_id in index.ids if clip_id not in current_ids]
+        missing = [clip_id for clip_id in current_ids if clip_id not in index]
+        needed = [clip_id for clip_id in missing if clip_id not in fetched]
+        return stale, missing, needed
+
+    def sync_index(self, force=False):
+        """Bring the local indexes up to date with clips added to or removed from the todos table"""
+        if not self._sync_due(force):
+            return
+        current_ids = set(self.db.get_clip_ids())
+        self.last_index_sync = time.monotonic()
+
+        # Rows for new ids are fetched once and shared by both indexes
+        fetched = {}
+        removed = set()
+        resave = False
+        for index in self._indexes():
+            stale, missing, needed = self._sync_diff(index, current_ids, fetched)
+            if needed:
+                fetched.update((clip.id, clip) for clip in self._clips(self.db.get_clips_by_ids(needed)))
+            dropped = index.remove(stale)
+            added = index.add([fetched[clip_id] for clip_id in missing if clip_id in fetched])
+            removed.update(stale)
+            if stale or missing:
+                print(f"{type(index).__name__} synced: +{len(missing)} -{len(stale)} ({len(index)} clips)")
+            # The saved matrix is rewritten in full, so only when the embedding rows changed
+            if index is self.index:
+                resave = bool(dropped or added)
+        self._invalidate_results(fetched.values(), removed)
+
+        if resave and EMBEDDING_INDEX_PATH:
+            self.index.save(EMBEDDING_INDEX_PATH)
+
+    def _rank_candidates(self, user_query, enhanced_query, candidates):
+        """Rank candidates by embedding similarity, optionally reranking the top with the LLM"""
+        if self.index is None:
+            return self.processor.rank_clips(enhanced_query, candidates, self.threshold, top_k=self.max_results)
+
+        self.sync_index()
+        unindexed = [clip for clip in candidates if clip.id not in self.index]
+        if unindexed:
+            self.index.add(unindexed)
+
+        by_id = {clip.id: clip for clip in candidates}
+        hits = self.index.search(user_query, k=self.max_results, candidate_ids=list(by_id))
+        ranked = self._ranked_hits(by_id, hits)
+
+        if LLM_RERANK and ranked:
+            return self.processor.rank_clips(enhanced_query, ranked, self.threshold, top_k=self.max_results)
+        return ranked
+
+    def _search_index(self, user_query, camera_ids=None):
+        """Top-k cosine search across every indexed clip from the scoped cameras"""
+        self.sync_index()
+        hits = self.index.search(user_query, k=self.max_results, candidate_ids=self._scope_ids(camera_ids))
+        scores = {clip_id: score for clip_id, score in hits if score >= EMBEDDING_THRESHOLD}
+        clips = self._in_scope(self._clips(self.db.get_clips_by_ids(list(scores))), camera_ids)
+        clips = [clip.with_score(scores[clip.id]) for clip in clips]
+
+        if LLM_RERANK and clips:
+            return self.processor.rank_clips(user_query, clips, self.threshold, top_k=self.max_results)
+        return clips
+
+    def _to_timestamp(self, value):
+        """Normalize a time bound, dropping values the LLM produced in an unparseable form"""
+        try:
+            return to_timestamp(value) if value else None
+        except ValueError:
+            print(f"Ignoring unparseable time bound: {value}")
+            return None
+
+    def _candidates(self, filter_sets, camera_ids=None):
+        """Up to MAX_CANDIDATES distinct clips, newest first within each filter set.
+
+        Rows stream from the keyset iterator, so pages past the cap are never requested and
+        memory stays bounded however many rows match.
+        """
+        found = {}
+        for filters in filter_sets:
+            rows = self.db.iter_clips(self._page_size(), newest_first=True, **filters, **self._scope(camera_ids))
+            for row in rows:
+                found.setdefault(row["id"], row)
+                if len(found) >= MAX_CANDIDATES:
+                    return self._clips(list(found.values()))
+        return self._clips(list(found.values()))
+
+    def _get_latest_clips(self, query, camera_ids=None):
+        """Get the most recent clips from the database"""
+        try:
+            specific_object = self._latest_object(query)
+            scope = self._scope(camera_ids)
+
+            # ORDER BY time_created DESC LIMIT n runs in the database, so only n rows come back
+            latest_clips = []
+            if specific_object:
+                latest_clips = self._clips(self.db.get_latest_clips(self.max_results, keyword=specific_object, **scope))
+            if not latest_clips:
+                latest_clips = self._clips(self.db.get_latest_clips(self.max_results, **scope))
+
+            # High score for latest clips
+            return self._with_score(latest_clips, 0.95)
+
+        except Exception as e:
+            print(f"Error getting latest clips: {e}")
+            return []
+
+    def _get_potential_matches(self, search_terms, time_constraints=None, camera_ids=None):
+        """Get potential matches using keyword filtering, time constraints and the camera scope"""
+        keywords = self._keywords(search_terms)
+
+        has_time = self._has_time(time_constraints)
+
+        if self.text_index is not None and (keywords or has_time):
+            self.sync_index()
+            return self._text_index_matches(keywords, time_constraints, camera_ids)
+
         # If no valid keywords and no time constraints, return empty list
-        elif not keywords:
+        if not keywords and not has_time:
             return []
-        
-        # Otherwise use the original keyword-only search
-        else:
-            # Try each keyword and collect results
-            all_matches = []
-            seen_ids = set()
-            
-            for keyword in keywords:
-                matches = self.db.get_clips_by_keyword(keyword)
-                for match in matches:
-                    if match["id"] not in seen_ids:
-                        all_matches.append(match)
-                        seen_ids.add(match["id"])
-            
-            return all_matches
\ No newline at end of file
+
+        # Every keyword in one OR query; rows arrive most-matched first, which is the pre-rank
+        if keywords:
+            rows = self.db.get_clips_by_keywords(
+                keywords, *self._keyword_bounds(time_constraints), limit=MAX_CANDIDATES, **self._scope(camera_ids)
+            )
+            return self._keyword_matches(rows, keywords)
+
+        # Time constraints only: stream the range, read only as far as the candidate cap
+        start_time, end_time = self._time_only_bounds(time_constraints)
+        return self._candidates([{"start_time": start_time, "end_time": end_time}], camera_ids)
+
+
+class AsyncClipSearchEngine(ClipSearchEngine):
+    """ClipSearchEngine for the event loop: awaits the database and LLM, embeds in worker threads"""
+
+    def __init__(self, db=None, processor=None, embedder=None):
+        super().__init__(
+            db=db or get_async_connector(),
+            processor=processor or AsyncQueryProcessor(),
+            embedder=embedder
+        )
+        self._sync_lock = asyncio.Lock()
+        self._image_loader = None
+
+    async def search(self, user_query):
+        """Execute search for clips matching the user query including temporal aspects"""
+        results = []
+        async for _, results in self.search_stream(user_query):
+            pass
+        return results
+
+    async def search_stream(self, user_query):
+        """Yield (stage, results) as the search refines; the last yield is the final result list.
+
+        Stages are "candidates" (local index hits, no network), "ranked" (embedding or LLM
+        scores) and "reranked" (LLM rerank of the embedding ranking, when enabled).
+        """
+        await self.sync_cameras()
+        camera_ids, user_query = self.cameras.resolve(user_query)
+
+        is_latest, single_image_request = self._latest_request(user_query, camera_ids)
+        if is_latest:
+            await self.sync_index()
+            key = self._result_key("latest", user_query, None, camera_ids)
+            cached = self._cached_results(key)
+            if cached is not None:
+                yield "ranked", cached
+                return
+            with span("candidate_fetch", kind="latest"):
+                latest_clips = await self._get_latest_clips(user_query.lower(), camera_ids)
+            if latest_clips:
+                yield "ranked", self._remember_results(key, self._latest_results(latest_clips, single_image_request))
+                return
+
+        await self.sync_index()
+        with span("preview"):
+            preview = self._preview(user_query, camera_ids)
+        if preview:
+            yield "candidates", preview
+
+        search_terms = await self.processor.extract_search_terms(user_query)
+        time_constraints = self._time_constraints(search_terms)
+
+        key = self._result_key("search", user_query, time_constraints, camera_ids)
+        cached = self._cached_results(key)
+        if cached is not None:
+            yield "ranked", cached
+            return
+
+        # Only a search that ran to its final stage is cached; a cancelled one never gets here
+        results, windowed = [], True
+        async for stage, results, windowed in self._stream_matches(user_query, search_terms, time_constraints, camera_ids):
+            yield stage, results
+        self._remember_results(key, results, windowed)
+
+    async def _stream_matches(self, user_query, search_terms, time_constraints, camera_ids):
+        """Yield (stage, results, windowed) for a query whose terms and time window are resolved.
+
+        windowed is False once nothing matched in the time window and every clip is searched instead.
+        """
+        scope = self._scope(camera_ids)
+        full_day = self._full_day(time_constraints)
+        if full_day:
+            with span("candidate_fetch", kind="full_day"):
+                potential_matches = self._clips(await self.db.get_clips_by_date(full_day, limit=self.max_results, **scope))
+            if potential_matches:
+                yield "ranked", self._with_score(potential_matches, 0.95), True
+                return
+
+        with span("candidate_fetch"):
+            potential_matches = await self._get_potential_matches(search_terms, time_constraints, camera_ids)
+
+        if not potential_matches and self._has_time(time_constraints):
+            with span("candidate_fetch", kind="time_only"):
+                potential_matches = self._clips(await self.db.get_clips_by_timeframe(
+                    *self._time_only_bounds(time_constraints), limit=self.max_results, **scope
+                ))
+            if potential_matches:
+                yield "ranked", self._with_score(potential_matches, 0.8), True
+                return
+
+        windowed = bool(potential_matches)
+        if not potential_matches:
+            if self.index is not None:
+                async for stage, results in self._search_index(user_query, camera_ids):
+                    yield stage, results, windowed
+                return
+            potential_matches = await self._candidates([{}], camera_ids)
+
+        enhanced_query = self._enhanced_query(user_query, time_constraints)
+        async for stage, results in self._rank_candidates(user_query, enhanced_query, potential_matches):
+            yield stage, results[:self.max_results], windowed
+
+    async def _embed(self, texts):
+        """Embedding is CPU (hashing) or blocking HTTP (OpenAI), so it runs off the loop"""
+        return await asyncio.to_thread(self.index.embedder.embed, texts)
+
+    async def _index_add(self, clips):
+        clips = [clip for clip in clips if clip.image_description]
+        if not clips:
+            return 0
+        return self.index.add_vectors(clips, await self._embed([clip.image_description for clip in clips]))
+
+    async def sync_index(self, force=False):
+        """Bring the local indexes up to date; concurrent requests share a single sync"""
+        if not self._sync_due(force):
+            return
+        async with self._sync_lock:
+            # Another request may have finished the sync while this one waited for the lock
+            if not self._sync_due(force):
+                return
+            current_ids = set(await self.db.get_clip_ids())
+            self.last_index_sync = time.monotonic()
+
+            fetched = {}
+            removed = set()
+            resave = False
+            for index in self._indexes():
+                stale, missing, needed = self._sync_diff(index, current_ids, fetched)
+                if needed:
+                    fetched.update((clip.id, clip) for clip in self._clips(await self.db.get_clips_by_ids(needed)))
+                rows = [fetched[clip_id] for clip_id in missing if clip_id in fetched]
+                dropped = index.remove(stale)
+                if index is self.index:
+                    added = await self._index_add(rows)
+                    resave = bool(dropped or added)
+                else:
+                    index.add(rows)
+                removed.update(stale)
+                if stale or missing:
+                    print(f"{type(index).__name__} synced: +{len(missing)} -{len(stale)} ({len(index)} clips)")
+            self._invalidate_results(fetched.values(), removed)
+
+            if resave and EMBEDDING_INDEX_PATH:
+                await asyncio.to_thread(self.index.save, EMBEDDING_INDEX_PATH)
+
+    async def sync_cameras(self, force=False):
+        """Reload the camera registry from the database"""
+        if not self._camera_sync_due(force):
+            return
+        self.last_camera_sync = time.monotonic()
+        try:
+            self.cameras.load(await self.db.get_cameras())
+        except Exception as e:
+            print(f"Error loading cameras: {e}")
+
+    async def _rank_candidates(self, user_query, enhanced_query, candidates):
+        """Yield the embedding ranking of the candidates, then the LLM rerank if enabled"""
+        if self.index is None:
+            async for results in self.processor.rank_clips_progressive(
+                    enhanced_query, candidates, self.threshold, top_k=self.max_results):
+                yield "ranked", results
+            return
+
+        with span("rank"):
+            await self.sync_index()
+            await self._index_add([clip for clip in candidates if clip.id not in self.index])
+
+            by_id = {clip.id: clip for clip in candidates}
+            query_vector = (await self._embed([user_query]))[0]
+            hits = self.index.search_vector(query_vector, k=self.max_results, candidate_ids=list(by_id))
+            ranked = self._ranked_hits(by_id, hits)
+        yield "ranked", ranked
+
+        if LLM_RERANK and ranked:
+            async for results in self.processor.rank_clips_progressive(
+                    enhanced_query, ranked, self.threshold, top_k=self.max_results):
+                yield "reranked", results
+
+    async def _search_index(self, user_query, camera_ids=None):
+        """Top-k cosine search across every indexed clip from the scoped cameras, then the LLM rerank if enabled"""
+        with span("rank", kind="index"):
+            await self.sync_index()
+            query_vector = (await self._embed([user_query]))[0]
+            hits = self.index.search_vector(query_vector, k=self.max_results, candidate_ids=self._scope_ids(camera_ids))
+            scores = {clip_id: score for clip_id, score in hits if score >= EMBEDDING_THRESHOLD}
+            clips = self._in_scope(self._clips(await self.db.get_clips_by_ids(list(scores))), camera_ids)
+            clips = [clip.with_score(scores[clip.id]) for clip in clips]
+        yield "ranked", clips
+
+        if LLM_RERANK and clips:
+            async for results in self.processor.rank_clips_progressive(
+                    user_query, clips, self.threshold, top_k=self.max_results):
+                yield "reranked", results
+
+    async def _candidates(self, filter_sets, camera_ids=None):
+        """Up to MAX_CANDIDATES distinct clips, newest first within each filter set.
+
+        Each round requests the next keyset page of every unfinished filter set concurrently,
+        and rounds stop as soon as the cap is reached.
+        """
+        found = {}
+        cursors = {i: None for i in range(len(filter_sets))}
+        while cursors and len(found) < MAX_CANDIDATES:
+            pending = list(cursors)
+            pages = await asyncio.gather(*(
+                self.db.get_clips_page(cursors[i], self._page_size(), newest_first=True,
+                                       **filter_sets[i], **self._scope(camera_ids))
+                for i in pending
+            ))
+            for i, (rows, cursor) in zip(pending, pages):
+                for row in rows:
+                    found.setdefault(row["id"], row)
+                if cursor is None:
+                    del cursors[i]
+                else:
+                    cursors[i] = cursor
+        return self._clips(list(found.values())[:MAX_CANDIDATES])
+
+    async def _get_latest_clips(self, query, camera_ids=None):
+        """Get the most recent clips from the database"""
+        try:
+            specific_object = self._latest_object(query)
+            scope = self._scope(camera_ids)
+            latest_clips = []
+            if specific_object:
+                latest_clips = self._clips(
+                    await self.db.get_latest_clips(self.max_results, keyword=specific_object, **scope)
+                )
+            if not latest_clips:
+                latest_clips = self._clips(await self.db.get_latest_clips(self.max_results, **scope))
+            return self._with_score(latest_clips, 0.95)
+
+        except Exception as e:
+            print(f"Error getting latest clips: {e}")
+            return []
+
+    async def _get_potential_matches(self, search_terms, time_constraints=None, camera_ids=None):
+        """Get potential matches using keyword filtering, time constraints and the camera scope"""
+        keywords = self._keywords(search_terms)
+        has_time = self._has_time(time_constraints)
+
+        if self.text_index is not None and (keywords or has_time):
+            await self.sync_index()
+            return self._text_index_matches(keywords, time_constraints, camera_ids)
+
+        if not keywords and not has_time:
+            return []
+
+        # Every keyword in one OR query; rows arrive most-matched first, which is the pre-rank
+        if keywords:
+            rows = await self.db.get_clips_by_keywords(
+                keywords, *self._keyword_bounds(time_constraints), limit=MAX_CANDIDATES, **self._scope(camera_ids)
+            )
+            return self._keyword_matches(rows, keywords)
+
+        start_time, end_time = self._time_only_bounds(time_constraints)
+        return await self._candidates([{"start_time": start_time, "end_time": end_time}], camera_ids)
+
+    async def aclose(self):
+        """Release the pooled LLM connections"""
+        if hasattr(self.processor, "aclose"):
+            await self.processor.aclose()
@@ -0,0 +1,100 @@
+# services.py
+import asyncio
+import threading
+from blobstore import BlobStore
+from metrics import span
+from search import AsyncClipSearchEngine
+from storage import get_async_connector
+
+
+class ServiceRegistry:
+    """Lazily built clients shared by every request handler.
+
+    A service is constructed on first use and reused afterwards, so importing the app opens
+    nothing and no request pays for client setup. warmup() builds every service ahead of
+    traffic and runs its hook (open pools, load models, build indexes).
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._hooks = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+        self.status = {}  # name -> "pending", "ready" or "error: ..."
+
+    def register(self, name, factory, warmup=None):
+        """Add a service; warmup is an optional coroutine function called with the instance"""
+        self._factories[name] = factory
+        if warmup is not None:
+            self._hooks[name] = warmup
+        self.status[name] = "pending"
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = self._factories[name]()
+        return instance
+
+    def override(self, name, instance):
+        """Serve a ready-made instance instead of building one, e.g. a fake connector"""
+        with self._lock:
+            self._instances[name] = instance
+
+    def dependency(self, name):
+        """FastAPI dependency that resolves to the shared instance"""
+        def resolve():
+            return self.get(name)
+        return resolve
+
+    @property
+    def ready(self):
+        return all(state == "ready" for state in self.status.values())
+
+    async def warmup(self):
+        """Build every service in registration order and run its hook; failures are recorded, not raised"""
+        for name in self._factories:
+            try:
+                with span("warmup", service=name):
+                    instance = self.get(name)
+                    hook = self._hooks.get(name)
+                    if hook is not None:
+                        await hook(instance)
+                self.status[name] = "ready"
+            except Exception as e:
+                self.status[name] = f"error: {e}"
+                print(f"Warmup of {name} failed: {e}")
+
+    async def aclose(self):
+        """Close the services that were built, dependents first"""
+        for instance in reversed(list(self._instances.values())):
+            if hasattr(instance, "aclose"):
+                await instance.aclose()
+
+
+async def _connect(db):
+    await db.connect()
+
+
+async def _warm_search_engine(engine):
+    backend = getattr(engine.processor, "backend", None)
+    try:
+        # Load a local model (or open the pool) now rather than on the first search
+        if backend is not None:
+            await asyncio.to_thread(backend.warmup)
+    except Exception as e:
+        # The fallback backend, if any, still serves searches
+        print(f"LLM backend warmup failed: {e}")
+    await engine.sync_cameras(force=True)
+    await engine.sync_index(force=True)
+
+
+def default_services():
+    """The app's services: one pooled database connector shared by search and image serving"""
+    services = ServiceRegistry()
+    services.register("db", get_async_connector, _connect)
+    services.register("blob_store", BlobStore)
+    services.register("search_engine", lambda: AsyncClipSearchEngine(db=services.get("db")), _warm_search_engine)
+    return services
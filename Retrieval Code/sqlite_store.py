@@ -0,0 +1,233 @@
+# sqlite_store.py
+import asyncio
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from config import SQLITE_PATH, DB_PAGE_SIZE
+from storage import to_timestamp, day_bounds, next_cursor
+from metrics import DB_ROWS
+
+CLIP_COLUMNS = "id, camera_id, image_description, time_created"
+
+
+def _camera_clause(camera_ids):
+    """SQL condition and params restricting clips to some cameras; None means every camera"""
+    if not camera_ids:
+        return None, []
+    camera_ids = list(camera_ids)
+    return f"camera_id IN ({', '.join('?' for _ in camera_ids)})", camera_ids
+
+
+def _where(keyword=None, start_time=None, end_time=None, camera_ids=None, clauses=None, params=None):
+    """WHERE clause and params for the usual clip filters, appended to any given conditions"""
+    clauses, params = list(clauses or []), list(params or [])
+    camera_clause, camera_params = _camera_clause(camera_ids)
+    if camera_clause:
+        clauses.append(camera_clause)
+        params.extend(camera_params)
+    if keyword:
+        clauses.append("image_description LIKE ?")
+        params.append(f"%{keyword}%")
+    if start_time:
+        clauses.append("time_created >= ?")
+        params.append(to_timestamp(start_time))
+    if end_time:
+        clauses.append("time_created <= ?")
+        params.append(to_timestamp(end_time))
+    return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+def _limit(limit):
+    return f" LIMIT {int(limit)}" if limit else ""
+
+
+class SQLiteConnector:
+    """Local clip store with the same interface as SupabaseConnector, for tests and offline use"""
+
+    def __init__(self, path=SQLITE_PATH):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS todos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    camera_id TEXT,
+                    base_64_image TEXT,
+                    image_description TEXT,
+                    time_created TEXT NOT NULL
+                )
+            """)
+            # time_created is stored in to_timestamp form, so this index gives time-sorted access
+            self.conn.execute("CREATE INDEX IF NOT EXISTS todos_time_created_idx ON todos (time_created)")
+            # Camera-scoped searches walk one camera's clips in time order
+            self.conn.execute("CREATE INDEX IF NOT EXISTS todos_camera_time_idx ON todos (camera_id, time_created)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS cameras (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    location TEXT,
+                    tags TEXT NOT NULL DEFAULT '[]'
+                )
+            """)
+            self.conn.commit()
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            rows = [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+        DB_ROWS.inc("sqlite", amount=len(rows))
+        return rows
+
+    def insert_clip(self, camera_id, image_description, time_created=None, base_64_image=None):
+        """Insert a clip row and return its id"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO todos (camera_id, base_64_image, image_description, time_created) VALUES (?, ?, ?, ?)",
+                (camera_id, base_64_image, image_description, to_timestamp(time_created or datetime.now()))
+            )
+            self.conn.commit()
+            return cursor.lastrowid
+
+    def upsert_camera(self, camera_id, name=None, location=None, tags=()):
+        """Add a camera to the registry, or replace its metadata"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cameras (id, name, location, tags) VALUES (?, ?, ?, ?)",
+                (camera_id, name, location, json.dumps(list(tags)))
+            )
+            self.conn.commit()
+
+    def get_cameras(self):
+        """Retrieve the camera registry: id, name, location and tags of every camera"""
+        return [
+            {**row, "tags": json.loads(row["tags"])}
+            for row in self._rows("SELECT id, name, location, tags FROM cameras")
+        ]
+
+    def get_all_clips(self, camera_ids=None, limit=None):
+        """Retrieve all clips from the database, or the first `limit`"""
+        return self.get_clips_by_keyword_and_time(None, camera_ids=camera_ids, limit=limit)
+
+    def get_clips_by_keyword(self, keyword, camera_ids=None, limit=None):
+        """Retrieve clips that match a simple keyword search"""
+        return self.get_clips_by_keyword_and_time(keyword, camera_ids=camera_ids, limit=limit)
+
+    def get_clips_by_timeframe(self, start_time, end_time, camera_ids=None, limit=None):
+        """Retrieve clips within a specific time range, oldest first"""
+        return self.get_clips_by_keyword_and_time(None, start_time, end_time, camera_ids, limit)
+
+    def get_latest_clips(self, limit=10, keyword=None, camera_ids=None):
+        """Retrieve the most recent clips, served from the time_created index"""
+        where, params = _where(keyword, camera_ids=camera_ids)
+        return self._rows(f"SELECT {CLIP_COLUMNS} FROM todos{where} ORDER BY time_created DESC LIMIT ?", params + [limit])
+
+    def get_clips_by_keyword_and_time(self, keyword, start_time=None, end_time=None, camera_ids=None, limit=None):
+        """Retrieve clips that match both keyword and time constraints"""
+        where, params = _where(keyword, start_time, end_time, camera_ids)
+        return self._rows(f"SELECT {CLIP_COLUMNS} FROM todos{where} ORDER BY time_created{_limit(limit)}", params)
+
+    def get_clips_by_date(self, date_string, camera_ids=None, limit=None):
+        """Retrieve clips from a specific date, oldest first"""
+        start, end = day_bounds(date_string)
+        where, params = _where(camera_ids=camera_ids, clauses=["time_created >= ?", "time_created < ?"], params=[start, end])
+        return self._rows(f"SELECT {CLIP_COLUMNS} FROM todos{where} ORDER BY time_created{_limit(limit)}", params)
+
+    def get_clips_by_keywords(self, keywords, start_time=None, end_time=None, camera_ids=None, limit=None):
+        """Retrieve clips matching any of the keywords in one query, annotated with match_count"""
+        keywords = list(keywords)
+        if not keywords:
+            return []
+        match_count = " + ".join("(image_description LIKE ?)" for _ in keywords)
+        where, params = _where(start_time=start_time, end_time=end_time, camera_ids=camera_ids)
+        sql = (
+            f"SELECT * FROM (SELECT {CLIP_COLUMNS}, {match_count} AS match_count FROM todos{where}) "
+            f"WHERE match_count > 0 ORDER BY match_count DESC, time_created DESC{_limit(limit)}"
+        )
+        return self._rows(sql, [f"%{keyword}%" for keyword in keywords] + params)
+
+    def get_clips_page(self, after=None, page_size=DB_PAGE_SIZE, keyword=None, start_time=None, end_time=None,
+                       camera_ids=None, with_image=False, newest_first=False):
+        """One keyset page of clips in (time_created, id) order: (rows, cursor for the next page or None)"""
+        clauses, params = [], []
+        if after is not None:
+            clauses.append(f"(time_created, id) {'<' if newest_first else '>'} (?, ?)")
+            params.extend(after)
+        where, params = _where(keyword, start_time, end_time, camera_ids, clauses, params)
+        columns = f"{CLIP_COLUMNS}, base_64_image" if with_image else CLIP_COLUMNS
+        direction = "DESC" if newest_first else "ASC"
+        rows = self._rows(
+            f"SELECT {columns} FROM todos{where} ORDER BY time_created {direction}, id {direction} LIMIT ?",
+            params + [page_size]
+        )
+        return rows, next_cursor(rows, page_size)
+
+    def iter_clips(self, page_size=DB_PAGE_SIZE, **filters):
+        """Yield matching clips, fetching the next page only when the caller gets that far"""
+        after = None
+        while True:
+            rows, after = self.get_clips_page(after, page_size, **filters)
+            yield from rows
+            if after is None:
+                return
+
+    def get_clip_image(self, clip_id):
+        """Retrieve the base64 frame for a single clip, or None if it does not exist"""
+        rows = self._rows("SELECT base_64_image FROM todos WHERE id = ?", (clip_id,))
+        return rows[0]["base_64_image"] if rows else None
+
+    def get_clip_ids(self):
+        """Retrieve the ids of every clip"""
+        return [row["id"] for row in self._rows("SELECT id FROM todos")]
+
+    def get_clips_by_ids(self, clip_ids, chunk_size=500):
+        """Retrieve clip rows for the given ids, preserving the requested order"""
+        clip_ids = list(clip_ids)
+        by_id = {}
+        for i in range(0, len(clip_ids), chunk_size):
+            chunk = clip_ids[i:i + chunk_size]
+            placeholders = ", ".join("?" for _ in chunk)
+            for row in self._rows(f"SELECT {CLIP_COLUMNS} FROM todos WHERE id IN ({placeholders})", chunk):
+                by_id[row["id"]] = row
+        return [by_id[clip_id] for clip_id in clip_ids if clip_id in by_id]
+
+
+class AsyncSQLiteConnector:
+    """Awaitable SQLiteConnector; queries run in worker threads so the event loop never blocks"""
+
+    METHODS = (
+        "get_all_clips", "get_clips_by_keyword", "get_clips_by_timeframe", "get_latest_clips",
+        "get_clips_by_keyword_and_time", "get_clips_by_date", "get_clip_image", "get_clip_ids",
+        "get_clips_by_ids", "insert_clip", "get_cameras", "upsert_camera",
+        "get_clips_page", "get_clips_by_keywords"
+    )
+
+    def __init__(self, path=SQLITE_PATH, latency=0.0):
+        # latency adds a simulated network round trip to every call, for load testing
+        self.sync = path if isinstance(path, SQLiteConnector) else SQLiteConnector(path)
+        self.latency = latency
+
+    async def connect(self):
+        return self.sync
+
+    async def iter_clips(self, page_size=DB_PAGE_SIZE, **filters):
+        """Yield matching clips, fetching the next page only when the caller gets that far"""
+        after = None
+        while True:
+            rows, after = await self.get_clips_page(after, page_size, **filters)
+            for row in rows:
+                yield row
+            if after is None:
+                return
+
+    def __getattr__(self, name):
+        if name not in self.METHODS:
+            raise AttributeError(name)
+        method = getattr(self.sync, name)
+
+        async def call(*args, **kwargs):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return call
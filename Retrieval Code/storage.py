@@ -0,0 +1,56 @@
+# storage.py
+from datetime import datetime, date, timedelta
+from config import DB_BACKEND
+
+
+def to_timestamp(value):
+    """Normalize a datetime, date or timestamp string to ISO "YYYY-MM-DDTHH:MM:SS".
+
+    Both backends compare time_created against this form, so a text column that still
+    holds "YYYY-MM-DD HH:MM:SS" values sorts the same way as a real timestamp column.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0, tzinfo=None).isoformat()
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time()).isoformat()
+    text = str(value).strip().replace(" ", "T", 1)
+    if len(text) == 10:
+        text += "T00:00:00"
+    return datetime.fromisoformat(text[:19]).isoformat()
+
+
+def day_bounds(date_string):
+    """[start, next day) timestamps for a YYYY-MM-DD date"""
+    day = date.fromisoformat(date_string[:10])
+    return to_timestamp(day), to_timestamp(day + timedelta(days=1))
+
+
+def next_cursor(rows, page_size):
+    """Keyset cursor (time_created, id) after the last row of a full page; None once the scan is done"""
+    if len(rows) < page_size:
+        return None
+    return rows[-1]["time_created"], rows[-1]["id"]
+
+
+def get_connector(backend=DB_BACKEND):
+    """Build the clip store selected in config; both expose the SupabaseConnector interface"""
+    if backend == "sqlite":
+        from sqlite_store import SQLiteConnector
+        return SQLiteConnector()
+    if backend == "supabase":
+        from db import SupabaseConnector
+        return SupabaseConnector()
+    raise ValueError(f"Unknown DB backend: {backend}")
+
+
+def get_async_connector(backend=DB_BACKEND):
+    """Async counterpart of get_connector for the FastAPI request path"""
+    if backend == "sqlite":
+        from sqlite_store import AsyncSQLiteConnector
+        return AsyncSQLiteConnector()
+    if backend == "supabase":
+        from db import AsyncSupabaseConnector
+        return AsyncSupabaseConnector()
+    raise ValueError(f"Unknown DB backend: {backend}")
@@ -0,0 +1,11 @@
+# conftest.py
+import os
+import sys
+
+# Offline settings, applied before config is first imported
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,34 @@
+# test_cameras.py
+import pytest
+from cameras import CameraRegistry
+
+REGISTRY = CameraRegistry([
+    {"id": "2", "name": "Loading Dock", "location": "North Lobby", "tags": ["parking"]},
+    {"id": "cam0", "name": "Front Door"},
+    {"id": "12"},
+])
+
+
+@pytest.mark.parametrize("query, camera_ids, remainder", [
+    ("people on camera 2", ["2"], "people"),
+    ("camera #2 person", ["2"], "person"),
+    ("cam12 dogs", ["12"], "dogs"),
+    ("cam0 person", ["cam0"], "person"),
+    ("camera 0 delivery", ["cam0"], "delivery"),
+    ("person at the loading dock", ["2"], "person"),
+    ("someone in the north lobby", ["2"], "someone"),
+    ("car in parking", ["2"], "car"),
+    ("person at the front door camera", ["cam0"], "person"),
+])
+def test_resolves_mentions(query, camera_ids, remainder):
+    assert REGISTRY.resolve(query) == (camera_ids, remainder)
+
+
+@pytest.mark.parametrize("query", [
+    "2 people near the car",
+    "a van at 12",
+    "person with a camera",
+    "cam 3 footage",
+])
+def test_bare_ids_do_not_scope_the_search(query):
+    assert REGISTRY.resolve(query) == (None, query)
@@ -0,0 +1,66 @@
+# test_db.py
+import asyncio
+from types import SimpleNamespace
+from db import AsyncSupabaseConnector, SupabaseConnector
+
+MAX_ROWS = 1000
+
+
+class FakeIdQuery:
+    """The PostgREST builder calls used by get_clip_ids, capped at max-rows like the real server"""
+
+    def __init__(self, ids, calls):
+        self.ids = ids
+        self.calls = calls
+        self.after = None
+        self.page_size = None
+
+    def select(self, columns):
+        return self
+
+    def gt(self, column, value):
+        self.after = value
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, count):
+        self.page_size = count
+        return self
+
+    def _response(self):
+        self.calls.append(self.after)
+        ids = sorted(clip_id for clip_id in self.ids if self.after is None or clip_id > self.after)
+        ids = ids[:min(self.page_size or MAX_ROWS, MAX_ROWS)]
+        return SimpleNamespace(data=[{"id": clip_id} for clip_id in ids], error=None)
+
+    def execute(self):
+        return self._response()
+
+
+class AsyncFakeIdQuery(FakeIdQuery):
+    async def execute(self):
+        return self._response()
+
+
+def connector(cls, query, ids):
+    db = cls.__new__(cls)
+    calls = []
+    db.client = SimpleNamespace(table=lambda name: query(ids, calls))
+    return db, calls
+
+
+def test_clip_ids_are_paged_past_max_rows():
+    ids = set(range(1, 2501))
+    db, calls = connector(SupabaseConnector, FakeIdQuery, ids)
+    assert db.get_clip_ids() == sorted(ids)
+    assert calls == [None, 1000, 2000]
+
+
+def test_async_clip_ids_are_paged_past_max_rows():
+    ids = set(range(1, 2001))
+    db, calls = connector(AsyncSupabaseConnector, AsyncFakeIdQuery, ids)
+    assert asyncio.run(db.get_clip_ids()) == sorted(ids)
+    # A full last page costs one more, empty, request
+    assert calls == [None, 1000, 2000]
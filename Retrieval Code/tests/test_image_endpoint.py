@@ -0,0 +1,86 @@
+# test_image_endpoint.py
+import asyncio
+import base64
+import io
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from app import app, services
+from blobstore import BlobStore
+
+
+def frame_base64():
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), "red").save(buffer, format="JPEG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class FakeDatabase:
+    def __init__(self, images):
+        self.images = images
+        self.fetches = 0
+
+    async def get_clip_image(self, clip_id):
+        self.fetches += 1
+        return self.images.get(clip_id)
+
+
+class RecordingBlobStore(BlobStore):
+    """Notes every call made while an event loop is running in the calling thread"""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.on_loop = []
+
+    def _record(self, name):
+        try:
+            asyncio.get_running_loop()
+            self.on_loop.append(name)
+        except RuntimeError:
+            pass
+
+    def digest_for(self, clip_id):
+        self._record("digest_for")
+        return super().digest_for(clip_id)
+
+    def ingest(self, clip_id, base64_data):
+        self._record("ingest")
+        return super().ingest(clip_id, base64_data)
+
+    def read(self, digest, size="thumb"):
+        self._record("read")
+        return super().read(digest, size)
+
+
+@pytest.fixture
+def client(tmp_path):
+    db = FakeDatabase({"1": frame_base64()})
+    blob_store = RecordingBlobStore(str(tmp_path / "blobs"))
+    services.override("db", db)
+    services.override("blob_store", blob_store)
+    # No context manager, so the startup warmup does not run
+    return TestClient(app), db, blob_store
+
+
+def test_serves_thumbnail_off_the_event_loop(client):
+    client, db, blob_store = client
+    response = client.get("/api/image/1?size=thumb")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(response.content)).size == (320, 240)
+    assert blob_store.on_loop == []
+
+
+def test_frame_is_fetched_once_and_revalidated(client):
+    client, db, blob_store = client
+    first = client.get("/api/image/1")
+    assert first.status_code == 200 and first.headers["content-type"] == "image/jpeg"
+    second = client.get("/api/image/1", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert db.fetches == 1
+
+
+def test_missing_image(client):
+    client, db, blob_store = client
+    assert client.get("/api/image/2").status_code == 404
+    assert client.get("/api/image/1?size=huge").status_code == 400
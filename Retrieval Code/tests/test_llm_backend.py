@@ -0,0 +1,101 @@
+# test_llm_backend.py
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from llm_backend import LocalBackend, OpenAIBackend
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible chat completions that echo the last message"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        body = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": request["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": request["messages"][-1]["content"]}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChatHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def test_shared_backend_works_across_event_loops(base_url):
+    # One slot, so concurrent calls contend for the semaphore and bind it to their loop
+    backend = OpenAIBackend(model="stub", base_url=base_url, concurrency=1)
+
+    async def burst(tag):
+        return await asyncio.gather(*(
+            backend.acomplete([{"role": "user", "content": f"{tag}-{i}"}]) for i in range(3)
+        ))
+
+    # e.g. the benchmark's asyncio.run after the app's loop, or a reload
+    assert asyncio.run(burst("first")) == ["first-0", "first-1", "first-2"]
+    assert asyncio.run(burst("second")) == ["second-0", "second-1", "second-2"]
+
+
+def test_aclose_only_closes_the_running_loops_pool(base_url):
+    backend = OpenAIBackend(model="stub", base_url=base_url)
+
+    async def call_and_close():
+        reply = await backend.acomplete([{"role": "user", "content": "ping"}])
+        await backend.aclose()
+        # A closed pool is replaced on the next call
+        return reply, await backend.acomplete([{"role": "user", "content": "again"}])
+
+    assert asyncio.run(call_and_close()) == ("ping", "again")
+
+
+class SlowLoadingBackend(LocalBackend):
+    """LocalBackend whose model takes a while to load and echoes the last message"""
+
+    def _load(self):
+        with self._lock:
+            if self._pipeline is None:
+                time.sleep(0.3)
+                self._pipeline = lambda batch, **kwargs: [[{"generated_text": messages[-1]["content"]}] for messages in batch]
+                threading.Thread(target=self._serve, daemon=True).start()
+            return self._pipeline
+
+
+def test_local_model_loads_off_the_event_loop():
+    backend = SlowLoadingBackend(model="stub", batch_wait=0)
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        # One request starts the load, the other waits behind it as if the warmup held the lock
+        replies = await asyncio.gather(*(backend.acomplete([{"role": "user", "content": text}]) for text in "ab"))
+        ticker.cancel()
+        return replies, ticks
+
+    replies, ticks = asyncio.run(run())
+    assert replies == ["a", "b"]
+    assert ticks >= 10
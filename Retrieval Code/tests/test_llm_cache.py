@@ -0,0 +1,28 @@
+# test_llm_cache.py
+import llm_cache
+from llm_cache import LLMCache
+
+
+def disk_rows(cache):
+    return cache._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+def test_disk_tier_is_trimmed_every_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "DISK_EVICT_INTERVAL", 10)
+    cache = LLMCache(max_size=0, path=str(tmp_path / "cache.sqlite3"), disk_size=5)
+    for i in range(9):
+        cache.set(f"key-{i}", i)
+    assert disk_rows(cache) == 9
+
+    cache.set("key-9", 9)
+    assert disk_rows(cache) == 5
+    # The newest entries are the ones kept
+    assert cache.get("key-9") == 9 and cache.get("key-0") is None
+
+
+def test_eviction_uses_the_expiry_index(tmp_path):
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"))
+    plan = cache._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET 5"
+    ).fetchall()
+    assert "llm_cache_expires_idx" in " ".join(row[-1] for row in plan)
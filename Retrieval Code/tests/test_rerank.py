@@ -0,0 +1,85 @@
+# test_rerank.py
+import asyncio
+import functools
+import threading
+import time
+import pytest
+import llm_process
+from llm_cache import LLMCache
+from llm_process import AsyncQueryProcessor, QueryProcessor, RankingMerger
+
+CHUNK_SIZE = 20
+
+
+def make_clips(count):
+    return [
+        {"id": i, "image_description": f"clip {i}", "time_created": "2025-06-18T12:00:00"}
+        for i in range(count)
+    ]
+
+
+def chunk_score(clips):
+    # The first chunk holds the best candidates, as the search engine passes them best first
+    return 0.9 if clips[0].id < CHUNK_SIZE else 0.7
+
+
+class ChunkProcessor(QueryProcessor):
+    """Scores chunks without an LLM; the first chunk is the slowest to answer"""
+
+    def __init__(self, delays):
+        self.cache = LLMCache(max_size=0, path="")
+        self.delays = delays
+        self.scored = []
+        self._lock = threading.Lock()
+
+    def _rank_chunk(self, user_query, clips):
+        time.sleep(self.delays[clips[0].id // CHUNK_SIZE])
+        with self._lock:
+            self.scored.append(clips[0].id // CHUNK_SIZE)
+        return [{"id": clip.id, "score": chunk_score(clips)} for clip in clips]
+
+
+class AsyncChunkProcessor(AsyncQueryProcessor):
+    def __init__(self, delays):
+        self.cache = LLMCache(max_size=0, path="")
+        self.delays = delays
+        self.scored = []
+
+    async def _rank_chunk(self, user_query, clips):
+        await asyncio.sleep(self.delays[clips[0].id // CHUNK_SIZE])
+        self.scored.append(clips[0].id // CHUNK_SIZE)
+        return [{"id": clip.id, "score": chunk_score(clips)} for clip in clips]
+
+
+@pytest.fixture
+def early_exit(monkeypatch):
+    monkeypatch.setattr(llm_process, "RERANK_CHUNK_SIZE", CHUNK_SIZE)
+    monkeypatch.setattr(llm_process, "RankingMerger", functools.partial(RankingMerger, stable_chunks=1))
+
+
+def test_scores_every_chunk_by_default(monkeypatch):
+    monkeypatch.setattr(llm_process, "RERANK_CHUNK_SIZE", CHUNK_SIZE)
+    processor = ChunkProcessor([0.0] * 5)
+    results = processor.rank_clips("query", make_clips(100), threshold=0.5, top_k=5)
+    assert sorted(processor.scored) == [0, 1, 2, 3, 4]
+    assert len(results) == 100
+
+
+def test_early_exit_waits_for_the_best_chunk(early_exit):
+    processor = ChunkProcessor([0.2, 0.0, 0.0, 0.0, 0.0])
+    results = processor.rank_clips("query", make_clips(100), threshold=0.5, top_k=5)
+    assert [clip.id for clip in results[:5]] == [0, 1, 2, 3, 4]
+    assert results[0].relevance_score == 0.9
+
+
+def test_early_exit_does_not_wait_for_chunks_in_flight(early_exit):
+    processor = ChunkProcessor([0.0, 0.0, 1.0, 1.0, 1.0])
+    started = time.monotonic()
+    processor.rank_clips("query", make_clips(100), threshold=0.5, top_k=5)
+    assert time.monotonic() - started < 0.5
+
+
+def test_async_early_exit_waits_for_the_best_chunk(early_exit):
+    processor = AsyncChunkProcessor([0.1, 0.0, 0.0, 0.0, 0.0])
+    results = asyncio.run(processor.rank_clips("query", make_clips(100), threshold=0.5, top_k=5))
+    assert [clip.id for clip in results[:5]] == [0, 1, 2, 3, 4]
@@ -0,0 +1,77 @@
+# test_result_cache.py
+import asyncio
+from datetime import datetime, timedelta
+from llm_backend import FakeBackend
+from llm_process import AsyncQueryProcessor, QueryProcessor
+from result_cache import ResultCache
+from search import AsyncClipSearchEngine, ClipSearchEngine
+from sqlite_store import AsyncSQLiteConnector, SQLiteConnector
+from clip_record import Clip
+
+
+def window(start, end):
+    return {"start_time": start, "end_time": end}
+
+
+def clip(clip_id, time_created, camera_id="cam0"):
+    return Clip.from_row({"id": clip_id, "camera_id": camera_id, "image_description": "a car",
+                          "time_created": time_created})
+
+
+def test_relative_windows_share_a_key_within_the_sync_interval():
+    cache = ResultCache(granularity=30)
+    first = cache.key("search", "car", window("2025-06-18T09:00:05", "2025-06-18T12:00:05"))
+    later = cache.key("search", "car", window("2025-06-18T09:00:20", "2025-06-18T12:00:20"))
+    assert first == later
+    # The window only grows: start moves down and end moves up to the grid
+    assert first[2:4] == ("2025-06-18 09:00:00", "2025-06-18 12:00:30")
+    assert cache.key("search", "car", window("2025-06-18T09:00:35", "2025-06-18T12:00:35")) != first
+
+
+def test_aligned_and_open_bounds_are_kept():
+    cache = ResultCache(granularity=30)
+    key = cache.key("search", "car", window("2025-06-18T15:00:00", None))
+    assert key[2:4] == ("2025-06-18 15:00:00", None)
+    assert ResultCache(granularity=0).key("search", "car", window("2025-06-18T09:00:05", None))[2] == "2025-06-18 09:00:05"
+
+
+def test_fallback_results_are_invalidated_by_clips_outside_the_window():
+    cache = ResultCache(granularity=30)
+    key = cache.key("search", "car", window("2025-06-17T00:00:00", "2025-06-17T23:59:59"))
+    cache.set(key, [clip(1, "2025-06-18T10:00:00")])
+    assert cache.invalidate([clip(2, "2025-06-18T11:00:00")]) == 0
+
+    cache.set(key, [clip(1, "2025-06-18T10:00:00")], windowed=False)
+    assert cache.invalidate([clip(2, "2025-06-18T11:00:00")]) == 1
+    assert cache.get(key) is None
+
+
+def test_engine_does_not_pin_fallback_results_to_the_window(tmp_path):
+    store = SQLiteConnector(str(tmp_path / "clips.sqlite3"))
+    now = datetime.now()
+    store.insert_clip("cam0", "A person in a red shirt walking by the gate.", now - timedelta(minutes=5))
+    engine = ClipSearchEngine(db=store, processor=QueryProcessor(FakeBackend()))
+
+    # Nothing was recorded yesterday, so the search falls back to every indexed clip
+    results = engine.search("person in a red shirt yesterday")
+    assert results and len(engine.result_cache) == 1
+
+    store.insert_clip("cam0", "A person in a red shirt by the door.", now)
+    engine.sync_index(force=True)
+    assert len(engine.result_cache) == 0
+
+
+def test_async_engine_does_not_pin_fallback_results_to_the_window(tmp_path):
+    store = SQLiteConnector(str(tmp_path / "clips.sqlite3"))
+    now = datetime.now()
+    store.insert_clip("cam0", "A person in a red shirt walking by the gate.", now - timedelta(minutes=5))
+    engine = AsyncClipSearchEngine(db=AsyncSQLiteConnector(store), processor=AsyncQueryProcessor(FakeBackend()))
+
+    async def run():
+        results = await engine.search("person in a red shirt yesterday")
+        assert results and len(engine.result_cache) == 1
+        store.insert_clip("cam0", "A person in a red shirt by the door.", now)
+        await engine.sync_index(force=True)
+
+    asyncio.run(run())
+    assert len(engine.result_cache) == 0
@@ -0,0 +1,102 @@
+# test_search.py
+import asyncio
+import pytest
+import search
+from llm_backend import FakeBackend
+from llm_process import QueryProcessor, AsyncQueryProcessor
+from embeddings import HashingEmbedder
+from search import ClipSearchEngine, AsyncClipSearchEngine
+from sqlite_store import SQLiteConnector, AsyncSQLiteConnector
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteConnector(str(tmp_path / "clips.sqlite3"))
+
+
+@pytest.fixture
+def no_embedding_index(monkeypatch):
+    monkeypatch.setattr(search, "USE_EMBEDDING_INDEX", False)
+
+
+def test_empty_store_without_embedding_index(store, no_embedding_index):
+    engine = ClipSearchEngine(db=store, processor=QueryProcessor(FakeBackend()))
+    assert engine.search("person in a red shirt") == []
+
+
+def test_empty_camera_scope_without_embedding_index(store, no_embedding_index):
+    store.insert_clip("cam0", "A person in a red shirt walking by the gate.")
+    store.upsert_camera("cam1", "Loading Dock")
+    engine = ClipSearchEngine(db=store, processor=QueryProcessor(FakeBackend()))
+    assert engine.search("person in a red shirt at the loading dock") == []
+
+
+def test_async_empty_store_without_embedding_index(store, no_embedding_index):
+    engine = AsyncClipSearchEngine(db=AsyncSQLiteConnector(store), processor=AsyncQueryProcessor(FakeBackend()))
+    assert asyncio.run(engine.search("person in a red shirt")) == []
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+
+@pytest.fixture
+def index_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "idx")
+    monkeypatch.setattr(search, "EMBEDDING_INDEX_PATH", path)
+    return path
+
+
+def test_saved_index_is_loaded_on_restart(store, index_path):
+    for i in range(50):
+        store.insert_clip("cam0", f"A person in a red shirt number {i}.")
+    ClipSearchEngine(db=store, processor=QueryProcessor(FakeBackend())).sync_index(force=True)
+
+    embedder = CountingEmbedder()
+    restarted = ClipSearchEngine(db=store, processor=QueryProcessor(FakeBackend()), embedder=embedder)
+    assert len(restarted.index) == 50
+    restarted.sync_index(force=True)
+    assert embedder.embedded == 0
+
+    # Saving over the file the loaded matrix is mapped from must not truncate it
+    store.insert_clip("cam0", "A person in a blue shirt.")
+    restarted.sync_index(force=True)
+    assert embedder.embedded == 1
+    again = ClipSearchEngine(db=store, processor=QueryProcessor(FakeBackend()))
+    assert len(again.index) == 51
+    assert again.index.search("blue shirt", k=1)[0][0] == again.index.ids[-1]
+
+
+def test_index_is_only_saved_when_its_rows_change(store, index_path, monkeypatch):
+    store.insert_clip("cam0", "A person in a red shirt.")
+    ClipSearchEngine(db=store, processor=QueryProcessor(FakeBackend())).sync_index(force=True)
+
+    # After a restart only the BM25 index needs the rows, so the matrix is not rewritten
+    engine = ClipSearchEngine(db=store, processor=QueryProcessor(FakeBackend()))
+    saves = []
+    monkeypatch.setattr(engine.index, "save", saves.append)
+    engine.sync_index(force=True)
+    assert saves == [] and len(engine.text_index) == 1
+
+    store.insert_clip("cam0", "A person in a blue shirt.")
+    engine.sync_index(force=True)
+    assert saves == [index_path]
+
+
+def test_async_saved_index_is_loaded_on_restart(store, index_path):
+    for i in range(20):
+        store.insert_clip("cam0", f"A car parked by the gate number {i}.")
+    engine = AsyncClipSearchEngine(db=AsyncSQLiteConnector(store), processor=AsyncQueryProcessor(FakeBackend()))
+    asyncio.run(engine.sync_index(force=True))
+
+    embedder = CountingEmbedder()
+    restarted = AsyncClipSearchEngine(db=AsyncSQLiteConnector(store), processor=AsyncQueryProcessor(FakeBackend()),
+                                      embedder=embedder)
+    asyncio.run(restarted.sync_index(force=True))
+    assert len(restarted.index) == 20 and embedder.embedded == 0
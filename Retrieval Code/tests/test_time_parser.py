@@ -0,0 +1,131 @@
+# test_time_parser.py
+from datetime import datetime
+import pytest
+from llm_backend import FakeBackend
+from llm_cache import LLMCache
+from llm_process import QueryProcessor
+from time_parser import parse_time_expression
+
+# Wednesday afternoon
+NOW = datetime(2025, 6, 18, 15, 30)
+
+
+@pytest.mark.parametrize("query, start, end", [
+    # Relative days
+    ("today", "2025-06-18T00:00:00", "2025-06-18T23:59:59"),
+    ("yesterday", "2025-06-17T00:00:00", "2025-06-17T23:59:59"),
+    ("the day before yesterday", "2025-06-16T00:00:00", "2025-06-16T23:59:59"),
+    ("3 days ago", "2025-06-15T00:00:00", "2025-06-15T23:59:59"),
+    ("two days back", "2025-06-16T00:00:00", "2025-06-16T23:59:59"),
+    ("on monday", "2025-06-16T00:00:00", "2025-06-16T23:59:59"),
+    ("last wednesday", "2025-06-11T00:00:00", "2025-06-11T23:59:59"),
+    # Relative weeks
+    ("last week", "2025-06-11T00:00:00", "2025-06-18T15:30:00"),
+    ("in the past 2 weeks", "2025-06-04T00:00:00", "2025-06-18T15:30:00"),
+    ("2 weeks ago", "2025-06-04T00:00:00", "2025-06-10T23:59:59"),
+    ("this week", "2025-06-16T00:00:00", "2025-06-18T15:30:00"),
+    # Last N hours and minutes
+    ("last 3 hours", "2025-06-18T12:30:00", "2025-06-18T15:30:00"),
+    ("in the past hour", "2025-06-18T14:30:00", "2025-06-18T15:30:00"),
+    ("within the last 45 minutes", "2025-06-18T14:45:00", "2025-06-18T15:30:00"),
+    ("an hour ago", "2025-06-18T14:30:00", "2025-06-18T15:29:59"),
+    # Ranges
+    ("between june 1 and june 3", "2025-06-01T00:00:00", "2025-06-03T23:59:59"),
+    ("from 6/1 to 6/5", "2025-06-01T00:00:00", "2025-06-05T23:59:59"),
+    ("yesterday between 2 pm and 4 pm", "2025-06-17T14:00:00", "2025-06-17T16:00:00"),
+    ("between 10 and 2 pm", "2025-06-18T10:00:00", "2025-06-18T14:00:00"),
+    ("between 14 and 16", "2025-06-18T14:00:00", "2025-06-18T16:00:00"),
+    ("from 9:30 to 11", "2025-06-18T09:30:00", "2025-06-18T11:00:00"),
+    ("last night", "2025-06-17T22:00:00", "2025-06-18T06:00:00"),
+    ("yesterday afternoon", "2025-06-17T12:00:00", "2025-06-17T18:00:00"),
+    # Open-ended bounds and single times
+    ("after 3 pm", "2025-06-18T15:00:00", "2025-06-18T23:59:59"),
+    ("before 8 am yesterday", "2025-06-17T00:00:00", "2025-06-17T08:00:00"),
+    ("since june 10", "2025-06-10T00:00:00", None),
+    ("before june 10", None, "2025-06-09T23:59:59"),
+    ("at 3pm", "2025-06-18T15:00:00", "2025-06-18T16:00:00"),
+    # A date without a year is the most recent one that is not in the future
+    ("on december 24", "2024-12-24T00:00:00", "2024-12-24T23:59:59"),
+])
+def test_resolves_window(query, start, end):
+    parsed = parse_time_expression(query, now=NOW)
+    assert parsed["found"] and parsed["resolved"]
+    assert (parsed["start_time"], parsed["end_time"]) == (start, end)
+
+
+@pytest.mark.parametrize("query, remainder", [
+    ("red car yesterday", "red car"),
+    ("person with a backpack after 3 pm", "person with a backpack"),
+    ("delivery truck in the last 2 hours", "delivery truck"),
+])
+def test_remainder_drops_time_language(query, remainder):
+    assert parse_time_expression(query, now=NOW)["remainder"] == remainder
+
+
+@pytest.mark.parametrize("query", [
+    "the man may be sitting",
+    "person in a red shirt",
+    "3 people near the gate",
+    "a dog on the second floor",
+    "van parked in bay 12",
+])
+def test_plain_queries_have_no_time(query):
+    parsed = parse_time_expression(query, now=NOW)
+    assert not parsed["found"] and parsed["resolved"]
+    assert parsed["start_time"] is None and parsed["end_time"] is None
+    assert parsed["remainder"] == query
+
+
+@pytest.mark.parametrize("query", [
+    # Bare 12-hour clock ranges could be morning or evening
+    "between 5 and 7",
+    "from 9 to 5",
+    # Two unrelated dates
+    "yesterday and 3 days ago",
+    # Time words the parser does not understand
+    "the weekend before last",
+])
+def test_unclear_time_is_left_to_the_llm(query):
+    parsed = parse_time_expression(query, now=NOW)
+    assert not parsed["resolved"]
+    assert parsed["start_time"] is None and parsed["end_time"] is None
+
+
+class CountingBackend(FakeBackend):
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def complete(self, messages):
+        self.prompts.append(messages[-1]["content"])
+        return super().complete(messages)
+
+
+@pytest.fixture
+def processor():
+    processor = QueryProcessor(backend=CountingBackend())
+    processor.cache = LLMCache(path="")
+    return processor
+
+
+def test_time_only_query_skips_the_llm(processor):
+    terms = processor.extract_search_terms("cars yesterday")
+    assert processor.backend.prompts == []
+    assert terms["keywords"] == ["cars"]
+    assert "start" in terms["time_references"]["time_period"]
+
+
+def test_plain_query_still_extracts_terms(processor):
+    processor.extract_search_terms("person in a red shirt")
+    processor.extract_search_terms("person in a red shirt")
+    # Extracted once, then served from the terms cache
+    assert len(processor.backend.prompts) == 1
+    assert "person in a red shirt" in processor.backend.prompts[0]
+
+
+def test_local_time_is_merged_into_llm_terms(processor):
+    terms = processor.extract_search_terms("person in a red shirt after 3 pm")
+    prompt = processor.backend.prompts[0]
+    assert '"person in a red shirt"' in prompt
+    period = terms["time_references"]["time_period"]
+    assert period["start"].endswith("T15:00:00") and period["end"].endswith("T23:59:59")
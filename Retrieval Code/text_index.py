@@ -0,0 +1,203 @@
+# text_index.py
+import heapq
+import math
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from clip_record import Clip
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "for", "with", "from", "by", "is", "are",
+    "was", "were", "be", "been", "it", "its", "this", "that", "there", "their", "they", "he", "she", "his",
+    "her", "as", "which", "who", "image", "appears", "shows", "can", "seen"
+}
+
+
+def stem(word):
+    """Light suffix stripper so "sitting", "sits" and "sit" share a term"""
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("sses"):
+        return word[:-2]
+    for suffix in ("ing", "edly", "ed", "ly"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            # Undo consonant doubling: "sitting" -> "sitt" -> "sit"
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            return word
+    if word.endswith(("xes", "zes", "ches", "shes")) and len(word) > 4:
+        return word[:-2]
+    if word.endswith("s") and len(word) > 3 and word[-2] not in "su":
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Lowercase, drop stopwords and stem"""
+    return [stem(token) for token in TOKEN_PATTERN.findall((text or "").lower()) if token not in STOPWORDS]
+
+
+def time_key(value):
+    """Sortable "YYYY-MM-DD HH:MM:SS" key for a time_created value or a time bound"""
+    return str(value or "").replace("T", " ")[:19]
+
+
+class TextIndex:
+    """BM25 inverted index over clip descriptions with time-sorted postings, partitioned by camera.
+
+    A camera-scoped lookup only walks the postings of the cameras in scope; document
+    frequencies stay global so scores are comparable across scopes.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}     # camera_id -> {term: sorted [(time_key, doc), ...]}
+        self.timelines = {}    # camera_id -> sorted [(time_key, doc), ...]
+        self.doc_freq = Counter()
+        self.docs = {}         # doc -> (Clip, Counter of terms, length)
+        self.doc_for_id = {}   # clip id -> doc
+        self.total_length = 0
+        self._next_doc = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __contains__(self, clip_id):
+        return clip_id in self.doc_for_id
+
+    @property
+    def ids(self):
+        return list(self.doc_for_id)
+
+    @property
+    def camera_ids(self):
+        return list(self.timelines)
+
+    def _partitions(self, camera_ids=None):
+        """Cameras to search: every partition, or the scoped ones that have clips"""
+        if camera_ids is None:
+            return list(self.timelines)
+        return [camera_id for camera_id in camera_ids if camera_id in self.timelines]
+
+    def add(self, clips):
+        """Index (or re-index) Clip records or rows carrying id, image_description and time_created"""
+        clips = [Clip.from_row(clip) for clip in clips]
+        self.remove([clip.id for clip in clips if clip.id in self.doc_for_id])
+        touched = set()
+        for clip in clips:
+            doc = self._next_doc
+            self._next_doc += 1
+            terms = Counter(tokenize(clip.image_description))
+            length = sum(terms.values())
+            key = (time_key(clip.time_created), doc)
+            postings = self.postings.setdefault(clip.camera_id, {})
+
+            self.docs[doc] = (clip, terms, length)
+            self.doc_for_id[clip.id] = doc
+            self.total_length += length
+            self.timelines.setdefault(clip.camera_id, []).append(key)
+            self.doc_freq.update(terms.keys())
+            for term in terms:
+                postings.setdefault(term, []).append(key)
+                touched.add((clip.camera_id, term))
+
+        # Appends are mostly in time order already, so re-sorting is close to linear
+        for camera_id in {camera_id for camera_id, _ in touched} | {clip.camera_id for clip in clips}:
+            self.timelines[camera_id].sort()
+        for camera_id, term in touched:
+            self.postings[camera_id][term].sort()
+
+    def remove(self, clip_ids):
+        """Drop clips from the index"""
+        for clip_id in clip_ids:
+            doc = self.doc_for_id.pop(clip_id, None)
+            if doc is None:
+                continue
+            clip, terms, length = self.docs.pop(doc)
+            key = (time_key(clip.time_created), doc)
+            postings = self.postings[clip.camera_id]
+            self.total_length -= length
+            self._discard(self.timelines[clip.camera_id], key)
+            for term in terms:
+                posting = postings[term]
+                self._discard(posting, key)
+                if not posting:
+                    del postings[term]
+                self.doc_freq[term] -= 1
+                if not self.doc_freq[term]:
+                    del self.doc_freq[term]
+            if not self.timelines[clip.camera_id]:
+                del self.timelines[clip.camera_id]
+                del self.postings[clip.camera_id]
+
+    def _discard(self, entries, key):
+        i = bisect_left(entries, key)
+        if i < len(entries) and entries[i] == key:
+            del entries[i]
+
+    def _bounds(self, entries, start_time=None, end_time=None):
+        """Index range of entries whose time falls in [start_time, end_time]"""
+        lo = bisect_left(entries, (time_key(start_time), -1)) if start_time else 0
+        hi = bisect_right(entries, (time_key(end_time), math.inf)) if end_time else len(entries)
+        return lo, hi
+
+    def _slice(self, entries, start_time=None, end_time=None):
+        """Entries whose time falls in [start_time, end_time], found by bisection"""
+        lo, hi = self._bounds(entries, start_time, end_time)
+        return entries[lo:hi]
+
+    def search(self, keywords, start_time=None, end_time=None, limit=None, camera_ids=None):
+        """Score clips matching any keyword within the time bounds, optionally on some cameras only.
+
+        Returns (clip, bm25 score, number of query terms matched) tuples, best first.
+        """
+        query_terms = {term for keyword in keywords for term in tokenize(keyword)}
+        if not query_terms or not self.docs:
+            return []
+
+        count = len(self.docs)
+        average_length = self.total_length / count or 1.0
+        partitions = [self.postings[camera_id] for camera_id in self._partitions(camera_ids)]
+        scores = {}
+        matched = Counter()
+        for term in query_terms:
+            frequency = self.doc_freq.get(term)
+            if not frequency:
+                continue
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for postings in partitions:
+                posting = postings.get(term)
+                if not posting:
+                    continue
+                for _, doc in self._slice(posting, start_time, end_time):
+                    _, terms, length = self.docs[doc]
+                    tf = terms[term]
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / norm
+                    matched[doc] += 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(self.docs[doc][0], score, matched[doc]) for doc, score in ranked]
+
+    def in_range(self, start_time=None, end_time=None, limit=None, newest_first=True, camera_ids=None):
+        """Clips whose time falls in the bounds, in time order; O(limit) per camera once the bounds are bisected"""
+        slices = []
+        for camera_id in self._partitions(camera_ids):
+            timeline = self.timelines[camera_id]
+            lo, hi = self._bounds(timeline, start_time, end_time)
+            if limit is not None:
+                lo, hi = (max(lo, hi - limit), hi) if newest_first else (lo, min(hi, lo + limit))
+            slices.append(timeline[lo:hi])
+
+        entries = slices[0] if len(slices) == 1 else list(heapq.merge(*slices))
+        if limit is not None:
+            entries = entries[-limit:] if newest_first else entries[:limit]
+        if newest_first:
+            entries = entries[::-1]
+        return [self.docs[doc][0] for _, doc in entries]
@@ -0,0 +1,372 @@
+# time_parser.py
+import re
+from datetime import datetime, date, time, timedelta
+
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8, "september": 9,
+    "sept": 9, "sep": 9, "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "couple of": 2, "couple": 2, "few": 3
+}
+# Same day parts as QueryProcessor.parse_time_references; night runs into the next morning
+DAY_PARTS = {
+    "morning": (time(6), time(12)),
+    "afternoon": (time(12), time(18)),
+    "evening": (time(18), time(22)),
+    "night": (time(22), time(6)),
+    "tonight": (time(18), time(6)),
+}
+
+MONTH_RE = "|".join(sorted(MONTHS, key=len, reverse=True))
+WEEKDAY_RE = "|".join(WEEKDAYS)
+NUM_RE = r"\d+|" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+ORDINAL_RE = r"(?:st|nd|rd|th)?"
+
+DATE_RE = (
+    r"(?:\d{4}-\d{1,2}-\d{1,2}"
+    r"|\d{1,2}/\d{1,2}(?:/\d{2,4})?"
+    rf"|(?:{MONTH_RE})\.?\s+\d{{1,2}}{ORDINAL_RE}(?:,?\s+\d{{4}})?"
+    rf"|\d{{1,2}}{ORDINAL_RE}\s+(?:of\s+)?(?:{MONTH_RE})(?:,?\s+\d{{4}})?"
+    r"|(?:the\s+)?day\s+before\s+yesterday|today|yesterday"
+    rf"|(?:(?:last|this|past)\s+)?(?:{WEEKDAY_RE})"
+    rf"|(?:{NUM_RE})\s+days?\s+(?:ago|back|earlier))"
+)
+MERIDIEM_RE = r"(?:am|pm|a\.m\.|p\.m\.)"
+# A strict time needs a meridiem or minutes so "3 people" is never read as 3 o'clock
+TIME_STRICT_RE = rf"(?:\d{{1,2}}(?::\d{{2}})?\s*{MERIDIEM_RE}|\d{{1,2}}:\d{{2}}|noon|midnight)"
+TIME_LOOSE_RE = rf"(?:\d{{1,2}}(?::\d{{2}})?(?:\s*{MERIDIEM_RE})?|noon|midnight)"
+UNIT_RE = r"(minute|min|hour|hr|day|week|month|year)s?"
+# Times can end in "a.m.", where \b does not apply, so bound them by whitespace or punctuation
+TIME_END = r"(?=[\s,?!;]|$)"
+
+UNIT_DELTAS = {
+    "minute": timedelta(minutes=1), "min": timedelta(minutes=1), "hour": timedelta(hours=1),
+    "hr": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(days=7),
+    "month": timedelta(days=30), "year": timedelta(days=365)
+}
+
+# Time words that, if still present after parsing, mean the local parser missed something
+LEFTOVER_CUES = re.compile(
+    rf"\b(?:ago|yesterday|today|tonight|tomorrow|weekend|weeks?|months?|years?|hours?|minutes?"
+    rf"|morning|afternoon|evening|night|midnight|noon|o'clock|{WEEKDAY_RE})\b"
+    rf"|\b(?:before|after|since|until|till|between|from|at)\s+\d"
+    rf"|\d\s*{MERIDIEM_RE}"
+)
+
+END_OF_DAY = time(23, 59, 59)
+
+
+def _number(text):
+    text = text.strip()
+    return int(text) if text.isdigit() else NUMBER_WORDS[text]
+
+
+class TimeExpressionParser:
+    """Rule-based resolver for the time language that appears in search queries"""
+
+    def __init__(self, now=None):
+        self.now = now or datetime.now()
+        self.today = self.now.date()
+
+    # Single values
+
+    def parse_date(self, text):
+        """Resolve one date expression to a date, or None"""
+        text = " ".join(text.split())
+        match = re.fullmatch(r"(\d{4})-(\d{1,2})-(\d{1,2})", text)
+        if match:
+            return self._make_date(int(match[1]), int(match[2]), int(match[3]))
+
+        match = re.fullmatch(r"(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?", text)
+        if match:
+            year = int(match[3]) if match[3] else None
+            if year is not None and year < 100:
+                year += 2000
+            return self._make_date(year, int(match[1]), int(match[2]))
+
+        match = re.fullmatch(rf"({MONTH_RE})\.?\s+(\d{{1,2}}){ORDINAL_RE}(?:,?\s+(\d{{4}}))?", text)
+        if match:
+            return self._make_date(int(match[3]) if match[3] else None, MONTHS[match[1]], int(match[2]))
+
+        match = re.fullmatch(rf"(\d{{1,2}}){ORDINAL_RE}\s+(?:of\s+)?({MONTH_RE})(?:,?\s+(\d{{4}}))?", text)
+        if match:
+            return self._make_date(int(match[3]) if match[3] else None, MONTHS[match[2]], int(match[1]))
+
+        if text == "today":
+            return self.today
+        if text == "yesterday":
+            return self.today - timedelta(days=1)
+        if text.endswith("day before yesterday"):
+            return self.today - timedelta(days=2)
+
+        match = re.fullmatch(rf"(?:(last|this|past)\s+)?({WEEKDAY_RE})", text)
+        if match:
+            days_back = (self.today.weekday() - WEEKDAYS.index(match[2])) % 7
+            if match[1] in ("last", "past") and days_back == 0:
+                days_back = 7
+            return self.today - timedelta(days=days_back)
+
+        match = re.fullmatch(rf"({NUM_RE})\s+days?\s+(?:ago|back|earlier)", text)
+        if match:
+            return self.today - timedelta(days=_number(match[1]))
+        return None
+
+    def _make_date(self, year, month, day):
+        """Build a date; without a year, use the most recent occurrence that is not in the future"""
+        try:
+            if year is not None:
+                return date(year, month, day)
+            candidate = date(self.today.year, month, day)
+            return candidate if candidate <= self.today else date(self.today.year - 1, month, day)
+        except ValueError:
+            return None
+
+    def parse_time(self, text, default_meridiem=None):
+        """Resolve one time-of-day expression to a time, or None"""
+        text = text.strip()
+        if text == "noon":
+            return time(12)
+        if text == "midnight":
+            return time(0)
+        match = re.fullmatch(rf"(\d{{1,2}})(?::(\d{{2}}))?\s*({MERIDIEM_RE})?", text)
+        if not match:
+            return None
+        hour, minute = int(match[1]), int(match[2] or 0)
+        meridiem = (match[3] or default_meridiem or "").replace(".", "")
+        if meridiem:
+            if not 1 <= hour <= 12:
+                return None
+            if meridiem == "pm" and hour != 12:
+                hour += 12
+            elif meridiem == "am" and hour == 12:
+                hour = 0
+        if hour > 23 or minute > 59:
+            return None
+        return time(hour, minute)
+
+    def _meridiem(self, text):
+        match = re.search(MERIDIEM_RE, text)
+        return match[0].replace(".", "") if match else None
+
+    # Whole query
+
+    def parse(self, text):
+        """Resolve the time window in a query.
+
+        Returns a dict with found (any time language), resolved (everything was understood),
+        start_time / end_time as ISO strings or None, and remainder (the query without the
+        time phrases, for keyword extraction).
+        """
+        self._text = f" {' '.join(text.lower().split())} "
+        self._window = None
+        self._dates = []
+        self._date_mode = None
+        self._times = None
+        self._ambiguous = False
+
+        self._relative_windows()
+        self._night_phrases()
+        self._date_ranges()
+        self._single_dates()
+        self._time_ranges()
+        self._day_parts()
+
+        remainder = " ".join(self._text.split())
+        start, end = self._combine()
+        resolved = not self._ambiguous and not LEFTOVER_CUES.search(remainder)
+        found = start is not None or end is not None
+        if found and self._ambiguous:
+            start = end = None
+        return {
+            "found": found or self._ambiguous,
+            "resolved": resolved,
+            "start_time": start.isoformat() if start else None,
+            "end_time": end.isoformat() if end else None,
+            "remainder": remainder
+        }
+
+    def _consume(self, pattern, handler):
+        """Apply handler to each match of pattern and blank the matched text out"""
+        def replace(match):
+            handler(match)
+            return " "
+        self._text = re.sub(pattern, replace, self._text)
+
+    def _set_window(self, start, end):
+        if self._window is not None:
+            self._ambiguous = True
+        self._window = (start, end)
+
+    def _relative_windows(self):
+        def last_n(match):
+            count = _number(match[1]) if match.lastindex >= 2 and match[1] else 1
+            unit = match[match.lastindex]
+            start = self.now - UNIT_DELTAS[unit] * count
+            if unit in ("day", "week", "month", "year"):
+                start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+            self._set_window(start, self.now)
+
+        def units_ago(match):
+            count, unit = _number(match[1]), match[2]
+            delta = UNIT_DELTAS[unit]
+            start = self.now - delta * count
+            if unit in ("week", "month", "year"):
+                start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+            self._set_window(start, start + delta - timedelta(seconds=1))
+
+        def this_period(match):
+            midnight = datetime.combine(self.today, time(0))
+            if match[1] == "week":
+                start = midnight - timedelta(days=self.today.weekday())
+            elif match[1] == "month":
+                start = midnight.replace(day=1)
+            else:
+                start = midnight.replace(month=1, day=1)
+            self._set_window(start, self.now)
+
+        self._consume(rf"\b(?:in\s+|during\s+|over\s+|within\s+)?(?:the\s+)?(?:last|past|previous)\s+({NUM_RE})\s+{UNIT_RE}\b", last_n)
+        self._consume(rf"\b({NUM_RE})\s+(minute|min|hour|hr|week|month|year)s?\s+(?:ago|back|earlier)\b", units_ago)
+        self._consume(r"\b(?:in\s+|during\s+|over\s+|within\s+)?(?:the\s+)?(?:last|past|previous)\s+(minute|hour|week|month|year)\b", last_n)
+        self._consume(r"\bthis\s+(week|month|year)\b", this_period)
+
+    def _night_phrases(self):
+        def last_night(match):
+            self._dates.append(self.today - timedelta(days=1))
+            self._set_times(*DAY_PARTS["night"])
+
+        def tonight(match):
+            self._dates.append(self.today)
+            self._set_times(*DAY_PARTS["tonight"])
+
+        self._consume(r"\b(?:last|yesterday)\s+night\b", last_night)
+        self._consume(r"\btonight\b", tonight)
+
+    def _date_ranges(self):
+        def between(match):
+            first, second = self.parse_date(match[1]), self.parse_date(match[2])
+            if first is None or second is None:
+                self._ambiguous = True
+                return
+            self._dates.extend([min(first, second), max(first, second)])
+            self._date_mode = "range"
+
+        def bounded(mode):
+            def handler(match):
+                parsed = self.parse_date(match[1])
+                if parsed is None:
+                    self._ambiguous = True
+                    return
+                self._dates.append(parsed)
+                self._date_mode = mode
+            return handler
+
+        self._consume(rf"\bbetween\s+({DATE_RE})\s+and\s+({DATE_RE})\b", between)
+        self._consume(rf"\bfrom\s+({DATE_RE})\s+(?:to|until|till|through)\s+({DATE_RE})\b", between)
+        self._consume(rf"(?<!day )\b(?:before|prior\s+to)\s+({DATE_RE})\b", bounded("before"))
+        self._consume(rf"\b(?:until|till|up\s+to)\s+({DATE_RE})\b", bounded("until"))
+        self._consume(rf"\bafter\s+({DATE_RE})\b", bounded("after"))
+        self._consume(rf"\bsince\s+({DATE_RE})\b", bounded("since"))
+
+    def _single_dates(self):
+        def single(match):
+            parsed = self.parse_date(match[1])
+            if parsed is None:
+                self._ambiguous = True
+            elif parsed not in self._dates:
+                self._dates.append(parsed)
+
+        self._consume(rf"\b(?:on\s+)?({DATE_RE})\b", single)
+
+    def _set_times(self, start, end):
+        if self._times is not None:
+            self._ambiguous = True
+        self._times = (start, end)
+
+    def _time_ranges(self):
+        def between(match):
+            # "between 5 and 7" could be morning or evening; leave bare 12-hour clock ranges to the LLM
+            if not any(self._meridiem(part) or ":" in part for part in (match[1], match[2])) \
+                    and all(part.isdigit() and 1 <= int(part) <= 12 for part in (match[1], match[2])):
+                self._ambiguous = True
+                return
+            end = self.parse_time(match[2])
+            start = self.parse_time(match[1], self._meridiem(match[2]))
+            # "between 10 and 2 pm" borrows pm for 10, which would run backwards
+            if start and end and start > end and not self._meridiem(match[1]):
+                start = self.parse_time(match[1], "am")
+            if start is None or end is None:
+                self._ambiguous = True
+                return
+            self._set_times(start, end)
+
+        def bounded(kind):
+            def handler(match):
+                parsed = self.parse_time(match[1])
+                if parsed is None:
+                    self._ambiguous = True
+                elif kind == "before":
+                    self._set_times(time(0), parsed)
+                elif kind == "after":
+                    self._set_times(parsed, END_OF_DAY)
+                else:
+                    # A bare time is treated as a one-hour window, as in parse_time_references
+                    moment = datetime.combine(self.today, parsed)
+                    self._set_times(parsed, (moment + timedelta(hours=1)).time())
+            return handler
+
+        self._consume(rf"\bbetween\s+({TIME_LOOSE_RE})\s+and\s+({TIME_LOOSE_RE}){TIME_END}", between)
+        self._consume(rf"\bfrom\s+({TIME_LOOSE_RE})\s+(?:to|until|till)\s+({TIME_LOOSE_RE}){TIME_END}", between)
+        self._consume(rf"\b(?:before|until|till|by)\s+({TIME_STRICT_RE}){TIME_END}", bounded("before"))
+        self._consume(rf"\b(?:after|since)\s+({TIME_STRICT_RE}){TIME_END}", bounded("after"))
+        self._consume(rf"\b(?:at|around)\s+({TIME_STRICT_RE}){TIME_END}", bounded("at"))
+        self._consume(rf"(?<![\w:])({TIME_STRICT_RE}){TIME_END}", bounded("at"))
+
+    def _day_parts(self):
+        def day_part(match):
+            self._set_times(*DAY_PARTS[match[1]])
+
+        self._consume(r"\b(?:in\s+the\s+|during\s+the\s+|this\s+|at\s+)?(morning|afternoon|evening|night)\b", day_part)
+
+    def _combine(self):
+        """Merge the window, dates and times collected from the query into one range"""
+        if self._window is not None:
+            if self._dates or self._times:
+                self._ambiguous = True
+            return self._window
+
+        if len(self._dates) > 2 or (len(self._dates) == 2 and self._date_mode != "range"):
+            self._ambiguous = True
+            return None, None
+
+        if self._date_mode in ("before", "until", "after", "since"):
+            if self._times is not None:
+                self._ambiguous = True
+            day = self._dates[0]
+            if self._date_mode == "before":
+                return None, datetime.combine(day - timedelta(days=1), END_OF_DAY)
+            if self._date_mode == "until":
+                return None, datetime.combine(day, END_OF_DAY)
+            if self._date_mode == "after":
+                return datetime.combine(day + timedelta(days=1), time(0)), None
+            return datetime.combine(day, time(0)), None
+
+        if not self._dates and self._times is None:
+            return None, None
+
+        first_day = self._dates[0] if self._dates else self.today
+        last_day = self._dates[-1] if self._dates else self.today
+        start_time, end_time = self._times or (time(0), END_OF_DAY)
+        start = datetime.combine(first_day, start_time)
+        end = datetime.combine(last_day, end_time)
+        if end < start:
+            end += timedelta(days=1)
+        return start, end
+
+
+def parse_time_expression(text, now=None):
+    """Resolve the time window in a query without calling an LLM"""
+    return TimeExpressionParser(now).parse(text)